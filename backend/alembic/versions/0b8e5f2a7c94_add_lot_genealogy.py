@@ -0,0 +1,62 @@
+"""add lot genealogy
+
+Revision ID: 0b8e5f2a7c94
+Revises: f27c9d3e4a51
+Create Date: 2026-10-19 21:24:55.871302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b8e5f2a7c94'
+down_revision: Union[str, None] = 'f27c9d3e4a51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_consumptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('production_run_id', sa.Integer(), nullable=True),
+    sa.Column('inventory_item_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Float(), nullable=True),
+    sa.Column('consumed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['inventory_item_id'], ['inventory_items.id'], ),
+    sa.ForeignKeyConstraint(['production_run_id'], ['production_runs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inventory_consumptions_id'), 'inventory_consumptions', ['id'], unique=False)
+    op.create_index(op.f('ix_inventory_consumptions_inventory_item_id'), 'inventory_consumptions', ['inventory_item_id'], unique=False)
+    op.create_index(op.f('ix_inventory_consumptions_production_run_id'), 'inventory_consumptions', ['production_run_id'], unique=False)
+    op.create_table('lot_genealogy',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['inventory_items.id'], ),
+    sa.ForeignKeyConstraint(['descendant_id'], ['inventory_items.id'], ),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_lot_genealogy_descendant_id_ancestor_id', 'lot_genealogy', ['descendant_id', 'ancestor_id'], unique=False)
+    with op.batch_alter_table('inventory_items') as batch_op:
+        batch_op.add_column(sa.Column('production_run_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_inventory_items_production_run_id_production_runs', 'production_runs', ['production_run_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_inventory_items_production_run_id'), ['production_run_id'], unique=False)
+    op.create_index(op.f('ix_quality_checks_inventory_item_id'), 'quality_checks', ['inventory_item_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_quality_checks_inventory_item_id'), table_name='quality_checks')
+    with op.batch_alter_table('inventory_items') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_inventory_items_production_run_id'))
+        batch_op.drop_constraint('fk_inventory_items_production_run_id_production_runs', type_='foreignkey')
+        batch_op.drop_column('production_run_id')
+    op.drop_index('ix_lot_genealogy_descendant_id_ancestor_id', table_name='lot_genealogy')
+    op.drop_table('lot_genealogy')
+    op.drop_index(op.f('ix_inventory_consumptions_production_run_id'), table_name='inventory_consumptions')
+    op.drop_index(op.f('ix_inventory_consumptions_inventory_item_id'), table_name='inventory_consumptions')
+    op.drop_index(op.f('ix_inventory_consumptions_id'), table_name='inventory_consumptions')
+    op.drop_table('inventory_consumptions')
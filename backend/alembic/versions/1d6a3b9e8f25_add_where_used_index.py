@@ -0,0 +1,50 @@
+"""add where used index
+
+Revision ID: 1d6a3b9e8f25
+Revises: 0b8e5f2a7c94
+Create Date: 2026-10-19 22:03:17.664920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d6a3b9e8f25'
+down_revision: Union[str, None] = '0b8e5f2a7c94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('where_used',
+    sa.Column('item_type', sa.String(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('part_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['part_id'], ['parts.id'], ),
+    sa.PrimaryKeyConstraint('item_type', 'item_id', 'part_id')
+    )
+    op.create_index(op.f('ix_where_used_part_id'), 'where_used', ['part_id'], unique=False)
+    with op.batch_alter_table('bom_items') as batch_op:
+        batch_op.add_column(sa.Column('material_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('component_part_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_bom_items_material_id_materials', 'materials', ['material_id'], ['id'])
+        batch_op.create_foreign_key('fk_bom_items_component_part_id_parts', 'parts', ['component_part_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_bom_items_material_id'), ['material_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_bom_items_component_part_id'), ['component_part_id'], unique=False)
+    # Existing BOM items are resolved and indexed with `python -m app.where_used`
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('bom_items') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_bom_items_component_part_id'))
+        batch_op.drop_index(batch_op.f('ix_bom_items_material_id'))
+        batch_op.drop_constraint('fk_bom_items_component_part_id_parts', type_='foreignkey')
+        batch_op.drop_constraint('fk_bom_items_material_id_materials', type_='foreignkey')
+        batch_op.drop_column('component_part_id')
+        batch_op.drop_column('material_id')
+    op.drop_index(op.f('ix_where_used_part_id'), table_name='where_used')
+    op.drop_table('where_used')
@@ -0,0 +1,57 @@
+"""add customer foreign keys
+
+Revision ID: 2f7b1c4d9e36
+Revises: 1d6a3b9e8f25
+Create Date: 2026-10-19 22:41:30.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f7b1c4d9e36'
+down_revision: Union[str, None] = '1d6a3b9e8f25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _backfill(table: str):
+    # Same matching as app.customer_links, one id range per statement
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text(f"SELECT max(id) FROM {table}")).scalar() or 0
+    for low in range(0, max_id + 1, BATCH_SIZE):
+        bind.execute(sa.text(
+            f"UPDATE {table} SET customer_id = ("
+            "SELECT min(customers.id) FROM customers "
+            f"WHERE lower(trim(customers.name)) = lower(trim({table}.customer))"
+            f") WHERE id >= :low AND id < :high AND customer_id IS NULL"
+        ), {"low": low, "high": low + BATCH_SIZE})
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.add_column(sa.Column('customer_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_orders_customer_id_customers', 'customers', ['customer_id'], ['id'])
+        batch_op.create_index('ix_orders_customer_id_due_date', ['customer_id', 'due_date'], unique=False)
+    with op.batch_alter_table('parts') as batch_op:
+        batch_op.add_column(sa.Column('customer_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_parts_customer_id_customers', 'customers', ['customer_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_parts_customer_id'), ['customer_id'], unique=False)
+    _backfill('orders')
+    _backfill('parts')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('parts') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_parts_customer_id'))
+        batch_op.drop_constraint('fk_parts_customer_id_customers', type_='foreignkey')
+        batch_op.drop_column('customer_id')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_index('ix_orders_customer_id_due_date')
+        batch_op.drop_constraint('fk_orders_customer_id_customers', type_='foreignkey')
+        batch_op.drop_column('customer_id')
@@ -0,0 +1,46 @@
+"""add order summaries
+
+Revision ID: 3a9c6e2b5d48
+Revises: 2f7b1c4d9e36
+Create Date: 2026-10-19 23:12:48.407715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9c6e2b5d48'
+down_revision: Union[str, None] = '2f7b1c4d9e36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_summaries',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('order_number', sa.String(), nullable=True),
+    sa.Column('customer', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('line_count', sa.Integer(), nullable=True),
+    sa.Column('open_line_count', sa.Integer(), nullable=True),
+    sa.Column('total_quantity', sa.Integer(), nullable=True),
+    sa.Column('total_value', sa.Float(), nullable=True),
+    sa.Column('run_count', sa.Integer(), nullable=True),
+    sa.Column('produced_quantity', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index(op.f('ix_order_summaries_due_date'), 'order_summaries', ['due_date'], unique=False)
+    op.create_index('ix_order_summaries_status_due_date', 'order_summaries', ['status', 'due_date'], unique=False)
+    # Existing orders are summarized with `python -m app.order_summaries`
+
+
+def downgrade() -> None:
+    op.drop_index('ix_order_summaries_status_due_date', table_name='order_summaries')
+    op.drop_index(op.f('ix_order_summaries_due_date'), table_name='order_summaries')
+    op.drop_table('order_summaries')
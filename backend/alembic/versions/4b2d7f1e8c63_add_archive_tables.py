@@ -0,0 +1,92 @@
+"""add archive tables
+
+Revision ID: 4b2d7f1e8c63
+Revises: 3a9c6e2b5d48
+Create Date: 2026-10-20 09:41:05.118240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b2d7f1e8c63'
+down_revision: Union[str, None] = '3a9c6e2b5d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('archived_orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_number', sa.String(), nullable=True),
+    sa.Column('customer', sa.String(), nullable=True),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.Column('due_date', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_orders_customer_id'), 'archived_orders', ['customer_id'], unique=False)
+    op.create_index(op.f('ix_archived_orders_order_number'), 'archived_orders', ['order_number'], unique=False)
+    op.create_table('archived_quality_checks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('part_id', sa.Integer(), nullable=True),
+    sa.Column('inventory_item_id', sa.Integer(), nullable=True),
+    sa.Column('check_date', sa.DateTime(), nullable=True),
+    sa.Column('quantity_checked', sa.Integer(), nullable=True),
+    sa.Column('quantity_rejected', sa.Integer(), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_archived_quality_checks_part_id_check_date', 'archived_quality_checks', ['part_id', 'check_date'], unique=False)
+    op.create_table('archived_order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('part_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['archived_orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_order_items_order_id'), 'archived_order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_archived_order_items_part_id'), 'archived_order_items', ['part_id'], unique=False)
+    op.create_table('archived_production_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('order_item_id', sa.Integer(), nullable=True),
+    sa.Column('machine_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('start_date', sa.DateTime(), nullable=True),
+    sa.Column('end_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['archived_orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_production_runs_order_id'), 'archived_production_runs', ['order_id'], unique=False)
+    # Move existing history with `python -m app.archive`
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_archived_production_runs_order_id'), table_name='archived_production_runs')
+    op.drop_table('archived_production_runs')
+    op.drop_index(op.f('ix_archived_order_items_part_id'), table_name='archived_order_items')
+    op.drop_index(op.f('ix_archived_order_items_order_id'), table_name='archived_order_items')
+    op.drop_table('archived_order_items')
+    op.drop_index('ix_archived_quality_checks_part_id_check_date', table_name='archived_quality_checks')
+    op.drop_table('archived_quality_checks')
+    op.drop_index(op.f('ix_archived_orders_order_number'), table_name='archived_orders')
+    op.drop_index(op.f('ix_archived_orders_customer_id'), table_name='archived_orders')
+    op.drop_table('archived_orders')
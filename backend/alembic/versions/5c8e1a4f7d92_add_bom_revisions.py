@@ -0,0 +1,35 @@
+"""add bom revisions
+
+Revision ID: 5c8e1a4f7d92
+Revises: 4b2d7f1e8c63
+Create Date: 2026-10-20 14:12:37.604519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e1a4f7d92'
+down_revision: Union[str, None] = '4b2d7f1e8c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('boms') as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('effective_from', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('effective_to', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_boms_part_id_effective_from', ['part_id', 'effective_from'], unique=False)
+    # Existing BOMs become revision 1, in effect with open start and end
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('boms') as batch_op:
+        batch_op.drop_index('ix_boms_part_id_effective_from')
+        batch_op.drop_column('effective_to')
+        batch_op.drop_column('effective_from')
+        batch_op.drop_column('revision')
@@ -0,0 +1,28 @@
+"""add inventory item version
+
+Revision ID: 6e3a9d2c5b17
+Revises: 5c8e1a4f7d92
+Create Date: 2026-10-21 10:03:52.771046
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e3a9d2c5b17'
+down_revision: Union[str, None] = '5c8e1a4f7d92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('inventory_items') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('inventory_items') as batch_op:
+        batch_op.drop_column('version')
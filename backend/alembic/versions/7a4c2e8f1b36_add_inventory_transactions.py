@@ -0,0 +1,38 @@
+"""add inventory transactions
+
+Revision ID: 7a4c2e8f1b36
+Revises: 6e3a9d2c5b17
+Create Date: 2026-10-21 16:47:20.318592
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4c2e8f1b36'
+down_revision: Union[str, None] = '6e3a9d2c5b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('inventory_item_id', sa.Integer(), nullable=False),
+    sa.Column('transaction_type', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('location', sa.String(), nullable=True),
+    sa.Column('reference', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['inventory_item_id'], ['inventory_items.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_inventory_transactions_inventory_item_id_created_at', 'inventory_transactions', ['inventory_item_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_transactions_inventory_item_id_created_at', table_name='inventory_transactions')
+    op.drop_table('inventory_transactions')
@@ -0,0 +1,46 @@
+"""add foreign key indexes
+
+Revision ID: 7c2e9a41d5b8
+Revises: 044e4356da6c
+Create Date: 2026-10-19 18:05:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e9a41d5b8'
+down_revision: Union[str, None] = '044e4356da6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_boms_part_id'), 'boms', ['part_id'], unique=False)
+    op.create_index(op.f('ix_bom_items_bom_id'), 'bom_items', ['bom_id'], unique=False)
+    op.create_index(op.f('ix_bom_steps_bom_id'), 'bom_steps', ['bom_id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_part_id'), 'order_items', ['part_id'], unique=False)
+    op.create_index('ix_inventory_items_material_id_status', 'inventory_items', ['material_id', 'status'], unique=False)
+    op.create_index(op.f('ix_production_runs_order_id'), 'production_runs', ['order_id'], unique=False)
+    op.create_index(op.f('ix_production_runs_order_item_id'), 'production_runs', ['order_item_id'], unique=False)
+    op.create_index(op.f('ix_purchase_order_items_po_id'), 'purchase_order_items', ['po_id'], unique=False)
+    op.create_index(op.f('ix_purchase_order_items_material_id'), 'purchase_order_items', ['material_id'], unique=False)
+    op.create_index('ix_quality_checks_part_id_check_date', 'quality_checks', ['part_id', 'check_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_quality_checks_part_id_check_date', table_name='quality_checks')
+    op.drop_index(op.f('ix_purchase_order_items_material_id'), table_name='purchase_order_items')
+    op.drop_index(op.f('ix_purchase_order_items_po_id'), table_name='purchase_order_items')
+    op.drop_index(op.f('ix_production_runs_order_item_id'), table_name='production_runs')
+    op.drop_index(op.f('ix_production_runs_order_id'), table_name='production_runs')
+    op.drop_index('ix_inventory_items_material_id_status', table_name='inventory_items')
+    op.drop_index(op.f('ix_order_items_part_id'), table_name='order_items')
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index(op.f('ix_bom_steps_bom_id'), table_name='bom_steps')
+    op.drop_index(op.f('ix_bom_items_bom_id'), table_name='bom_items')
+    op.drop_index(op.f('ix_boms_part_id'), table_name='boms')
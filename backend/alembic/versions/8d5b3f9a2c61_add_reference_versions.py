@@ -0,0 +1,47 @@
+"""add reference versions
+
+Revision ID: 8d5b3f9a2c61
+Revises: 7a4c2e8f1b36
+Create Date: 2026-10-22 11:25:08.940317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d5b3f9a2c61'
+down_revision: Union[str, None] = '7a4c2e8f1b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('parts', 'materials', 'suppliers', 'customers')
+EVENTS = ('UPDATE', 'DELETE')
+
+
+def upgrade() -> None:
+    op.create_table('reference_versions',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    # Same triggers as app.reference_cache.TRIGGERS
+    for table in TABLES:
+        for event in EVENTS:
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_reference_version_{event.lower()} "
+                f"AFTER {event} ON {table} "
+                "BEGIN "
+                f"INSERT INTO reference_versions (table_name, version) VALUES ('{table}', 1) "
+                "ON CONFLICT (table_name) DO UPDATE SET version = version + 1; "
+                "END"
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        for event in EVENTS:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_reference_version_{event.lower()}")
+    op.drop_table('reference_versions')
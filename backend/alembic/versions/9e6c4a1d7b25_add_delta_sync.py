@@ -0,0 +1,58 @@
+"""add delta sync
+
+Revision ID: 9e6c4a1d7b25
+Revises: 8d5b3f9a2c61
+Create Date: 2026-10-23 10:12:47.305518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e6c4a1d7b25'
+down_revision: Union[str, None] = '8d5b3f9a2c61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('orders', 'order_items', 'inventory_items', 'production_runs', 'customers')
+
+
+def upgrade() -> None:
+    op.create_table('tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstones_deleted_at_table_name', 'tombstones', ['deleted_at', 'table_name'], unique=False)
+    op.create_index(op.f('ix_orders_updated_at'), 'orders', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_order_items_updated_at'), 'order_items', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_inventory_items_last_updated'), 'inventory_items', ['last_updated'], unique=False)
+    op.create_index(op.f('ix_production_runs_updated_at'), 'production_runs', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_customers_updated_at'), 'customers', ['updated_at'], unique=False)
+    # Same triggers as app.delta_sync.TRIGGERS
+    for table in TABLES:
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_tombstone "
+            f"AFTER DELETE ON {table} "
+            "BEGIN "
+            "INSERT INTO tombstones (table_name, row_id, deleted_at) "
+            f"VALUES ('{table}', OLD.id, strftime('%Y-%m-%d %H:%M:%f', 'now')); "
+            "END"
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_tombstone")
+    op.drop_index(op.f('ix_customers_updated_at'), table_name='customers')
+    op.drop_index(op.f('ix_production_runs_updated_at'), table_name='production_runs')
+    op.drop_index(op.f('ix_inventory_items_last_updated'), table_name='inventory_items')
+    op.drop_index(op.f('ix_order_items_updated_at'), table_name='order_items')
+    op.drop_index(op.f('ix_orders_updated_at'), table_name='orders')
+    op.drop_index('ix_tombstones_deleted_at_table_name', table_name='tombstones')
+    op.drop_table('tombstones')
@@ -0,0 +1,33 @@
+"""add version columns
+
+Revision ID: a41f6d2b8e03
+Revises: 7c2e9a41d5b8
+Create Date: 2026-10-19 18:31:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6d2b8e03'
+down_revision: Union[str, None] = '7c2e9a41d5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('purchase_orders', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('boms', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('boms') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('purchase_orders') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('version')
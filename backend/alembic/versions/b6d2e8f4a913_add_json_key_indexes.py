@@ -0,0 +1,42 @@
+"""add json key indexes
+
+Revision ID: b6d2e8f4a913
+Revises: 9e6c4a1d7b25
+Create Date: 2026-10-24 09:41:18.662104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2e8f4a913'
+down_revision: Union[str, None] = '9e6c4a1d7b25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same indexes as the MRP_JSON_INDEXES default in app.json_fields
+INDEXES = (
+    ('materials', 'specifications', 'grade'),
+    ('materials', 'specifications', 'melt_flow'),
+    ('suppliers', 'contact_info', 'email'),
+)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        return
+    for table, column, key in INDEXES:
+        if dialect == 'postgresql':
+            expression = f"({column} #>> '{{{key}}}')"
+        else:
+            expression = f"json_extract({column}, '$.{key}')"
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_{key} ON {table} ({expression})")
+
+
+def downgrade() -> None:
+    for table, column, key in reversed(INDEXES):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_{key}")
@@ -0,0 +1,44 @@
+"""add quality rollups
+
+Revision ID: c58d0e7f1a26
+Revises: a41f6d2b8e03
+Create Date: 2026-10-19 18:58:03.114529
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58d0e7f1a26'
+down_revision: Union[str, None] = 'a41f6d2b8e03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('quality_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('part_id', sa.Integer(), nullable=True),
+    sa.Column('period', sa.String(), nullable=True),
+    sa.Column('period_start', sa.DateTime(), nullable=True),
+    sa.Column('checks', sa.Integer(), nullable=True),
+    sa.Column('quantity_checked', sa.Integer(), nullable=True),
+    sa.Column('quantity_rejected', sa.Integer(), nullable=True),
+    sa.Column('passed', sa.Integer(), nullable=True),
+    sa.Column('failed', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['part_id'], ['parts.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'period_start', 'part_id', name='uq_quality_rollups_period_start_part')
+    )
+    op.create_index(op.f('ix_quality_rollups_id'), 'quality_rollups', ['id'], unique=False)
+    op.create_index('ix_quality_rollups_part_period_start', 'quality_rollups', ['part_id', 'period', 'period_start'], unique=False)
+    # Existing checks are rolled up with `python -m app.quality_rollups`
+
+
+def downgrade() -> None:
+    op.drop_index('ix_quality_rollups_part_period_start', table_name='quality_rollups')
+    op.drop_index(op.f('ix_quality_rollups_id'), table_name='quality_rollups')
+    op.drop_table('quality_rollups')
@@ -0,0 +1,55 @@
+"""add machine oee metrics
+
+Revision ID: d93b4c6e2f17
+Revises: c58d0e7f1a26
+Create Date: 2026-10-19 19:34:26.530871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b4c6e2f17'
+down_revision: Union[str, None] = 'c58d0e7f1a26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('machine_shift_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('machine_id', sa.Integer(), nullable=True),
+    sa.Column('shift_start', sa.DateTime(), nullable=True),
+    sa.Column('planned_minutes', sa.Float(), nullable=True),
+    sa.Column('downtime_minutes', sa.Float(), nullable=True),
+    sa.Column('run_minutes', sa.Float(), nullable=True),
+    sa.Column('ideal_minutes', sa.Float(), nullable=True),
+    sa.Column('total_count', sa.Float(), nullable=True),
+    sa.Column('good_count', sa.Float(), nullable=True),
+    sa.Column('availability', sa.Float(), nullable=True),
+    sa.Column('performance', sa.Float(), nullable=True),
+    sa.Column('quality', sa.Float(), nullable=True),
+    sa.Column('oee', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['machine_id'], ['machines.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('machine_id', 'shift_start', name='uq_machine_shift_metrics_machine_shift')
+    )
+    op.create_index(op.f('ix_machine_shift_metrics_id'), 'machine_shift_metrics', ['id'], unique=False)
+    with op.batch_alter_table('production_runs') as batch_op:
+        batch_op.add_column(sa.Column('machine_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_production_runs_machine_id_machines', 'machines', ['machine_id'], ['id'])
+        batch_op.create_index('ix_production_runs_machine_id_start_date', ['machine_id', 'start_date'], unique=False)
+    op.create_index('ix_maintenance_records_machine_id_start_time', 'maintenance_records', ['machine_id', 'start_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_maintenance_records_machine_id_start_time', table_name='maintenance_records')
+    with op.batch_alter_table('production_runs') as batch_op:
+        batch_op.drop_index('ix_production_runs_machine_id_start_date')
+        batch_op.drop_constraint('fk_production_runs_machine_id_machines', type_='foreignkey')
+        batch_op.drop_column('machine_id')
+    op.drop_index(op.f('ix_machine_shift_metrics_id'), table_name='machine_shift_metrics')
+    op.drop_table('machine_shift_metrics')
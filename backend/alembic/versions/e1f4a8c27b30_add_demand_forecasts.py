@@ -0,0 +1,42 @@
+"""add demand forecasts
+
+Revision ID: e1f4a8c27b30
+Revises: d93b4c6e2f17
+Create Date: 2026-10-19 20:12:41.508316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f4a8c27b30'
+down_revision: Union[str, None] = 'd93b4c6e2f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('demand_forecasts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('part_id', sa.Integer(), nullable=True),
+    sa.Column('method', sa.String(), nullable=True),
+    sa.Column('alpha', sa.Float(), nullable=True),
+    sa.Column('weekly_quantity', sa.Float(), nullable=True),
+    sa.Column('average_interval', sa.Float(), nullable=True),
+    sa.Column('demand_weeks', sa.Integer(), nullable=True),
+    sa.Column('history_weeks', sa.Integer(), nullable=True),
+    sa.Column('generated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['part_id'], ['parts.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('part_id')
+    )
+    op.create_index(op.f('ix_demand_forecasts_id'), 'demand_forecasts', ['id'], unique=False)
+    # Forecasts are generated with `python -m app.forecasting`
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_demand_forecasts_id'), table_name='demand_forecasts')
+    op.drop_table('demand_forecasts')
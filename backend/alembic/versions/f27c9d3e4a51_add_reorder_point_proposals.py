@@ -0,0 +1,49 @@
+"""add reorder point proposals
+
+Revision ID: f27c9d3e4a51
+Revises: e1f4a8c27b30
+Create Date: 2026-10-19 20:47:09.231874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f27c9d3e4a51'
+down_revision: Union[str, None] = 'e1f4a8c27b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('materials', sa.Column('safety_stock', sa.Float(), nullable=True))
+    op.create_table('reorder_point_proposals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('material_id', sa.Integer(), nullable=True),
+    sa.Column('service_level', sa.Float(), nullable=True),
+    sa.Column('history_weeks', sa.Integer(), nullable=True),
+    sa.Column('lead_time_days', sa.Float(), nullable=True),
+    sa.Column('mean_weekly_demand', sa.Float(), nullable=True),
+    sa.Column('std_weekly_demand', sa.Float(), nullable=True),
+    sa.Column('safety_stock', sa.Float(), nullable=True),
+    sa.Column('reorder_point', sa.Float(), nullable=True),
+    sa.Column('current_safety_stock', sa.Float(), nullable=True),
+    sa.Column('current_reorder_point', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('generated_at', sa.DateTime(), nullable=True),
+    sa.Column('applied_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['material_id'], ['materials.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('material_id')
+    )
+    op.create_index(op.f('ix_reorder_point_proposals_id'), 'reorder_point_proposals', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reorder_point_proposals_id'), table_name='reorder_point_proposals')
+    op.drop_table('reorder_point_proposals')
+    with op.batch_alter_table('materials') as batch_op:
+        batch_op.drop_column('safety_stock')
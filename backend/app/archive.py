@@ -0,0 +1,137 @@
+"""Move closed history out of the hot tables.
+
+Completed and cancelled orders untouched for ``ARCHIVE_AFTER_DAYS`` move with
+their lines and production runs into ``archived_orders``,
+``archived_order_items`` and ``archived_production_runs``; quality checks
+older than the cutoff move into ``archived_quality_checks``. Each chunk of
+``BATCH_SIZE`` rows is copied and deleted in its own transaction, so the
+job can run while the API is up and be stopped at any point.
+
+Kept hot regardless of age:
+
+* orders whose runs produced or consumed inventory lots, so traceability
+  keeps working;
+* the newest row of each table, so SQLite never hands an archived id out
+  again.
+
+List routes include archived rows with ``?include_archived=true``. Run with::
+
+    python -m app.archive --days 365
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import DateTime, func, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from . import models, order_summaries
+
+ARCHIVE_AFTER_DAYS = 365
+BATCH_SIZE = 500
+CLOSED_STATUSES = ("completed", "cancelled")
+
+
+def _copy(db: Session, model, archived, condition, archived_at: Optional[datetime] = None):
+    """INSERT ... SELECT the rows of ``model`` matching ``condition`` into ``archived``."""
+    columns = [column.name for column in model.__table__.columns]
+    selected = [model.__table__.c[name] for name in columns]
+    if archived_at is not None:
+        columns.append("archived_at")
+        selected.append(literal(archived_at, DateTime()))
+    db.execute(insert(archived.__table__).from_select(columns, select(*selected).where(condition)))
+
+
+def _newest_ids(db: Session, model, owner_column) -> List[int]:
+    """Owner ids of the row holding ``model``'s highest id."""
+    newest = db.query(func.max(model.id)).scalar_subquery()
+    return [owner for (owner,) in db.query(owner_column).filter(model.id == newest)]
+
+
+def _eligible_orders(db: Session, cutoff: datetime, after_id: int, batch_size: int, keep: List[int]) -> List[int]:
+    Order, Run = models.Order, models.ProductionRun
+    traced_runs = select(Run.order_id).where(or_(
+        Run.id.in_(select(models.InventoryItem.production_run_id).where(models.InventoryItem.production_run_id.isnot(None))),
+        Run.id.in_(select(models.InventoryConsumption.production_run_id)),
+    ))
+    return [
+        order_id for (order_id,) in db.query(Order.id).filter(
+            Order.id > after_id,
+            Order.status.in_(CLOSED_STATUSES),
+            Order.updated_at < cutoff,
+            Order.id.notin_(keep),
+            Order.id.notin_(traced_runs),
+        ).order_by(Order.id).limit(batch_size)
+    ]
+
+
+def archive_orders(db: Session, cutoff: datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Archive closed orders last updated before ``cutoff``. Returns the count."""
+    Order, Item, Run = models.Order, models.OrderItem, models.ProductionRun
+    keep = (
+        _newest_ids(db, Order, Order.id)
+        + _newest_ids(db, Item, Item.order_id)
+        + _newest_ids(db, Run, Run.order_id)
+    )
+    last_id, total = 0, 0
+    while True:
+        ids = _eligible_orders(db, cutoff, last_id, batch_size, keep)
+        if not ids:
+            break
+        now = datetime.utcnow()
+        _copy(db, Order, models.ArchivedOrder, Order.id.in_(ids), now)
+        _copy(db, Item, models.ArchivedOrderItem, Item.order_id.in_(ids))
+        _copy(db, Run, models.ArchivedProductionRun, Run.order_id.in_(ids))
+        db.query(Run).filter(Run.order_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Item).filter(Item.order_id.in_(ids)).delete(synchronize_session=False)
+        order_summaries.discard(db, ids)
+        db.query(Order).filter(Order.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        last_id, total = ids[-1], total + len(ids)
+    return total
+
+
+def archive_quality_checks(db: Session, cutoff: datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Archive quality checks dated before ``cutoff``. Returns the count."""
+    Check = models.QualityCheck
+    newest = db.query(func.max(Check.id)).scalar()
+    last_id, total = 0, 0
+    while True:
+        ids = [
+            check_id for (check_id,) in db.query(Check.id).filter(
+                Check.id > last_id, Check.id != newest, Check.check_date < cutoff,
+            ).order_by(Check.id).limit(batch_size)
+        ]
+        if not ids:
+            break
+        _copy(db, Check, models.ArchivedQualityCheck, Check.id.in_(ids), datetime.utcnow())
+        db.query(Check).filter(Check.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        last_id, total = ids[-1], total + len(ids)
+    return total
+
+
+def run(db: Session, days: int = ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE) -> dict:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return {
+        "orders": archive_orders(db, cutoff, batch_size),
+        "quality_checks": archive_quality_checks(db, cutoff, batch_size),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Archive closed orders and old quality checks")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="Age in days before a record is archived")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows moved per transaction")
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        result = run(session, args.days, args.batch_size)
+        print(f"Archived {result['orders']} orders and {result['quality_checks']} quality checks")
+    finally:
+        session.close()
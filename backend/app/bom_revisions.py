@@ -0,0 +1,199 @@
+"""BOM revisions with effectivity dates and as-of explosion.
+
+A part's BOM is a timeline of revisions. Each revision is in effect from
+``effective_from`` (open when null) until ``effective_to`` (exclusive, open
+when null); revisions of a part never overlap. Updating a BOM with an
+``effective_from`` date adds a revision instead of editing in place: the
+revision in effect on that date is closed there, the new one runs until the
+next planned revision (if any).
+
+Explosions go through ``BOMIndex``, which holds every revision and its lines
+in memory. The exploded usage of a part is memoized together with the window
+in which none of the revisions it went through changes, so a time-phased
+plan explodes each distinct combination of revisions once. The index is
+shared per process and reloaded after ``boms`` or ``bom_items`` commit a
+write, or after ``INDEX_SECONDS``.
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from . import models, table_versions
+
+INDEX_SECONDS = 60
+MAX_BOM_DEPTH = 20
+_TABLES = ("boms", "bom_items")
+_OPEN_START = datetime.min
+_OPEN_END = datetime.max
+
+
+class Revision(NamedTuple):
+    bom_id: int
+    revision: int
+    effective_from: Optional[datetime]
+    effective_to: Optional[datetime]
+
+
+# (low, high, material_id -> quantity per piece); the usage holds for low <= as_of < high
+Window = Tuple[datetime, datetime, Mapping[int, float]]
+
+
+def effective(as_of: datetime):
+    """Condition on ``models.BOM`` selecting the revisions in effect at ``as_of``."""
+    BOM = models.BOM
+    return and_(
+        or_(BOM.effective_from.is_(None), BOM.effective_from <= as_of),
+        or_(BOM.effective_to.is_(None), BOM.effective_to > as_of),
+    )
+
+
+def at(db: Session, part_id: int, as_of: Optional[datetime] = None) -> Optional[models.BOM]:
+    """The part's revision in effect at ``as_of`` (default now)."""
+    # Served by ix_boms_part_id_effective_from
+    return db.query(models.BOM).filter(
+        models.BOM.part_id == part_id, effective(as_of or datetime.utcnow())
+    ).order_by(models.BOM.effective_from.desc()).first()
+
+
+def open_revision(db: Session, part_id: int, effective_from: datetime) -> Tuple[int, Optional[datetime]]:
+    """Make room for a revision starting at ``effective_from``.
+
+    Closes the revision in effect on that date and returns the new revision
+    number and the date the new revision ends (the next planned revision's
+    start, or None).
+    """
+    BOM = models.BOM
+    revisions = db.query(BOM).filter(BOM.part_id == part_id).all()
+    if any(bom.effective_from == effective_from for bom in revisions):
+        raise HTTPException(status_code=409, detail=f"Part {part_id} already has a BOM revision effective from {effective_from}")
+    for bom in revisions:
+        if (bom.effective_from is None or bom.effective_from < effective_from) and (
+            bom.effective_to is None or bom.effective_to > effective_from
+        ):
+            bom.effective_to = effective_from
+            bom.version += 1
+    later = [bom.effective_from for bom in revisions if bom.effective_from is not None and bom.effective_from > effective_from]
+    number = max((bom.revision for bom in revisions), default=0) + 1
+    return number, min(later, default=None)
+
+
+def close_gap(db: Session, bom: models.BOM):
+    """Extend the revision ending where ``bom`` starts over ``bom``'s
+    window, before ``bom`` is deleted.
+    """
+    if bom.effective_from is None:
+        return
+    previous = db.query(models.BOM).filter(
+        models.BOM.part_id == bom.part_id, models.BOM.effective_to == bom.effective_from
+    ).first()
+    if previous is not None:
+        previous.effective_to = bom.effective_to
+        previous.version += 1
+
+
+class BOMIndex:
+    """Every BOM revision and line, loaded once."""
+
+    def __init__(self, db: Session):
+        BOM, BOMItem = models.BOM, models.BOMItem
+        timelines: Dict[int, List[Revision]] = {}
+        scrap: Dict[int, float] = {}
+        for bom in db.query(BOM.id, BOM.part_id, BOM.revision, BOM.effective_from, BOM.effective_to, BOM.scrap_rate):
+            timelines.setdefault(bom.part_id, []).append(
+                Revision(bom.id, bom.revision, bom.effective_from, bom.effective_to)
+            )
+            scrap[bom.id] = 1 + (bom.scrap_rate or 0.0) / 100
+        for revisions in timelines.values():
+            revisions.sort(key=lambda revision: revision.effective_from or _OPEN_START)
+        self.timelines = timelines
+        self._starts = {
+            part_id: [revision.effective_from or _OPEN_START for revision in revisions]
+            for part_id, revisions in timelines.items()
+        }
+
+        lines: Dict[int, List[Tuple[Optional[int], Optional[int], float]]] = {}
+        for bom_id, material_id, component_part_id, quantity in db.query(
+            BOMItem.bom_id, BOMItem.material_id, BOMItem.component_part_id, BOMItem.quantity
+        ):
+            lines.setdefault(bom_id, []).append((material_id, component_part_id, (quantity or 0.0) * scrap.get(bom_id, 1.0)))
+        self.lines = lines
+        self.material_names = dict(db.query(models.Material.id, models.Material.name))
+
+        self._windows: Dict[int, List[Window]] = {}
+        self._lock = threading.Lock()
+
+    def revision(self, part_id: int, as_of: datetime) -> Optional[Revision]:
+        revisions = self.timelines.get(part_id)
+        if not revisions:
+            return None
+        i = bisect_right(self._starts[part_id], as_of) - 1
+        if i < 0 or (revisions[i].effective_to is not None and revisions[i].effective_to <= as_of):
+            return None
+        return revisions[i]
+
+    def explode(self, part_id: int, as_of: datetime) -> Mapping[int, float]:
+        """Quantity of each material per piece of ``part_id`` built at
+        ``as_of``, through component parts, grossed up by each revision's
+        scrap rate.
+        """
+        with self._lock:
+            return self._explode(part_id, as_of, 0)[2]
+
+    def _gap(self, part_id: int, as_of: datetime) -> Tuple[datetime, datetime]:
+        """Window around ``as_of`` in which the part has no revision."""
+        revisions = self.timelines.get(part_id, ())
+        if not revisions:
+            return _OPEN_START, _OPEN_END
+        i = bisect_right(self._starts[part_id], as_of)
+        low = revisions[i - 1].effective_to if i else _OPEN_START
+        high = self._starts[part_id][i] if i < len(revisions) else _OPEN_END
+        return low, high
+
+    def _explode(self, part_id: int, as_of: datetime, depth: int) -> Window:
+        for window in self._windows.get(part_id, ()):
+            if window[0] <= as_of < window[1]:
+                return window
+        revision = self.revision(part_id, as_of)
+        usage: Dict[int, float] = {}
+        if revision is None:
+            low, high = self._gap(part_id, as_of)
+        else:
+            low, high = revision.effective_from or _OPEN_START, revision.effective_to or _OPEN_END
+            # The where-used index rejects cyclic BOMs, the depth cap only guards bad data
+            if depth < MAX_BOM_DEPTH:
+                for material_id, component_part_id, per_piece in self.lines.get(revision.bom_id, ()):
+                    if component_part_id is not None:
+                        component_low, component_high, component = self._explode(component_part_id, as_of, depth + 1)
+                        low, high = max(low, component_low), min(high, component_high)
+                        for row, quantity in component.items():
+                            usage[row] = usage.get(row, 0.0) + per_piece * quantity
+                    elif material_id is not None:
+                        usage[material_id] = usage.get(material_id, 0.0) + per_piece
+        window = (low, high, MappingProxyType(usage))
+        self._windows.setdefault(part_id, []).append(window)
+        return window
+
+
+_cached: Optional[Tuple[BOMIndex, Dict[str, int], float]] = None
+_cache_lock = threading.Lock()
+
+
+def index(db: Session) -> BOMIndex:
+    """The shared index, reloaded when the BOM tables changed."""
+    global _cached
+    with _cache_lock:
+        if _cached is not None:
+            cached, versions, loaded_at = _cached
+            if time.monotonic() - loaded_at < INDEX_SECONDS and table_versions.unchanged(versions, _TABLES):
+                return cached
+        versions = table_versions.snapshot()
+        loaded = BOMIndex(db)
+        _cached = (loaded, versions, time.monotonic())
+        return loaded
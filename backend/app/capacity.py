@@ -0,0 +1,184 @@
+"""Machine capacity calendar.
+
+Shifts repeat daily (see ``oee.SHIFT_DAY_START_HOUR``), so the scheduled time
+between the epoch and ``t`` has a closed form ``S(t)``. Each machine keeps its
+maintenance downtime as merged, sorted intervals together with prefix sums of
+the scheduled time inside them. Free capacity in ``[t1, t2]`` is then
+``S(t2) - S(t1)`` minus the scheduled downtime found with two bisections.
+
+The calendar is loaded lazily and kept current by the machine and
+maintenance routes; only the edited machine's index is rebuilt.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .dates import naive_utc
+from .oee import SHIFT_DAY_START_HOUR, SECONDS_PER_DAY
+
+_EPOCH = datetime(1970, 1, 1)
+# Maintenance still in progress without an end is treated as open ended
+_OPEN_END = (datetime(9999, 1, 1) - _EPOCH).total_seconds()
+# Full reload interval, picks up edits made by other processes
+RELOAD_SECONDS = 300
+
+
+def _seconds(when: datetime) -> float:
+    return (naive_utc(when) - _EPOCH).total_seconds()
+
+
+class MachineCapacity:
+    def __init__(self, machine_id: int, shifts: int, hours_per_shift: int):
+        self.machine_id = machine_id
+        self.shift_length = (hours_per_shift or 0) * 3600
+        self.shift_offsets = [SHIFT_DAY_START_HOUR * 3600 + k * self.shift_length for k in range(shifts or 0)]
+        self.records: Dict[int, Tuple[float, float]] = {}
+        self._starts: List[float] = []
+        self._ends: List[float] = []
+        self._prefix: List[float] = [0.0]
+        self._dirty = False
+
+    def scheduled_until(self, t: float) -> float:
+        """Scheduled shift seconds between the epoch and ``t``."""
+        total = 0.0
+        for offset in self.shift_offsets:
+            days, into = divmod(t - offset, SECONDS_PER_DAY)
+            total += days * self.shift_length + min(max(into, 0.0), self.shift_length)
+        return total
+
+    def set_record(self, record_id: int, interval: Optional[Tuple[float, float]]):
+        if interval is None:
+            self.records.pop(record_id, None)
+        else:
+            self.records[record_id] = interval
+        self._dirty = True
+
+    def _rebuild(self):
+        merged: List[List[float]] = []
+        for start, end in sorted(self.records.values()):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [s for s, _ in merged]
+        self._ends = [e for _, e in merged]
+        self._prefix = [0.0]
+        for start, end in merged:
+            self._prefix.append(self._prefix[-1] + self.scheduled_until(end) - self.scheduled_until(start))
+        self._dirty = False
+
+    def downtime(self, t1: float, t2: float) -> float:
+        """Scheduled seconds lost to maintenance in [t1, t2]."""
+        if self._dirty:
+            self._rebuild()
+        first = bisect_right(self._ends, t1)
+        last = bisect_left(self._starts, t2) - 1
+        if last < first:
+            return 0.0
+        lost = self._prefix[last + 1] - self._prefix[first]
+        if self._starts[first] < t1:
+            lost -= self.scheduled_until(t1) - self.scheduled_until(self._starts[first])
+        if self._ends[last] > t2:
+            lost -= self.scheduled_until(self._ends[last]) - self.scheduled_until(t2)
+        return lost
+
+    def free(self, t1: float, t2: float) -> dict:
+        scheduled = self.scheduled_until(t2) - self.scheduled_until(t1)
+        downtime = self.downtime(t1, t2)
+        return {
+            "machine_id": self.machine_id,
+            "scheduled_hours": scheduled / 3600,
+            "downtime_hours": downtime / 3600,
+            "free_hours": max(scheduled - downtime, 0.0) / 3600,
+        }
+
+
+def downtime_interval(record) -> Optional[Tuple[float, float]]:
+    if record.start_time is None:
+        return None
+    start = _seconds(record.start_time)
+    if record.end_time is not None:
+        return start, _seconds(record.end_time)
+    if record.duration_minutes:
+        return start, start + record.duration_minutes * 60
+    if record.status == "in_progress":
+        return start, _OPEN_END
+    return None
+
+
+class CapacityCalendar:
+    def __init__(self):
+        self._machines: Dict[int, MachineCapacity] = {}
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+
+    def load(self, db: Session):
+        machines = {
+            m.id: MachineCapacity(m.id, m.current_shifts, m.hours_per_shift)
+            for m in db.query(models.Machine.id, models.Machine.current_shifts, models.Machine.hours_per_shift)
+        }
+        records = db.query(
+            models.MaintenanceRecord.id,
+            models.MaintenanceRecord.machine_id,
+            models.MaintenanceRecord.start_time,
+            models.MaintenanceRecord.end_time,
+            models.MaintenanceRecord.duration_minutes,
+            models.MaintenanceRecord.status,
+        )
+        for record in records:
+            machine = machines.get(record.machine_id)
+            interval = downtime_interval(record)
+            if machine and interval:
+                machine.set_record(record.id, interval)
+        with self._lock:
+            self._machines = machines
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > RELOAD_SECONDS:
+            self.load(db)
+
+    def free_capacity(self, db: Session, machine_ids: Optional[Iterable[int]], start: datetime, end: datetime) -> List[dict]:
+        self._ensure_loaded(db)
+        t1, t2 = _seconds(start), _seconds(end)
+        with self._lock:
+            ids = sorted(self._machines) if machine_ids is None else list(machine_ids)
+            return [self._machines[i].free(t1, t2) for i in ids if i in self._machines]
+
+    def upsert_machine(self, machine):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            previous = self._machines.get(machine.id)
+            updated = MachineCapacity(machine.id, machine.current_shifts, machine.hours_per_shift)
+            if previous:
+                # Downtime prefix sums depend on the shift pattern, so re-add the records
+                for record_id, interval in previous.records.items():
+                    updated.set_record(record_id, interval)
+            self._machines[machine.id] = updated
+
+    def remove_machine(self, machine_id: int):
+        with self._lock:
+            self._machines.pop(machine_id, None)
+
+    def upsert_record(self, record):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            machine = self._machines.get(record.machine_id)
+            if machine:
+                machine.set_record(record.id, downtime_interval(record))
+
+    def remove_record(self, record_id: int, machine_id: int):
+        with self._lock:
+            machine = self._machines.get(machine_id)
+            if machine:
+                machine.set_record(record_id, None)
+
+
+calendar = CapacityCalendar()
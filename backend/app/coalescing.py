@@ -0,0 +1,114 @@
+"""Single-flight coalescing for expensive list endpoints.
+
+Concurrent identical GET requests (same path and query string) to one of
+the configured paths share a single run of the route: the first request
+computes the response, the rest wait for it and receive the same encoded
+bytes. A request only joins a computation if no write has committed since
+that computation started.
+
+A finished 200 response is also kept for ``MRP_COALESCE_TTL`` seconds (2 by
+default, 0 disables the cache) and served as long as none of the tables its
+queries read has a newer version (see ``table_versions``). A burst of
+terminals loading the same list then costs one query and one serialization
+per distinct request.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from . import table_versions
+
+COALESCE_TTL_SECONDS = float(os.getenv("MRP_COALESCE_TTL", "2"))
+MAX_ENTRIES = 256
+# Requests whose scope sets this key always run the route themselves
+BYPASS_SCOPE_KEY = "coalescing.bypass"
+
+
+class _Response(NamedTuple):
+    start: dict
+    body: bytes
+
+
+class _Entry(NamedTuple):
+    response: _Response
+    tables: Set[str]
+    versions: Dict[str, int]
+    expires: float
+
+
+class CoalescingMiddleware:
+    def __init__(self, app, paths: Iterable[str], ttl: float = COALESCE_TTL_SECONDS):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, bytes], _Entry] = {}
+        self._in_flight: Dict[Tuple[str, bytes, int], Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or scope["method"] != "GET"
+            or scope["path"] not in self.paths or scope.get(BYPASS_SCOPE_KEY)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], scope["query_string"])
+        entry = self._cache.get(key)
+        if entry is not None:
+            if entry.expires > time.monotonic() and table_versions.unchanged(entry.versions, entry.tables):
+                await self._replay(entry.response, send)
+                return
+            self._cache.pop(key, None)
+
+        flight_key = key + (table_versions.generation(),)
+        versions = table_versions.snapshot()
+        loop = asyncio.get_running_loop()
+        in_flight = self._in_flight.get(flight_key)
+        if in_flight is not None and in_flight[0] is loop:
+            response = await asyncio.shield(in_flight[1])
+            if response is not None:
+                await self._replay(response, send)
+                return
+
+        future = loop.create_future()
+        self._in_flight[flight_key] = (loop, future)
+        try:
+            response, tables = await self._compute(scope, receive)
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            self._in_flight.pop(flight_key, None)
+        future.set_result(response)
+
+        if response.start["status"] == 200 and self.ttl > 0:
+            self._store(key, _Entry(response, tables, versions, time.monotonic() + self.ttl))
+        await self._replay(response, send)
+
+    async def _compute(self, scope, receive) -> Tuple[_Response, Set[str]]:
+        start: Optional[dict] = None
+        body: List[bytes] = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        with table_versions.reading() as tables:
+            await self.app(scope, receive, capture)
+        return _Response(start, b"".join(body)), tables
+
+    def _store(self, key, entry: _Entry):
+        if len(self._cache) >= MAX_ENTRIES:
+            now = time.monotonic()
+            for stale in [k for k, e in self._cache.items() if e.expires <= now] or [next(iter(self._cache))]:
+                del self._cache[stale]
+        self._cache[key] = entry
+
+    @staticmethod
+    async def _replay(response: _Response, send):
+        await send(response.start)
+        await send({"type": "http.response.body", "body": response.body})
@@ -0,0 +1,89 @@
+"""Link orders and parts to ``customers`` rows.
+
+``Order.customer`` and ``Part.customer`` are free text. ``customer_id`` is
+set from them by a case and whitespace insensitive match on
+``Customer.name``; with duplicate names the oldest customer wins. Existing
+rows are backfilled in id-range chunks so no single statement locks a large
+table::
+
+    python -m app.customer_links --batch-size 5000
+"""
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import models, reference_cache
+
+BATCH_SIZE = 5000
+
+
+def _normalized(column):
+    return func.lower(func.trim(column))
+
+
+def resolve(db: Session, name: Optional[str], customer_id: Optional[int] = None) -> Optional[int]:
+    """``customer_id`` if given and valid, otherwise the customer named ``name``."""
+    if customer_id is not None:
+        reference_cache.require(db, models.Customer, [customer_id])
+        return customer_id
+    if not name:
+        return None
+    return db.query(func.min(models.Customer.id)).filter(
+        _normalized(models.Customer.name) == name.strip().lower()
+    ).scalar()
+
+
+def _match(model):
+    return select(func.min(models.Customer.id)).where(
+        _normalized(models.Customer.name) == _normalized(model.customer)
+    ).scalar_subquery()
+
+
+def _unlinked(db: Session, model) -> int:
+    return db.query(func.count(model.id)).filter(model.customer_id.is_(None)).scalar()
+
+
+def backfill(db: Session, model, batch_size: int = BATCH_SIZE) -> int:
+    """Set ``customer_id`` on unlinked rows of ``model``. Commits per chunk and
+    returns the number of rows linked.
+    """
+    before = _unlinked(db, model)
+    max_id = db.query(func.max(model.id)).scalar() or 0
+    for low in range(0, max_id + 1, batch_size):
+        db.execute(
+            update(model)
+            .where(model.id >= low, model.id < low + batch_size, model.customer_id.is_(None))
+            .values(customer_id=_match(model))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    return before - _unlinked(db, model)
+
+
+def link_new_customer(db: Session, customer: models.Customer):
+    """Point unlinked orders and parts carrying the new customer's name at it."""
+    for model in (models.Order, models.Part):
+        db.query(model).filter(
+            model.customer_id.is_(None),
+            _normalized(model.customer) == customer.name.strip().lower()
+        ).update({model.customer_id: customer.id}, synchronize_session=False)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Link orders and parts to customers by name")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per update statement")
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        for model in (models.Order, models.Part):
+            linked = backfill(session, model, args.batch_size)
+            print(f"{model.__tablename__}: linked {linked}, {_unlinked(session, model)} without a matching customer")
+    finally:
+        session.close()
@@ -1,6 +1,15 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import functools
+import random
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
 
 # Get the current directory
@@ -9,22 +18,121 @@ DATABASE_PATH = os.path.join(BASE_DIR, "mrp.db")
 
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+# How long SQLite waits on another writer's lock before raising "database is locked"
+BUSY_TIMEOUT_SECONDS = 5
+# Attempts and backoff of retry_on_busy
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT_SECONDS}
 )
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Session handed to every route in the current context, see shared_session
+_shared_session: ContextVar[Optional[Session]] = ContextVar("shared_session", default=None)
+
 # Dependency to get DB session
 def get_db():
+    shared = _shared_session.get()
+    if shared is not None:
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+@contextmanager
+def shared_session(db: Session):
+    """Make get_db hand out ``db`` (without closing it) inside the block."""
+    token = _shared_session.set(db)
+    try:
+        yield db
+    finally:
+        _shared_session.reset(token)
+
+def current_shared_session() -> Optional[Session]:
+    return _shared_session.get()
+
+def begin_outer_transaction() -> Connection:
+    """Connection inside a transaction that a Session can join with
+    ``join_transaction_mode="create_savepoint"``.
+
+    pysqlite only opens transactions right before DML, so a RELEASE
+    SAVEPOINT would commit for real. On SQLite this connection emits BEGIN
+    itself, IMMEDIATE so the write lock is taken up front rather than by a
+    failing upgrade halfway through. Hand it to end_outer_transaction when
+    done.
+    """
+    connection = engine.connect()
+    sqlite = engine.dialect.name == "sqlite"
+    if sqlite:
+        driver = connection.connection.driver_connection
+        connection.info["isolation_level"] = driver.isolation_level
+        driver.isolation_level = None
+    connection.begin()
+    if sqlite:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    return connection
+
+def end_outer_transaction(connection: Connection, commit: bool):
+    try:
+        if commit:
+            connection.commit()
+        else:
+            connection.rollback()
+    finally:
+        if "isolation_level" in connection.info:
+            connection.connection.driver_connection.isolation_level = connection.info.pop("isolation_level")
+        connection.close()
+
+def is_busy(exc: BaseException) -> bool:
+    """Whether ``exc`` is a lock or serialization failure that may pass on retry."""
+    if not isinstance(exc, DBAPIError):
+        return False
+    orig = exc.orig
+    if getattr(orig, "sqlite_errorname", "").startswith(("SQLITE_BUSY", "SQLITE_LOCKED")):
+        return True
+    # serialization_failure and deadlock_detected on PostgreSQL
+    if getattr(orig, "pgcode", None) in ("40001", "40P01"):
+        return True
+    return "database is locked" in str(orig)
+
+def retry_on_busy(route):
+    """Rerun a write route when its transaction fails with a busy or
+    serialization error.
+
+    The route's ``db`` session is rolled back and the whole route runs again
+    after a random (full jitter) exponential backoff, up to RETRY_ATTEMPTS
+    times. Routes sharing a batch session are not retried: the batch owns
+    the transaction.
+    """
+    @functools.wraps(route)
+    def wrapper(*args, **kwargs):
+        db = kwargs.get("db")
+        attempt = 0
+        while True:
+            try:
+                return route(*args, **kwargs)
+            except DBAPIError as exc:
+                attempt += 1
+                if not is_busy(exc) or db is None or current_shared_session() is not None or attempt >= RETRY_ATTEMPTS:
+                    raise
+            db.rollback()
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+    return wrapper
+
 def create_tables():
     # Import models here to avoid circular imports
-    from . import models
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from . import models, delta_sync, json_fields, reference_cache
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        reference_cache.create_triggers(connection)
+        delta_sync.create_triggers(connection)
+        json_fields.create_indexes(connection)
@@ -0,0 +1,16 @@
+"""Datetime helpers.
+
+Timestamps are stored as naive UTC. Clients may send aware values (the
+frontend sends ``toISOString()``, i.e. ``...Z``); routes pass them through
+``naive_utc`` before comparing them with stored values or doing arithmetic
+with naive ones.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """``value`` as naive UTC; naive values are taken to be UTC already."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,118 @@
+"""Delta sync of orders, inventory, production runs and customers.
+
+Offline clients and the ERP connector keep local replicas of these tables.
+Instead of downloading everything they pass the ``X-Sync-Watermark`` of
+their previous sync as ``?updated_since=`` and get only:
+
+* the rows whose ``updated_at`` (``last_updated`` on inventory) is at or
+  after the watermark, from ``/api/orders``, ``/api/inventory``,
+  ``/api/production-runs`` and ``/api/customers``. An order is also
+  returned when one of its lines changed;
+* the rows deleted since, from ``/api/sync/tombstones``. Deletes, including
+  archiving, are recorded by SQLite triggers, so bulk deletes and other
+  workers are covered too.
+
+Clients apply tombstones before changed rows; SQLite may hand the id of a
+deleted row out again.
+
+The watermark is taken before the rows are read and lies
+``OVERLAP_SECONDS`` in the past, so a write whose transaction committed
+after the read but was stamped earlier is sent again on the next sync.
+Clients upsert by id, so repeated rows are harmless.
+
+Tombstones are kept for ``TOMBSTONE_DAYS``; older watermarks get 410 and the
+client has to download everything again. Prune with::
+
+    python -m app.delta_sync
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .dates import naive_utc
+
+OVERLAP_SECONDS = 5
+TOMBSTONE_DAYS = 90
+WATERMARK_HEADER = "X-Sync-Watermark"
+
+TABLES = ("orders", "order_items", "inventory_items", "production_runs", "customers")
+
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {table}_tombstone
+AFTER DELETE ON {table}
+BEGIN
+    INSERT INTO tombstones (table_name, row_id, deleted_at)
+    VALUES ('{table}', OLD.id, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+END"""
+    for table in TABLES
+]
+
+
+def create_triggers(connection):
+    """Install the triggers on SQLite, see ``create_tables``."""
+    if connection.dialect.name != "sqlite":
+        return
+    for trigger in TRIGGERS:
+        connection.exec_driver_sql(trigger)
+
+
+class Delta:
+    """``?updated_since=`` on a list route."""
+
+    def __init__(
+        self,
+        updated_since: Optional[datetime] = Query(
+            None, description=f"Only rows changed since this {WATERMARK_HEADER} of a previous response"
+        ),
+    ):
+        now = datetime.utcnow()
+        self.watermark = now - timedelta(seconds=OVERLAP_SECONDS)
+        self.since = naive_utc(updated_since)
+        if self.since is not None and self.since < now - timedelta(days=TOMBSTONE_DAYS):
+            raise HTTPException(
+                status_code=410,
+                detail=f"Deletes are kept for {TOMBSTONE_DAYS} days, sync again without updated_since",
+            )
+
+    def apply(self, query, column, children: Optional[Tuple] = None):
+        """Keep the rows whose ``column`` is at or after ``updated_since``.
+
+        ``children`` is a child's (parent key, timestamp) pair; a parent is
+        then also kept when one of its children changed.
+        """
+        if self.since is None:
+            return query
+        condition = column >= self.since
+        if children is not None:
+            key, changed_at = children
+            parent_id = column.class_.id
+            condition = or_(condition, parent_id.in_(select(key).where(changed_at >= self.since)))
+        return query.filter(condition)
+
+    def respond(self, response: Response, result):
+        """Attach the watermark to ``result`` (or the route's response)."""
+        target = result if isinstance(result, Response) else response
+        target.headers[WATERMARK_HEADER] = self.watermark.isoformat() + "Z"
+        return result
+
+
+def prune(db: Session, days: int = TOMBSTONE_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    deleted = db.query(models.Tombstone).filter(models.Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        print(f"Pruned {prune(session)} tombstones older than {TOMBSTONE_DAYS} days")
+    finally:
+        session.close()
@@ -0,0 +1,137 @@
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+from typing import Dict, List, Optional, Set
+
+
+class FieldSelection:
+    """Column projection and relationship expansion requested through
+    ``?fields=`` and ``?expand=``.
+
+    ``fields`` is a comma separated list of column names. Columns of an
+    expanded relationship are addressed by their path, e.g.
+    ``fields=order_number,items.quantity&expand=items``. ``expand`` lists
+    the relationship paths to load, e.g. ``items.part.bom``. When neither
+    parameter is given the selection is inactive and routes fall back to
+    their full response model.
+    """
+
+    def __init__(self, model, fields: Optional[str] = None, expand: Optional[str] = None):
+        self.model = model
+        self.active = bool(fields or expand)
+        self._params = (fields, expand)
+        self.expand: List[str] = []
+        self.fields: Dict[str, Set[str]] = {}
+
+        for path in _split(expand):
+            parts = path.split(".")
+            # Expanding "items.part" implies expanding "items"
+            for i in range(1, len(parts) + 1):
+                prefix = ".".join(parts[:i])
+                if prefix not in self.expand:
+                    self.expand.append(prefix)
+        for path in self.expand:
+            self._mapper_for(path)
+
+        for name in _split(fields):
+            path, _, column = name.rpartition(".")
+            if path and path not in self.expand:
+                raise HTTPException(status_code=400, detail=f"Field '{name}' requires expand={path}")
+            columns = self._mapper_for(path).columns
+            if column not in columns:
+                raise HTTPException(status_code=400, detail=f"Unknown field '{name}'")
+            self.fields.setdefault(path, set()).add(column)
+
+    @classmethod
+    def for_model(cls, model):
+        """Build a dependency that reads ``fields``/``expand`` for ``model``."""
+        def dependency(
+            fields: Optional[str] = Query(None, description="Comma separated columns to return"),
+            expand: Optional[str] = Query(None, description="Comma separated relationships to embed"),
+        ):
+            return cls(model, fields, expand)
+        return dependency
+
+    def with_model(self, model) -> "FieldSelection":
+        """The same selection for a model with the same columns, such as an
+        archive table.
+        """
+        return FieldSelection(model, *self._params)
+
+    def apply(self, query):
+        """Restrict ``query`` to the requested columns and eager loads."""
+        if not self.active:
+            return query
+
+        options = []
+        top = self._columns_for("")
+        options.append(load_only(*[getattr(self.model, c) for c in top]))
+        for path in self.expand:
+            loader = None
+            cls = self.model
+            for attr in path.split("."):
+                rel = getattr(cls, attr)
+                loader = selectinload(rel) if loader is None else loader.selectinload(rel)
+                cls = rel.property.mapper.class_
+            columns = self._columns_for(path)
+            options.append(loader.load_only(*[getattr(cls, c) for c in columns]))
+        return query.options(*options)
+
+    def serialize(self, obj, path: str = "") -> dict:
+        data = {c: getattr(obj, c) for c in self._columns_for(path, public=True)}
+        prefix = f"{path}." if path else ""
+        for child in self.expand:
+            if not child.startswith(prefix) or "." in child[len(prefix):]:
+                continue
+            attr = child[len(prefix):]
+            value = getattr(obj, attr)
+            if value is None:
+                data[attr] = None
+            elif isinstance(value, list):
+                data[attr] = [self.serialize(v, child) for v in value]
+            else:
+                data[attr] = self.serialize(value, child)
+        return data
+
+    def response(self, result):
+        """Serialize a row or list of rows into a JSON response."""
+        if isinstance(result, list):
+            content = [self.serialize(obj) for obj in result]
+        else:
+            content = self.serialize(result)
+        return JSONResponse(content=jsonable_encoder(content))
+
+    def _mapper_for(self, path: str):
+        mapper = inspect(self.model)
+        if not path:
+            return mapper
+        for attr in path.split("."):
+            if attr not in mapper.relationships:
+                raise HTTPException(status_code=400, detail=f"Unknown relationship '{path}'")
+            mapper = mapper.relationships[attr].mapper
+        return mapper
+
+    def _columns_for(self, path: str, public: bool = False) -> List[str]:
+        mapper = self._mapper_for(path)
+        requested = self.fields.get(path)
+        if not requested:
+            return [c.key for c in mapper.column_attrs]
+
+        columns = set(requested) | {"id"}
+        if not public:
+            # Keep the keys needed to resolve the relationships loaded below this path
+            prefix = f"{path}." if path else ""
+            for child in self.expand:
+                attr = child[len(prefix):]
+                if child.startswith(prefix) and "." not in attr:
+                    rel = mapper.relationships[attr]
+                    columns |= {mapper.get_property_by_column(c).key for c in rel.local_columns}
+        return [c.key for c in mapper.column_attrs if c.key in columns]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [v.strip() for v in value.split(",") if v.strip()]
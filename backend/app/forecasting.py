@@ -0,0 +1,217 @@
+"""Weekly demand forecasts per part.
+
+Order history is read with one aggregate query, grouped by part and the
+Monday of the order's due week, into a parts x weeks matrix. Every part is
+then fitted at once:
+
+* simple exponential smoothing, with the smoothing constant picked per part
+  from ``SES_ALPHAS`` by one-step-ahead squared error,
+* Croston's method with the Syntetos-Boylan correction (SBA) for intermittent
+  parts, whose average interval between demands exceeds ``ADI_CUTOFF`` weeks.
+
+Each time step is a NumPy operation over all parts, so the only Python loop
+runs over weeks. Results replace the ``demand_forecasts`` table. Re-forecast
+with::
+
+    python -m app.forecasting --weeks 104
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+HISTORY_WEEKS = 104
+SES_ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.4, 0.5])
+CROSTON_ALPHA = 0.1
+# Syntetos-Boylan cut-off on the average inter-demand interval, in weeks
+ADI_CUTOFF = 1.32
+
+
+def week_start(when: datetime) -> datetime:
+    day = datetime(when.year, when.month, when.day)
+    return day - timedelta(days=day.weekday())
+
+
+def _week_bucket(db: Session, column):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("week", column)
+    # Next Sunday (or today if Sunday), minus six days: the Monday of the week
+    return func.date(column, "weekday 0", "-6 days")
+
+
+def weekly_demand(
+    db: Session,
+    start: datetime,
+    weeks: int,
+    exclude_statuses: Iterable[str] = ("cancelled",),
+    part_id: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Ordered quantity per part and week starting at ``start`` (a Monday),
+    including archived orders.
+
+    Returns the sorted part ids and a ``len(part_ids) x weeks`` matrix.
+    """
+    rows = []
+    for Order, OrderItem in ((models.Order, models.OrderItem), (models.ArchivedOrder, models.ArchivedOrderItem)):
+        bucket = _week_bucket(db, Order.due_date).label("week")
+        query = db.query(OrderItem.part_id, bucket, func.sum(OrderItem.quantity)).join(
+            Order, Order.id == OrderItem.order_id
+        ).filter(
+            Order.due_date >= start,
+            Order.due_date < start + timedelta(weeks=weeks),
+            or_(Order.status.is_(None), Order.status.notin_(list(exclude_statuses))),
+        )
+        if part_id is not None:
+            query = query.filter(OrderItem.part_id == part_id)
+        rows += query.group_by(OrderItem.part_id, bucket).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, weeks))
+
+    parts = np.array([row[0] for row in rows], dtype=np.int64)
+    days = np.array([str(row[1])[:10] for row in rows], dtype="datetime64[D]")
+    quantities = np.array([row[2] or 0 for row in rows], dtype=float)
+    week_idx = ((days - np.datetime64(start.date(), "D")).astype(np.int64) // 7).clip(0, weeks - 1)
+
+    part_ids, part_idx = np.unique(parts, return_inverse=True)
+    demand = np.zeros((len(part_ids), weeks))
+    np.add.at(demand, (part_idx, week_idx), quantities)
+    return part_ids, demand
+
+
+def fit(demand: np.ndarray) -> dict:
+    """Fit SES and SBA to every row of ``demand`` and pick one per row.
+
+    Rows must have at least one non-zero week. Weeks before a part's first
+    demand are ignored so new parts are not pulled towards zero.
+    """
+    n_parts, n_weeks = demand.shape
+    rows = np.arange(n_parts)
+    nonzero = demand > 0
+    first = nonzero.argmax(axis=1)
+    demand_weeks = nonzero.sum(axis=1)
+    average_interval = (n_weeks - first) / demand_weeks
+    initial = demand[rows, first]
+
+    alphas = SES_ALPHAS[:, None]
+    level = np.tile(initial, (len(SES_ALPHAS), 1))
+    squared_error = np.zeros_like(level)
+
+    size = initial.copy()
+    interval = average_interval.copy()
+    since_last = np.zeros(n_parts)
+
+    for t in range(n_weeks):
+        observed = demand[:, t]
+        active = t > first
+
+        error = np.where(active, observed - level, 0.0)
+        squared_error += error ** 2
+        level += alphas * error
+
+        since_last += active
+        hit = active & nonzero[:, t]
+        size = np.where(hit, size + CROSTON_ALPHA * (observed - size), size)
+        interval = np.where(hit, interval + CROSTON_ALPHA * (since_last - interval), interval)
+        since_last[hit] = 0
+
+    best = squared_error.argmin(axis=0)
+    ses = level[best, rows]
+    sba = (1 - CROSTON_ALPHA / 2) * size / interval
+    intermittent = average_interval > ADI_CUTOFF
+    return {
+        "method": np.where(intermittent, "sba", "ses"),
+        "alpha": np.where(intermittent, CROSTON_ALPHA, SES_ALPHAS[best]),
+        "weekly_quantity": np.maximum(np.where(intermittent, sba, ses), 0.0),
+        "average_interval": average_interval,
+        "demand_weeks": demand_weeks,
+    }
+
+
+def compute(db: Session, weeks: int = HISTORY_WEEKS, as_of: Optional[datetime] = None) -> dict:
+    """Re-forecast every part from the ``weeks`` full weeks before ``as_of``."""
+    end = week_start(as_of or datetime.utcnow())
+    start = end - timedelta(weeks=weeks)
+    part_ids, demand = weekly_demand(db, start, weeks)
+
+    db.query(models.DemandForecast).delete(synchronize_session=False)
+    result = {"parts": 0, "ses": 0, "sba": 0}
+    if len(part_ids):
+        fitted = fit(demand)
+        generated_at = datetime.utcnow()
+        db.bulk_insert_mappings(models.DemandForecast, [
+            {
+                "part_id": int(part_id),
+                "method": str(method),
+                "alpha": float(alpha),
+                "weekly_quantity": float(quantity),
+                "average_interval": float(adi),
+                "demand_weeks": int(demand_weeks),
+                "history_weeks": weeks,
+                "generated_at": generated_at,
+            }
+            for part_id, method, alpha, quantity, adi, demand_weeks in zip(
+                part_ids, fitted["method"], fitted["alpha"], fitted["weekly_quantity"],
+                fitted["average_interval"], fitted["demand_weeks"],
+            )
+        ])
+        result["parts"] = len(part_ids)
+        result["sba"] = int((fitted["method"] == "sba").sum())
+        result["ses"] = result["parts"] - result["sba"]
+    db.commit()
+    return result
+
+
+def planning_demand(db: Session, weeks: int = 12, part_id: Optional[int] = None) -> List[dict]:
+    """Planned quantity per part and week: the larger of firm and forecast demand.
+
+    Firm demand comes from open order lines due in the week; completed and
+    cancelled orders are left out.
+    """
+    start = week_start(datetime.utcnow())
+    firm_parts, firm = weekly_demand(db, start, weeks, ("cancelled", "completed"), part_id)
+
+    query = db.query(models.DemandForecast.part_id, models.DemandForecast.weekly_quantity)
+    if part_id is not None:
+        query = query.filter(models.DemandForecast.part_id == part_id)
+    forecasts = dict(query.all())
+
+    part_ids = np.union1d(firm_parts, np.array(list(forecasts), dtype=np.int64))
+    firm_matrix = np.zeros((len(part_ids), weeks))
+    firm_matrix[np.searchsorted(part_ids, firm_parts)] = firm
+    forecast = np.array([forecasts.get(int(p), 0.0) for p in part_ids])[:, None]
+    planned = np.maximum(firm_matrix, forecast)
+
+    week_starts = [start + timedelta(weeks=w) for w in range(weeks)]
+    return [
+        {
+            "part_id": int(part_ids[i]),
+            "week_start": week_starts[w],
+            "firm_quantity": float(firm_matrix[i, w]),
+            "forecast_quantity": float(forecast[i, 0]),
+            "planned_quantity": float(planned[i, w]),
+        }
+        for i in range(len(part_ids))
+        for w in range(weeks)
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Re-forecast weekly demand for every part")
+    parser.add_argument("--weeks", type=int, default=HISTORY_WEEKS, help="Number of weeks of history")
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        result = compute(session, args.weeks)
+        print(f"Forecast {result['parts']} parts ({result['ses']} SES, {result['sba']} SBA)")
+    finally:
+        session.close()
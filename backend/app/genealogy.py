@@ -0,0 +1,200 @@
+"""Lot genealogy.
+
+A production run consumes inventory lots (``inventory_consumptions``) and can
+put its output back into stock as new lots (``InventoryItem.production_run_id``).
+Every lot a run consumed is a parent of every lot it produced.
+``lot_genealogy`` holds the transitive closure of that relation: one row per
+(ancestor, descendant) pair with the fewest production steps between them.
+Forward and backward traces across any number of levels are then single
+indexed lookups instead of recursive walks.
+
+Closure rows are added set-based whenever a run gains inputs or outputs.
+Rebuild the table from the consumption links with::
+
+    python -m app.genealogy
+"""
+from typing import Optional
+
+from sqlalchemy import exists, func, literal, select, true, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import models
+
+_COLUMNS = ["ancestor_id", "descendant_id", "depth"]
+
+
+def _upsert(db: Session, source) -> int:
+    """Insert closure rows from ``source``, keeping the shorter depth on conflict."""
+    table = models.LotGenealogy.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = postgresql.insert(table).from_select(_COLUMNS, source)
+        shortest = func.least(table.c.depth, stmt.excluded.depth)
+    else:
+        stmt = sqlite.insert(table).from_select(_COLUMNS, source)
+        shortest = func.min(table.c.depth, stmt.excluded.depth)
+    stmt = stmt.on_conflict_do_update(index_elements=_COLUMNS[:2], set_={"depth": shortest})
+    return db.execute(stmt).rowcount
+
+
+def link_run(db: Session, run_id: int) -> int:
+    """Connect everything upstream of the run's inputs to everything
+    downstream of its outputs. Safe to call repeatedly; does not commit.
+    """
+    Genealogy, Consumption = models.LotGenealogy, models.InventoryConsumption
+    inputs = select(Consumption.inventory_item_id).where(Consumption.production_run_id == run_id)
+    outputs = select(models.InventoryItem.id).where(models.InventoryItem.production_run_id == run_id)
+
+    up = union_all(
+        select(Genealogy.ancestor_id.label("lot"), Genealogy.depth.label("depth")).where(Genealogy.descendant_id.in_(inputs)),
+        select(Consumption.inventory_item_id.label("lot"), literal(0).label("depth")).where(Consumption.production_run_id == run_id),
+    ).subquery("up")
+    down = union_all(
+        select(Genealogy.descendant_id.label("lot"), Genealogy.depth.label("depth")).where(Genealogy.ancestor_id.in_(outputs)),
+        select(models.InventoryItem.id.label("lot"), literal(0).label("depth")).where(models.InventoryItem.production_run_id == run_id),
+    ).subquery("down")
+
+    pairs = select(up.c.lot, down.c.lot, func.min(up.c.depth + down.c.depth + 1)).select_from(
+        up.join(down, true())
+    ).where(up.c.lot != down.c.lot).group_by(up.c.lot, down.c.lot)
+    return _upsert(db, pairs)
+
+
+def _direct_links():
+    Consumption, Item = models.InventoryConsumption, models.InventoryItem
+    return select(
+        Consumption.inventory_item_id.label("ancestor_id"), Item.id.label("descendant_id")
+    ).join(Item, Item.production_run_id == Consumption.production_run_id).where(
+        Consumption.inventory_item_id != Item.id
+    ).distinct().subquery("links")
+
+
+def rebuild(db: Session) -> int:
+    """Recompute ``lot_genealogy`` breadth first. Returns the row count."""
+    Genealogy = models.LotGenealogy
+    db.query(Genealogy).delete(synchronize_session=False)
+    links = _direct_links()
+    insert = Genealogy.__table__.insert()
+
+    total = db.execute(insert.from_select(
+        _COLUMNS, select(links.c.ancestor_id, links.c.descendant_id, literal(1))
+    )).rowcount
+    known = Genealogy.__table__.alias("known")
+    depth = 1
+    while True:
+        # Breadth first, so a pair is first reached at its shortest depth
+        extended = select(
+            Genealogy.ancestor_id, links.c.descendant_id, literal(depth + 1)
+        ).join(links, links.c.ancestor_id == Genealogy.descendant_id).where(
+            Genealogy.depth == depth,
+            Genealogy.ancestor_id != links.c.descendant_id,
+            ~exists().where(
+                known.c.ancestor_id == Genealogy.ancestor_id,
+                known.c.descendant_id == links.c.descendant_id,
+            ),
+        ).distinct()
+        added = db.execute(insert.from_select(_COLUMNS, extended)).rowcount
+        if not added:
+            break
+        total += added
+        depth += 1
+    db.commit()
+    return total
+
+
+def _descendants(lot_ids):
+    Genealogy = models.LotGenealogy
+    return union_all(
+        select(models.InventoryItem.id.label("lot"), literal(0).label("depth")).where(models.InventoryItem.id.in_(lot_ids)),
+        select(Genealogy.descendant_id.label("lot"), Genealogy.depth.label("depth")).where(Genealogy.ancestor_id.in_(lot_ids)),
+    ).subquery("lots")
+
+
+def _lots(db: Session, lots_subquery):
+    shortest = select(lots_subquery.c.lot, func.min(lots_subquery.c.depth).label("depth")).group_by(
+        lots_subquery.c.lot
+    ).subquery("shortest")
+    rows = db.query(models.InventoryItem, shortest.c.depth).join(
+        shortest, shortest.c.lot == models.InventoryItem.id
+    ).order_by(shortest.c.depth, models.InventoryItem.id).all()
+    return [{**_lot(item), "depth": depth} for item, depth in rows]
+
+
+def _lot(item) -> dict:
+    return {
+        "id": item.id,
+        "batch_number": item.batch_number,
+        "material_id": item.material_id,
+        "quantity": item.quantity,
+        "status": item.status,
+        "production_run_id": item.production_run_id,
+    }
+
+
+def _quality_checks(db: Session, lot_ids):
+    return db.query(models.QualityCheck).filter(
+        models.QualityCheck.inventory_item_id.in_(lot_ids)
+    ).order_by(models.QualityCheck.check_date).all()
+
+
+def forward(db: Session, batch_number: str) -> Optional[dict]:
+    """Lots made from batch ``batch_number`` and the orders that used any of them."""
+    sources = select(models.InventoryItem.id).where(models.InventoryItem.batch_number == batch_number)
+    lots = _lots(db, _descendants(sources))
+    if not lots:
+        return None
+    lot_ids = [lot["id"] for lot in lots]
+
+    runs = db.query(models.ProductionRun).filter(models.ProductionRun.id.in_(
+        select(models.InventoryConsumption.production_run_id).where(
+            models.InventoryConsumption.inventory_item_id.in_(lot_ids)
+        )
+    )).order_by(models.ProductionRun.id).all()
+    orders = db.query(models.Order).filter(
+        models.Order.id.in_({run.order_id for run in runs})
+    ).order_by(models.Order.id).all()
+    return {
+        "batch_number": batch_number,
+        "lots": lots,
+        "production_runs": runs,
+        "orders": orders,
+        "quality_checks": _quality_checks(db, lot_ids),
+    }
+
+
+def backward(db: Session, order: models.Order) -> dict:
+    """Every lot that went into ``order``, directly or further upstream."""
+    Genealogy, Consumption = models.LotGenealogy, models.InventoryConsumption
+    runs = db.query(models.ProductionRun).filter(
+        models.ProductionRun.order_id == order.id
+    ).order_by(models.ProductionRun.id).all()
+    consumed = select(Consumption.inventory_item_id).join(
+        models.ProductionRun, models.ProductionRun.id == Consumption.production_run_id
+    ).where(models.ProductionRun.order_id == order.id)
+    ancestry = union_all(
+        select(Consumption.inventory_item_id.label("lot"), literal(1).label("depth")).join(
+            models.ProductionRun, models.ProductionRun.id == Consumption.production_run_id
+        ).where(models.ProductionRun.order_id == order.id),
+        select(Genealogy.ancestor_id.label("lot"), (Genealogy.depth + 1).label("depth")).where(
+            Genealogy.descendant_id.in_(consumed)
+        ),
+    ).subquery("lots")
+    lots = _lots(db, ancestry)
+    return {
+        "order_id": order.id,
+        "order_number": order.order_number,
+        "production_runs": runs,
+        "lots": lots,
+        "quality_checks": _quality_checks(db, [lot["id"] for lot in lots]),
+    }
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(session)} lot genealogy rows")
+    finally:
+        session.close()
@@ -0,0 +1,245 @@
+"""Append-only inventory transaction ledger with group-commit ingestion.
+
+Every stock movement (receipt, issue, adjust, move) is stored as a row in
+``inventory_transactions`` and applied to its ``InventoryItem`` in the same
+transaction. ``quantity`` on the ledger row is the signed change; a move
+changes the lot's location and not its quantity.
+
+Besides ``POST /inventory/transactions``, the routes that change stock write
+their movements here too: production run consumptions issue through
+``record``, and new lots (``POST /inventory``, goods receipts) and
+``PUT /inventory/{id}`` log the receipt, adjustment or move they already
+wrote to the lot through ``log``. Deleting a lot writes no row.
+
+Submissions from ``POST /inventory/transactions`` are queued for one writer
+thread. It takes every submission that queued up while the previous
+transaction was committing and writes them together: one SELECT of the
+affected lots, one multi-row INSERT into the ledger and one executemany
+UPDATE that adds each lot's net change to ``quantity`` in SQL. Under load
+many movements share one commit. Because the lots are changed by relative
+UPDATEs inside a write-locked transaction, concurrent scans of the same lot
+cannot overwrite each other.
+
+A submission is all or nothing: an unknown lot or a movement that would take
+a lot below zero rejects that submission only, the rest of the group still
+commits.
+"""
+import asyncio
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import (
+    RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, begin_outer_transaction, end_outer_transaction, is_busy,
+)
+
+MAX_TRANSACTIONS = 1000  # per submission
+GROUP_SIZE = 5000  # movements per commit
+
+Type = schemas.InventoryTransactionType
+Movements = List[schemas.InventoryTransactionCreate]
+# Ledger rows written for a submission, or why it was rejected
+Result = Union[List[dict], HTTPException]
+
+
+def check(movements: Movements):
+    if not 1 <= len(movements) <= MAX_TRANSACTIONS:
+        raise HTTPException(status_code=400, detail=f"Submit 1 to {MAX_TRANSACTIONS} transactions")
+    for i, movement in enumerate(movements):
+        if movement.transaction_type in (Type.RECEIPT, Type.ISSUE) and movement.quantity <= 0:
+            raise HTTPException(status_code=400, detail=f"Transaction {i}: {movement.transaction_type.value} quantity must be positive")
+        if movement.transaction_type == Type.MOVE and not movement.location:
+            raise HTTPException(status_code=400, detail=f"Transaction {i}: move needs a location")
+
+
+def _change(movement: schemas.InventoryTransactionCreate) -> float:
+    if movement.transaction_type == Type.RECEIPT:
+        return movement.quantity
+    if movement.transaction_type == Type.ISSUE:
+        return -movement.quantity
+    if movement.transaction_type == Type.ADJUST:
+        return movement.quantity
+    return 0.0
+
+
+def _row(movement: schemas.InventoryTransactionCreate, now: datetime) -> dict:
+    return {
+        "inventory_item_id": movement.inventory_item_id,
+        "transaction_type": movement.transaction_type.value,
+        "quantity": _change(movement),
+        "location": movement.location if movement.transaction_type == Type.MOVE else None,
+        "reference": movement.reference,
+        "created_at": now,
+    }
+
+
+def apply(connection: Connection, submissions: List[Movements]) -> List[Result]:
+    """Write ``submissions`` in the transaction open on ``connection``."""
+    items = models.InventoryItem.__table__
+    ledger = models.InventoryTransaction.__table__
+    item_ids = {movement.inventory_item_id for movements in submissions for movement in movements}
+    balances = {
+        item_id: quantity or 0.0
+        for item_id, quantity in connection.execute(select(items.c.id, items.c.quantity).where(items.c.id.in_(item_ids)))
+    }
+
+    now = datetime.utcnow()
+    rows: List[dict] = []
+    spans: List[Union[Tuple[int, int], HTTPException]] = []
+    for movements in submissions:
+        after: Dict[int, float] = {}
+        try:
+            for movement in movements:
+                item_id = movement.inventory_item_id
+                if item_id not in balances:
+                    raise HTTPException(status_code=404, detail=f"Inventory item with id {item_id} not found")
+                after[item_id] = after.get(item_id, balances[item_id]) + _change(movement)
+                if after[item_id] < -1e-9:
+                    raise HTTPException(status_code=400, detail=f"Not enough stock in inventory item {item_id}")
+        except HTTPException as exc:
+            spans.append(exc)
+            continue
+        balances.update(after)
+        start = len(rows)
+        rows += [_row(movement, now) for movement in movements]
+        spans.append((start, len(rows)))
+    if not rows:
+        return spans
+
+    ids = connection.execute(insert(ledger).returning(ledger.c.id, sort_by_parameter_order=True), rows).scalars().all()
+    net: Dict[int, List] = {}
+    for row in rows:
+        change = net.setdefault(row["inventory_item_id"], [0.0, None])
+        change[0] += row["quantity"]
+        if row["location"] is not None:
+            change[1] = row["location"]
+    # Relative to the stored quantity, so writes from other routes are kept
+    connection.execute(
+        update(items).where(items.c.id == bindparam("item_id")).values(
+            quantity=func.coalesce(items.c.quantity, 0) + bindparam("change"),
+            location=func.coalesce(bindparam("new_location"), items.c.location),
+            version=items.c.version + 1,
+            last_updated=now,
+        ),
+        [{"item_id": item_id, "change": change, "new_location": location} for item_id, (change, location) in net.items()],
+    )
+    return [
+        span if isinstance(span, HTTPException) else [dict(rows[i], id=ids[i]) for i in range(*span)]
+        for span in spans
+    ]
+
+
+def record(db: Session, movements: Movements) -> List[dict]:
+    """Write and apply ``movements`` in ``db``'s transaction. Does not commit."""
+    result = apply(db.connection(), [movements])[0]
+    if isinstance(result, HTTPException):
+        raise result
+    return result
+
+
+def log(db: Session, movements: Movements):
+    """Write ledger rows for ``movements`` a route already made to its lots,
+    such as the opening quantity of a new lot. Does not commit.
+    """
+    if movements:
+        now = datetime.utcnow()
+        db.connection().execute(insert(models.InventoryTransaction.__table__), [_row(m, now) for m in movements])
+
+
+def apply_in_session(db: Session, movements: Movements) -> List[dict]:
+    """Write ``movements`` in ``db``'s transaction, for callers that already
+    hold one (such as an atomic batch).
+    """
+    result = record(db, movements)
+    db.commit()
+    return result
+
+
+class _Submission:
+    __slots__ = ("movements", "loop", "future")
+
+    def __init__(self, movements: Movements, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.movements = movements
+        self.loop = loop
+        self.future = future
+
+
+def _resolve(future: asyncio.Future, result: Union[Result, BaseException]):
+    if future.done():
+        return
+    if isinstance(result, BaseException):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
+
+
+class LedgerWriter:
+    """Single writer thread that group-commits queued submissions."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[_Submission]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    async def submit(self, movements: Movements) -> List[dict]:
+        check(movements)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._start()
+        self._queue.put(_Submission(movements, loop, future))
+        return await future
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inventory-ledger", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            group = [self._queue.get()]
+            size = len(group[0].movements)
+            # Whatever queued up during the last commit goes into this one
+            while size < GROUP_SIZE:
+                try:
+                    submission = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                group.append(submission)
+                size += len(submission.movements)
+            results = self._commit([submission.movements for submission in group])
+            for submission, result in zip(group, results):
+                submission.loop.call_soon_threadsafe(_resolve, submission.future, result)
+
+    def _commit(self, submissions: List[Movements]) -> List[Union[Result, BaseException]]:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                connection = begin_outer_transaction()
+                committed = False
+                try:
+                    results = apply(connection, submissions)
+                    committed = True
+                finally:
+                    end_outer_transaction(connection, committed)
+                return results
+            except DBAPIError as exc:
+                if not is_busy(exc) or attempt >= RETRY_ATTEMPTS:
+                    return [exc] * len(submissions)
+            except Exception as exc:
+                return [exc] * len(submissions)
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+
+writer = LedgerWriter()
@@ -0,0 +1,118 @@
+"""Indexed filters over keys of JSON columns.
+
+``Material.specifications`` and ``Supplier.contact_info`` are free-form
+JSON. Keys searched often get an expression index on the extracted value,
+created by ``create_tables``; ``MRP_JSON_INDEXES`` configures them as
+``table.column=key,key;...``, e.g.::
+
+    MRP_JSON_INDEXES="materials.specifications=grade,melt_flow;suppliers.contact_info=email"
+
+That default set also has an Alembic migration; databases upgraded with
+Alembic only get other keys from ``create_tables``.
+
+Filters are written ``key<op>value`` with ``=``, ``!=``, ``>``, ``>=``,
+``<`` or ``<=``, e.g. ``grade=PA66`` or ``melt_flow>20``; nested keys are
+dotted (``dimensions.width<5``). Values that parse as numbers compare as
+numbers, quote them (``grade="66"``) to compare as text. ``extract``
+renders exactly the expression the index was built on, so SQLite answers
+the filter from the index instead of reading every row; keys without an
+index still filter in SQL.
+
+On PostgreSQL the index is on the text value (``#>>``), which serves text
+comparisons; numeric comparisons cast and are not indexed.
+"""
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Float, cast, func, literal_column
+from sqlalchemy.sql import operators
+
+from .database import engine
+
+_KEY = r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*"
+_FILTER = re.compile(rf"^({_KEY})(>=|<=|!=|=|>|<)(.*)$")
+_OPERATORS = {
+    "=": operators.eq,
+    "!=": operators.ne,
+    ">": operators.gt,
+    ">=": operators.ge,
+    "<": operators.lt,
+    "<=": operators.le,
+}
+
+
+def _parse_config(value: str) -> Dict[Tuple[str, str], Tuple[str, ...]]:
+    indexed = {}
+    for entry in filter(None, (part.strip() for part in value.split(";"))):
+        target, _, keys = entry.partition("=")
+        table, _, column = target.strip().partition(".")
+        keys = tuple(key.strip() for key in keys.split(",") if key.strip())
+        if not re.fullmatch(r"\w+\.\w+", target.strip()) or not all(re.fullmatch(_KEY, key) for key in keys):
+            raise ValueError(f"Invalid MRP_JSON_INDEXES entry '{entry}'")
+        indexed[(table, column)] = keys
+    return indexed
+
+
+# (table, column) -> keys with an expression index
+INDEXED_KEYS = _parse_config(
+    os.getenv("MRP_JSON_INDEXES", "materials.specifications=grade,melt_flow;suppliers.contact_info=email")
+)
+
+
+def _path(dialect: str, key: str) -> str:
+    """The key as a SQL literal path; keys are checked against ``_KEY``."""
+    if dialect == "postgresql":
+        return "'{" + ",".join(key.split(".")) + "}'"
+    return f"'$.{key}'"
+
+
+def extract(column, key: str):
+    """The value at ``key`` in the JSON ``column``, as indexed."""
+    dialect = engine.dialect.name
+    path = literal_column(_path(dialect, key))
+    if dialect == "postgresql":
+        return column.op("#>>")(path)
+    return func.json_extract(column, path)
+
+
+def _value(raw: str) -> Any:
+    if len(raw) >= 2 and raw[0] == raw[-1] == '"':
+        return raw[1:-1]
+    for parse in (int, float):
+        try:
+            return parse(raw)
+        except ValueError:
+            pass
+    return raw
+
+
+def conditions(column, filters: List[str]) -> list:
+    """WHERE conditions on ``column`` for filters like ``melt_flow>20``."""
+    result = []
+    for text in filters:
+        match = _FILTER.match(text)
+        if match is None:
+            raise HTTPException(status_code=400, detail=f"Invalid filter '{text}', expected key<op>value with one of = != > >= < <=")
+        key, op, raw = match.groups()
+        value = _value(raw)
+        expression = extract(column, key)
+        if engine.dialect.name == "postgresql" and not isinstance(value, str):
+            expression = cast(expression, Float)
+        result.append(_OPERATORS[op](expression, value))
+    return result
+
+
+def create_indexes(connection):
+    """Create the configured expression indexes, see ``create_tables``."""
+    dialect = connection.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        return
+    for (table, column), keys in INDEXED_KEYS.items():
+        for key in keys:
+            path = _path(dialect, key)
+            expression = f"({column} #>> {path})" if dialect == "postgresql" else f"json_extract({column}, {path})"
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_{key.replace('.', '_')} ON {table} ({expression})"
+            )
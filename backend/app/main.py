@@ -1,10 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .routes import parts, inventory, production_runs, quality_checks, orders, purchase_orders, suppliers, customers, bom
-from .database import create_tables
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from .routes import parts, materials, inventory, production_runs, quality_checks, orders, purchase_orders, suppliers, customers, bom, machines, planning, traceability, scenarios, batch, sync, quotes
+from .database import create_tables, engine, is_busy
+from .coalescing import CoalescingMiddleware
+from . import table_versions
 
 app = FastAPI()
 
+# Share one computation between concurrent identical loads of the big lists;
+# added before CORS so per-origin headers are not replayed
+table_versions.track(engine)
+app.add_middleware(CoalescingMiddleware, paths=["/api/orders", "/api/inventory", "/api/production-runs"])
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -14,11 +24,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# A row changed between read and write (version_id_col mismatch)
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    return JSONResponse(status_code=409, content={"detail": "Record was modified by someone else, reload and retry"})
+
+# Still locked after retry_on_busy gave up: tell the client to come back
+@app.exception_handler(OperationalError)
+async def operational_error_handler(request: Request, exc: OperationalError):
+    if is_busy(exc):
+        return JSONResponse(status_code=503, content={"detail": "Database is busy, retry shortly"}, headers={"Retry-After": "1"})
+    raise exc
+
 # Create database tables
 create_tables()
 
 # Include routers
 app.include_router(parts.router, prefix="/api")
+app.include_router(materials.router, prefix="/api")
 app.include_router(inventory.router, prefix="/api")
 app.include_router(production_runs.router, prefix="/api")
 app.include_router(quality_checks.router, prefix="/api")
@@ -27,6 +50,13 @@ app.include_router(purchase_orders.router, prefix="/api")
 app.include_router(suppliers.router, prefix="/api")
 app.include_router(customers.router, prefix="/api")
 app.include_router(bom.router, prefix="/api")
+app.include_router(machines.router, prefix="/api")
+app.include_router(planning.router, prefix="/api")
+app.include_router(traceability.router, prefix="/api")
+app.include_router(scenarios.router, prefix="/api")
+app.include_router(batch.router, prefix="/api")
+app.include_router(sync.router, prefix="/api")
+app.include_router(quotes.router, prefix="/api")
 
 @app.get("/")
 async def root():
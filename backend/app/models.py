@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, DateTime, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, DateTime, Boolean, Enum, Index, UniqueConstraint, and_, bindparam, or_
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -13,19 +13,30 @@ class BOMItem(Base):
     __tablename__ = "bom_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    bom_id = Column(Integer, ForeignKey("boms.id"))
+    bom_id = Column(Integer, ForeignKey("boms.id"), index=True)
     material_name = Column(String)
     quantity = Column(Float)
     unit = Column(String)
     notes = Column(String, nullable=True)
+    # material_name resolved to a material or a component part, see app/where_used.py
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    component_part_id = Column(Integer, ForeignKey("parts.id"), nullable=True, index=True)
     
     bom = relationship("BOM", back_populates="materials")
 
+class WhereUsed(Base):
+    __tablename__ = "where_used"
+
+    item_type = Column(String, primary_key=True)  # material, part
+    item_id = Column(Integer, primary_key=True)
+    part_id = Column(Integer, ForeignKey("parts.id"), primary_key=True, index=True)
+    depth = Column(Integer)  # 1 = listed on the part's own BOM
+
 class BOMStep(Base):
     __tablename__ = "bom_steps"
     
     id = Column(Integer, primary_key=True, index=True)
-    bom_id = Column(Integer, ForeignKey("boms.id"))
+    bom_id = Column(Integer, ForeignKey("boms.id"), index=True)
     description = Column(String)
     time_minutes = Column(Float)
     cost_per_hour = Column(Float)
@@ -35,15 +46,24 @@ class BOMStep(Base):
 
 class BOM(Base):
     __tablename__ = "boms"
+    __table_args__ = (
+        Index("ix_boms_part_id_effective_from", "part_id", "effective_from"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    part_id = Column(Integer, ForeignKey("parts.id"))
+    part_id = Column(Integer, ForeignKey("parts.id"), index=True)
     cycle_time_seconds = Column(Float, nullable=True)
     cavities = Column(Integer, nullable=True)
     scrap_rate = Column(Float, nullable=True)
     notes = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Revision of the part's BOM in effect from effective_from (open when null)
+    # until effective_to (exclusive, open when null), see app/bom_revisions.py
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
+    effective_from = Column(DateTime, nullable=True)
+    effective_to = Column(DateTime, nullable=True)
     
-    part = relationship("Part", back_populates="bom")
+    part = relationship("Part", back_populates="boms")
     materials = relationship("BOMItem", back_populates="bom", cascade="all, delete-orphan")
     steps = relationship("BOMStep", back_populates="bom", cascade="all, delete-orphan")
 
@@ -71,13 +91,35 @@ class Material(Base):
     moq = Column(Float)  # Minimum Order Quantity
     lead_time_days = Column(Integer)
     reorder_point = Column(Float)
+    safety_stock = Column(Float, nullable=True)
     specifications = Column(JSON)  # Technical specifications
     
     supplier = relationship("Supplier", back_populates="materials")
     inventory_items = relationship("InventoryItem", back_populates="material")
 
+class ReorderPointProposal(Base):
+    __tablename__ = "reorder_point_proposals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), unique=True)
+    service_level = Column(Float)
+    history_weeks = Column(Integer)
+    lead_time_days = Column(Float)
+    mean_weekly_demand = Column(Float)
+    std_weekly_demand = Column(Float)
+    safety_stock = Column(Float)
+    reorder_point = Column(Float)
+    current_safety_stock = Column(Float, nullable=True)
+    current_reorder_point = Column(Float, nullable=True)
+    status = Column(String, default="pending")  # pending, applied
+    generated_at = Column(DateTime, default=datetime.utcnow)
+    applied_at = Column(DateTime, nullable=True)
+
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
+    __table_args__ = (
+        Index("ix_inventory_items_material_id_status", "material_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     material_id = Column(Integer, ForeignKey("materials.id"))
@@ -87,10 +129,53 @@ class InventoryItem(Base):
     status = Column(String)  # available, reserved, quarantine
     expiry_date = Column(DateTime, nullable=True)
     received_date = Column(DateTime, default=datetime.utcnow)
-    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    production_run_id = Column(Integer, ForeignKey("production_runs.id"), nullable=True, index=True)  # set on lots made in-house
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __mapper_args__ = {"version_id_col": version}
     
     material = relationship("Material", back_populates="inventory_items")
     quality_checks = relationship("QualityCheck", back_populates="inventory_item")
+    consumptions = relationship("InventoryConsumption", back_populates="inventory_item")
+
+class InventoryConsumption(Base):
+    __tablename__ = "inventory_consumptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    production_run_id = Column(Integer, ForeignKey("production_runs.id"), index=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), index=True)
+    quantity = Column(Float)
+    consumed_at = Column(DateTime, default=datetime.utcnow)
+
+    production_run = relationship("ProductionRun", back_populates="consumptions")
+    inventory_item = relationship("InventoryItem", back_populates="consumptions")
+
+class InventoryTransaction(Base):
+    """Append-only stock movement, see app/inventory_ledger.py."""
+    __tablename__ = "inventory_transactions"
+    __table_args__ = (
+        Index("ix_inventory_transactions_inventory_item_id_created_at", "inventory_item_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=False)
+    transaction_type = Column(String, nullable=False)  # receipt, issue, adjust, move
+    quantity = Column(Float, nullable=False)  # signed change applied to InventoryItem.quantity
+    location = Column(String, nullable=True)  # new location of a move
+    reference = Column(String, nullable=True)  # scanner, document or user supplied id
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class LotGenealogy(Base):
+    """Transitive closure of lot parent/child links, see app/genealogy.py."""
+    __tablename__ = "lot_genealogy"
+    __table_args__ = (
+        Index("ix_lot_genealogy_descendant_id_ancestor_id", "descendant_id", "ancestor_id"),
+    )
+
+    ancestor_id = Column(Integer, ForeignKey("inventory_items.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("inventory_items.id"), primary_key=True)
+    depth = Column(Integer)  # production steps between the lots
 
 class Part(Base):
     __tablename__ = "parts"
@@ -99,6 +184,7 @@ class Part(Base):
     part_number = Column(String, unique=True, index=True)
     description = Column(String)
     customer = Column(String)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=True, index=True)
     material = Column(String)
     cycle_time = Column(Float)
     price = Column(Float)
@@ -108,30 +194,51 @@ class Part(Base):
     # Relationships
     order_items = relationship("OrderItem", back_populates="part")
     quality_checks = relationship("QualityCheck", back_populates="part")
-    bom = relationship("BOM", back_populates="part", uselist=False, cascade="all, delete-orphan")
+    boms = relationship("BOM", back_populates="part", cascade="all, delete-orphan", order_by="BOM.revision")
+    # The revision in effect now
+    bom = relationship(
+        "BOM",
+        primaryjoin=lambda: and_(
+            BOM.part_id == Part.id,
+            or_(BOM.effective_from.is_(None), BOM.effective_from <= bindparam("bom_now", callable_=datetime.utcnow, type_=DateTime)),
+            or_(BOM.effective_to.is_(None), BOM.effective_to > bindparam("bom_now", callable_=datetime.utcnow, type_=DateTime)),
+        ),
+        uselist=False,
+        viewonly=True,
+    )
+    customer_record = relationship("Customer", back_populates="parts")
 
 class ProductionRun(Base):
     __tablename__ = "production_runs"
+    __table_args__ = (
+        Index("ix_production_runs_machine_id_start_date", "machine_id", "start_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    order_item_id = Column(Integer, ForeignKey("order_items.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    order_item_id = Column(Integer, ForeignKey("order_items.id"), index=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"), nullable=True)
     quantity = Column(Integer)
     status = Column(String)
     start_date = Column(DateTime, nullable=True)
     end_date = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     order = relationship("Order", back_populates="production_runs")
     order_item = relationship("OrderItem", back_populates="production_runs")
+    machine = relationship("Machine", back_populates="production_runs")
+    consumptions = relationship("InventoryConsumption", back_populates="production_run")
 
 class QualityCheck(Base):
     __tablename__ = "quality_checks"
+    __table_args__ = (
+        Index("ix_quality_checks_part_id_check_date", "part_id", "check_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     part_id = Column(Integer, ForeignKey("parts.id"))
-    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=True)
+    inventory_item_id = Column(Integer, ForeignKey("inventory_items.id"), nullable=True, index=True)
     check_date = Column(DateTime, default=datetime.utcnow)
     quantity_checked = Column(Integer)
     quantity_rejected = Column(Integer)
@@ -141,6 +248,23 @@ class QualityCheck(Base):
     part = relationship("Part", back_populates="quality_checks")
     inventory_item = relationship("InventoryItem", back_populates="quality_checks")
 
+class QualityRollup(Base):
+    __tablename__ = "quality_rollups"
+    __table_args__ = (
+        UniqueConstraint("period", "period_start", "part_id", name="uq_quality_rollups_period_start_part"),
+        Index("ix_quality_rollups_part_period_start", "part_id", "period", "period_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    part_id = Column(Integer, ForeignKey("parts.id"))
+    period = Column(String)  # day, week
+    period_start = Column(DateTime)
+    checks = Column(Integer, default=0)
+    quantity_checked = Column(Integer, default=0)
+    quantity_rejected = Column(Integer, default=0)
+    passed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+
 class Machine(Base):
     __tablename__ = "machines"
     
@@ -153,9 +277,13 @@ class Machine(Base):
     current_job = Column(String, nullable=True)
     
     maintenance_records = relationship("MaintenanceRecord", back_populates="machine")
+    production_runs = relationship("ProductionRun", back_populates="machine")
 
 class MaintenanceRecord(Base):
     __tablename__ = "maintenance_records"
+    __table_args__ = (
+        Index("ix_maintenance_records_machine_id_start_time", "machine_id", "start_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     machine_id = Column(Integer, ForeignKey("machines.id"))
@@ -171,36 +299,165 @@ class MaintenanceRecord(Base):
     
     machine = relationship("Machine", back_populates="maintenance_records")
 
+class MachineShiftMetric(Base):
+    __tablename__ = "machine_shift_metrics"
+    __table_args__ = (
+        UniqueConstraint("machine_id", "shift_start", name="uq_machine_shift_metrics_machine_shift"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    machine_id = Column(Integer, ForeignKey("machines.id"))
+    shift_start = Column(DateTime)
+    planned_minutes = Column(Float)
+    downtime_minutes = Column(Float)
+    run_minutes = Column(Float)
+    ideal_minutes = Column(Float)
+    total_count = Column(Float)
+    good_count = Column(Float)
+    availability = Column(Float)
+    performance = Column(Float)
+    quality = Column(Float)
+    oee = Column(Float)
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_customer_id_due_date", "customer_id", "due_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String, unique=True, index=True)
     customer = Column(String)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=True)
     due_date = Column(DateTime)
     status = Column(String)  # open, in_progress, completed, cancelled
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    # Every UPDATE checks and bumps version, a concurrent write raises StaleDataError
+    __mapper_args__ = {"version_id_col": version}
     
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     production_runs = relationship("ProductionRun", back_populates="order")
+    customer_record = relationship("Customer", back_populates="orders")
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    part_id = Column(Integer, ForeignKey("parts.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    part_id = Column(Integer, ForeignKey("parts.id"), index=True)
     quantity = Column(Integer)
     status = Column(String)  # pending, in_production, completed
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     order = relationship("Order", back_populates="items")
     part = relationship("Part", back_populates="order_items")
     production_runs = relationship("ProductionRun", back_populates="order_item")
 
+class OrderSummary(Base):
+    """Read model for the open-orders dashboard, see app/order_summaries.py."""
+    __tablename__ = "order_summaries"
+    __table_args__ = (
+        Index("ix_order_summaries_status_due_date", "status", "due_date"),
+    )
+
+    order_id = Column(Integer, ForeignKey("orders.id"), primary_key=True)
+    order_number = Column(String)
+    customer = Column(String)
+    status = Column(String)
+    due_date = Column(DateTime, index=True)
+    line_count = Column(Integer, default=0)
+    open_line_count = Column(Integer, default=0)
+    total_quantity = Column(Integer, default=0)
+    total_value = Column(Float, default=0.0)
+    run_count = Column(Integer, default=0)
+    produced_quantity = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Closed history moved out of the hot tables by app/archive.py. Rows keep
+# their original ids and columns; references outside the archive are plain
+# integers so parts and customers can still be deleted.
+class ArchivedOrder(Base):
+    __tablename__ = "archived_orders"
+
+    id = Column(Integer, primary_key=True)
+    order_number = Column(String, index=True)
+    customer = Column(String)
+    customer_id = Column(Integer, index=True)
+    due_date = Column(DateTime)
+    status = Column(String)
+    notes = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    items = relationship("ArchivedOrderItem", back_populates="order")
+    production_runs = relationship("ArchivedProductionRun", back_populates="order")
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "archived_order_items"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("archived_orders.id"), index=True)
+    part_id = Column(Integer, index=True)
+    quantity = Column(Integer)
+    status = Column(String)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    order = relationship("ArchivedOrder", back_populates="items")
+    part = relationship("Part", primaryjoin="foreign(ArchivedOrderItem.part_id) == Part.id", viewonly=True)
+
+class ArchivedProductionRun(Base):
+    __tablename__ = "archived_production_runs"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("archived_orders.id"), index=True)
+    order_item_id = Column(Integer)
+    machine_id = Column(Integer, nullable=True)
+    quantity = Column(Integer)
+    status = Column(String)
+    start_date = Column(DateTime, nullable=True)
+    end_date = Column(DateTime, nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    order = relationship("ArchivedOrder", back_populates="production_runs")
+
+class ArchivedQualityCheck(Base):
+    __tablename__ = "archived_quality_checks"
+    __table_args__ = (
+        Index("ix_archived_quality_checks_part_id_check_date", "part_id", "check_date"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    part_id = Column(Integer)
+    inventory_item_id = Column(Integer, nullable=True)
+    check_date = Column(DateTime)
+    quantity_checked = Column(Integer)
+    quantity_rejected = Column(Integer)
+    notes = Column(String, nullable=True)
+    status = Column(String)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class DemandForecast(Base):
+    __tablename__ = "demand_forecasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    part_id = Column(Integer, ForeignKey("parts.id"), unique=True)
+    method = Column(String)  # ses, sba
+    alpha = Column(Float)
+    weekly_quantity = Column(Float)
+    average_interval = Column(Float)  # weeks between non-zero demand
+    demand_weeks = Column(Integer)
+    history_weeks = Column(Integer)
+    generated_at = Column(DateTime, default=datetime.utcnow)
+
 class PurchaseOrder(Base):
     __tablename__ = "purchase_orders"
     
@@ -209,8 +466,11 @@ class PurchaseOrder(Base):
     supplier_id = Column(Integer, ForeignKey("suppliers.id"))
     order_date = Column(DateTime, default=datetime.utcnow)
     expected_delivery = Column(DateTime)
-    status = Column(String)  # draft, sent, received, cancelled
+    status = Column(String)  # draft, sent, partial, received, cancelled
     notes = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __mapper_args__ = {"version_id_col": version}
     
     supplier = relationship("Supplier", back_populates="purchase_orders")
     items = relationship("PurchaseOrderItem", back_populates="purchase_order", cascade="all, delete-orphan")
@@ -219,8 +479,8 @@ class PurchaseOrderItem(Base):
     __tablename__ = "purchase_order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    po_id = Column(Integer, ForeignKey("purchase_orders.id"))
-    material_id = Column(Integer, ForeignKey("materials.id"))
+    po_id = Column(Integer, ForeignKey("purchase_orders.id"), index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), index=True)
     quantity = Column(Float)
     unit_price = Column(Float)
     received_quantity = Column(Float, default=0)
@@ -239,4 +499,26 @@ class Customer(Base):
     address = Column(String, nullable=True)
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    orders = relationship("Order", back_populates="customer_record")
+    parts = relationship("Part", back_populates="customer_record")
+
+class ReferenceVersion(Base):
+    """Write counter per reference table, bumped by triggers, see app/reference_cache.py."""
+    __tablename__ = "reference_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+class Tombstone(Base):
+    """A row deleted from a delta-synced table, written by triggers, see app/delta_sync.py."""
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_deleted_at_table_name", "deleted_at", "table_name"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, nullable=False)
@@ -0,0 +1,319 @@
+"""Shift-level OEE per machine.
+
+Every machine works ``current_shifts`` shifts of ``hours_per_shift`` hours a
+day, the first one starting at ``SHIFT_DAY_START_HOUR``. For each shift in a
+window the engine derives
+
+* availability = run time / planned time, where run time is the time covered
+  by production runs, capped at the planned time left after maintenance
+  downtime,
+* performance = ideal time (``Part.cycle_time`` x pieces) / run time,
+* quality = good pieces / pieces, using the part's daily reject rate from the
+  quality rollups,
+
+and stores one ``machine_shift_metrics`` row per machine and shift. Runs and
+maintenance records are split across shifts in a single NumPy pass over all
+machines. Recompute a window with::
+
+    python -m app.oee --days 30
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+SHIFT_DAY_START_HOUR = 6
+SECONDS_PER_DAY = 86400
+
+# Offsets each machine's shift keys into its own range so one sorted array
+# can be searched for all machines at once
+_MACHINE_KEY_SPAN = 10 ** 10
+
+
+def day_floor(when: datetime) -> datetime:
+    return datetime(when.year, when.month, when.day)
+
+
+def build_shifts(shifts_per_day: np.ndarray, hours_per_shift: np.ndarray, days: int):
+    """Shift boundaries for every machine over ``days`` days.
+
+    Returns ``(machine_idx, starts, ends)`` in seconds from the first day,
+    sorted by machine and then by start.
+    """
+    shifts_per_day = np.maximum(shifts_per_day.astype(np.int64), 0)
+    per_machine = shifts_per_day * days
+    machine_idx = np.repeat(np.arange(len(per_machine)), per_machine)
+    offsets = np.concatenate(([0], np.cumsum(per_machine)[:-1]))
+    position = np.arange(machine_idx.size) - offsets[machine_idx]
+    day = position // shifts_per_day[machine_idx]
+    shift = position % shifts_per_day[machine_idx]
+    length = hours_per_shift.astype(np.int64)[machine_idx] * 3600
+    starts = day * SECONDS_PER_DAY + SHIFT_DAY_START_HOUR * 3600 + shift * length
+    return machine_idx, starts, starts + length
+
+
+def split_intervals(interval_machine, interval_start, interval_end, shift_machine, shift_start, shift_end):
+    """Intersect intervals with the shifts of the same machine.
+
+    Returns ``(interval_idx, shift_idx, overlap_seconds)`` for every
+    overlapping pair.
+    """
+    shift_start_keys = shift_machine * _MACHINE_KEY_SPAN + shift_start
+    shift_end_keys = shift_machine * _MACHINE_KEY_SPAN + shift_end
+    base = interval_machine * _MACHINE_KEY_SPAN
+    first = np.searchsorted(shift_end_keys, base + interval_start, side="right")
+    last = np.searchsorted(shift_start_keys, base + interval_end, side="left")
+    counts = np.maximum(last - first, 0)
+
+    interval_idx = np.repeat(np.arange(counts.size), counts)
+    pair_offsets = np.arange(interval_idx.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    shift_idx = first[interval_idx] + pair_offsets
+    overlap = (
+        np.minimum(interval_end[interval_idx], shift_end[shift_idx])
+        - np.maximum(interval_start[interval_idx], shift_start[shift_idx])
+    )
+    return interval_idx, shift_idx, np.maximum(overlap, 0)
+
+
+def _seconds(values: List[datetime], origin: datetime) -> np.ndarray:
+    if not values:
+        return np.zeros(0, dtype=np.int64)
+    stamps = np.array(values, dtype="datetime64[s]")
+    return (stamps - np.datetime64(origin, "s")).astype(np.int64)
+
+
+def _maintenance_end(record, now: datetime) -> Optional[datetime]:
+    if record.end_time is not None:
+        return record.end_time
+    if record.duration_minutes:
+        return record.start_time + timedelta(minutes=record.duration_minutes)
+    if record.status == "in_progress":
+        return now
+    return None
+
+
+def compute(db: Session, start: datetime, end: datetime, machine_ids: Optional[Iterable[int]] = None) -> dict:
+    """Recompute and store shift metrics for shifts starting in [start, end)."""
+    now = datetime.utcnow()
+    origin = day_floor(start)
+    days = (day_floor(end) - origin).days + 1
+
+    machine_query = db.query(models.Machine.id, models.Machine.current_shifts, models.Machine.hours_per_shift)
+    if machine_ids is not None:
+        machine_query = machine_query.filter(models.Machine.id.in_(list(machine_ids)))
+    machines = machine_query.order_by(models.Machine.id).all()
+    if not machines:
+        return {"machines": 0, "shifts": 0}
+    machine_position = {m.id: i for i, m in enumerate(machines)}
+
+    shift_machine, shift_start, shift_end = build_shifts(
+        np.array([m.current_shifts or 0 for m in machines]),
+        np.array([m.hours_per_shift or 0 for m in machines]),
+        days,
+    )
+    start_s, end_s = _seconds([start, end], origin)
+    keep = (shift_start >= start_s) & (shift_start < end_s)
+    shift_machine, shift_start, shift_end = shift_machine[keep], shift_start[keep], shift_end[keep]
+    n_shifts = shift_machine.size
+    planned = (shift_end - shift_start).astype(float)
+
+    window_start = origin
+    window_end = origin + timedelta(days=days)
+
+    # Maintenance downtime
+    records = db.query(
+        models.MaintenanceRecord.machine_id,
+        models.MaintenanceRecord.start_time,
+        models.MaintenanceRecord.end_time,
+        models.MaintenanceRecord.duration_minutes,
+        models.MaintenanceRecord.status,
+    ).filter(
+        models.MaintenanceRecord.machine_id.in_(machine_position),
+        models.MaintenanceRecord.start_time < window_end,
+        or_(models.MaintenanceRecord.end_time.is_(None), models.MaintenanceRecord.end_time > window_start),
+    ).all()
+    downtime_rows = []
+    for record in records:
+        stop = _maintenance_end(record, now)
+        if stop is not None:
+            downtime_rows.append((machine_position[record.machine_id], record.start_time, stop))
+    downtime = np.zeros(n_shifts)
+    if downtime_rows:
+        machine_idx, starts, stops = zip(*downtime_rows)
+        _, shift_idx, overlap = split_intervals(
+            np.array(machine_idx), _seconds(list(starts), origin), _seconds(list(stops), origin),
+            shift_machine, shift_start, shift_end,
+        )
+        downtime = np.minimum(np.bincount(shift_idx, weights=overlap, minlength=n_shifts), planned)
+
+    # Production runs
+    runs = db.query(
+        models.ProductionRun.machine_id,
+        models.ProductionRun.start_date,
+        models.ProductionRun.end_date,
+        models.ProductionRun.status,
+        models.ProductionRun.quantity,
+        models.OrderItem.part_id,
+        models.Part.cycle_time,
+    ).join(models.OrderItem, models.ProductionRun.order_item_id == models.OrderItem.id).join(
+        models.Part, models.OrderItem.part_id == models.Part.id
+    ).filter(
+        models.ProductionRun.machine_id.in_(machine_position),
+        models.ProductionRun.start_date.isnot(None),
+        models.ProductionRun.start_date < window_end,
+        or_(models.ProductionRun.end_date.is_(None), models.ProductionRun.end_date > window_start),
+    ).all()
+    run_rows = []
+    for run in runs:
+        # Unfinished runs are counted up to now
+        stop = run.end_date or (now if run.status != "completed" else None)
+        if stop is not None:
+            run_rows.append((
+                machine_position[run.machine_id], run.start_date, stop,
+                run.quantity or 0, run.part_id, run.cycle_time or 0.0
+            ))
+    run_time = np.zeros(n_shifts)
+    ideal = np.zeros(n_shifts)
+    total = np.zeros(n_shifts)
+    good = np.zeros(n_shifts)
+    if run_rows:
+        machine_idx, starts, stops, quantity, part_ids, cycle_time = (np.array(c) for c in zip(*run_rows))
+        run_start = _seconds(list(starts), origin)
+        run_end = _seconds(list(stops), origin)
+        run_idx, shift_idx, overlap = split_intervals(
+            machine_idx.astype(np.int64), run_start, run_end, shift_machine, shift_start, shift_end,
+        )
+        duration = np.maximum(run_end - run_start, 1)[run_idx]
+        pieces = quantity[run_idx].astype(float) * overlap / duration
+        reject_rate = _reject_rates(db, part_ids[run_idx], shift_start[shift_idx] // SECONDS_PER_DAY, origin, days)
+
+        run_time = np.minimum(np.bincount(shift_idx, weights=overlap, minlength=n_shifts), planned - downtime)
+        ideal = np.bincount(shift_idx, weights=pieces * cycle_time[run_idx].astype(float), minlength=n_shifts)
+        total = np.bincount(shift_idx, weights=pieces, minlength=n_shifts)
+        good = np.bincount(shift_idx, weights=pieces * (1 - reject_rate), minlength=n_shifts)
+
+    availability = np.divide(run_time, planned, out=np.zeros(n_shifts), where=planned > 0)
+    performance = np.divide(ideal, run_time, out=np.zeros(n_shifts), where=run_time > 0)
+    quality = np.divide(good, total, out=np.zeros(n_shifts), where=total > 0)
+
+    shift_datetimes = np.datetime64(origin, "s") + shift_start.astype("timedelta64[s]")
+    rows = [
+        {
+            "machine_id": machines[m].id,
+            "shift_start": shift_datetimes[i].astype(datetime),
+            "planned_minutes": planned[i] / 60,
+            "downtime_minutes": downtime[i] / 60,
+            "run_minutes": run_time[i] / 60,
+            "ideal_minutes": ideal[i] / 60,
+            "total_count": total[i],
+            "good_count": good[i],
+            "availability": availability[i],
+            "performance": performance[i],
+            "quality": quality[i],
+            "oee": availability[i] * performance[i] * quality[i],
+        }
+        for i, m in enumerate(shift_machine.tolist())
+    ]
+
+    db.query(models.MachineShiftMetric).filter(
+        models.MachineShiftMetric.machine_id.in_(machine_position),
+        models.MachineShiftMetric.shift_start >= start,
+        models.MachineShiftMetric.shift_start < end,
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.MachineShiftMetric, [
+        {k: float(v) if isinstance(v, np.floating) else v for k, v in row.items()} for row in rows
+    ])
+    db.commit()
+    return {"machines": len(machines), "shifts": n_shifts}
+
+
+def _reject_rates(db: Session, part_ids: np.ndarray, days: np.ndarray, origin: datetime, n_days: int) -> np.ndarray:
+    """Daily reject rate for each (part, day) pair, 0 where nothing was checked."""
+    rates = np.zeros(part_ids.size)
+    if not part_ids.size:
+        return rates
+    Rollup = models.QualityRollup
+    rollups = db.query(
+        Rollup.part_id, Rollup.period_start, Rollup.quantity_checked, Rollup.quantity_rejected
+    ).filter(
+        Rollup.period == "day",
+        Rollup.part_id.in_(np.unique(part_ids).tolist()),
+        Rollup.period_start >= origin,
+        Rollup.period_start < origin + timedelta(days=n_days),
+    ).all()
+    if not rollups:
+        return rates
+
+    day_count = n_days + 1
+    keys = np.array([r.part_id * day_count + (r.period_start - origin).days for r in rollups], dtype=np.int64)
+    checked = np.array([r.quantity_checked or 0 for r in rollups], dtype=float)
+    rejected = np.array([r.quantity_rejected or 0 for r in rollups], dtype=float)
+    order = np.argsort(keys)
+    keys = keys[order]
+    rollup_rates = np.divide(rejected[order], checked[order], out=np.zeros(keys.size), where=checked[order] > 0)
+
+    lookup = part_ids.astype(np.int64) * day_count + days.astype(np.int64)
+    position = np.clip(np.searchsorted(keys, lookup), 0, keys.size - 1)
+    found = keys[position] == lookup
+    rates[found] = rollup_rates[position[found]]
+    return rates
+
+
+def summary(db: Session, start: datetime, end: datetime, machine_id: Optional[int] = None) -> List[dict]:
+    """OEE per machine over a window, weighted by time and piece counts."""
+    Metric = models.MachineShiftMetric
+    query = db.query(
+        Metric.machine_id,
+        func.count(Metric.id).label("shifts"),
+        func.sum(Metric.planned_minutes).label("planned_minutes"),
+        func.sum(Metric.downtime_minutes).label("downtime_minutes"),
+        func.sum(Metric.run_minutes).label("run_minutes"),
+        func.sum(Metric.ideal_minutes).label("ideal_minutes"),
+        func.sum(Metric.total_count).label("total_count"),
+        func.sum(Metric.good_count).label("good_count"),
+    ).filter(and_(Metric.shift_start >= start, Metric.shift_start < end))
+    if machine_id is not None:
+        query = query.filter(Metric.machine_id == machine_id)
+
+    results = []
+    for row in query.group_by(Metric.machine_id).order_by(Metric.machine_id):
+        availability = row.run_minutes / row.planned_minutes if row.planned_minutes else 0.0
+        performance = row.ideal_minutes / row.run_minutes if row.run_minutes else 0.0
+        quality = row.good_count / row.total_count if row.total_count else 0.0
+        results.append({
+            "machine_id": row.machine_id,
+            "shifts": row.shifts,
+            "planned_minutes": row.planned_minutes or 0.0,
+            "downtime_minutes": row.downtime_minutes or 0.0,
+            "run_minutes": row.run_minutes or 0.0,
+            "total_count": row.total_count or 0.0,
+            "good_count": row.good_count or 0.0,
+            "availability": availability,
+            "performance": performance,
+            "quality": quality,
+            "oee": availability * performance * quality,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Recompute machine shift OEE metrics")
+    parser.add_argument("--days", type=int, default=30, help="Number of days back from today")
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        window_end = day_floor(datetime.utcnow()) + timedelta(days=1)
+        result = compute(session, window_end - timedelta(days=args.days), window_end)
+        print(f"Stored {result['shifts']} shifts for {result['machines']} machines")
+    finally:
+        session.close()
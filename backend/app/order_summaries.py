@@ -0,0 +1,137 @@
+"""Denormalized per-order summary rows for the open-orders dashboard.
+
+``order_summaries`` keeps one row per order with its line count, quantities,
+value (``OrderItem.quantity * Part.price``) and production progress. Order
+and production-run routes call ``refresh`` in the same transaction as their
+write, so the dashboard reads summary rows only. Rebuild every row, for
+example after a price change, with::
+
+    python -m app.order_summaries
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from . import models
+
+OPEN_STATUSES = ("open", "in_progress")
+BATCH_SIZE = 1000
+SUMMARY_FIELDS = [
+    "order_id", "order_number", "customer", "status", "due_date", "line_count", "open_line_count",
+    "total_quantity", "total_value", "run_count", "produced_quantity", "updated_at",
+]
+
+
+def discard(db: Session, order_ids: Iterable[int]):
+    """Drop summaries ahead of deleting their orders. Does not commit."""
+    db.query(models.OrderSummary).filter(
+        models.OrderSummary.order_id.in_(list(order_ids))
+    ).delete(synchronize_session=False)
+
+
+def refresh(db: Session, order_ids: Iterable[int]):
+    """Recompute the summaries of ``order_ids``. Does not commit."""
+    order_ids = list(set(order_ids))
+    if not order_ids:
+        return
+    Order, OrderItem, Run = models.Order, models.OrderItem, models.ProductionRun
+
+    lines = {
+        row.order_id: row for row in db.query(
+            OrderItem.order_id,
+            func.count(OrderItem.id).label("line_count"),
+            func.sum(case((OrderItem.status != "completed", 1), else_=0)).label("open_line_count"),
+            func.sum(OrderItem.quantity).label("total_quantity"),
+            func.sum(OrderItem.quantity * func.coalesce(models.Part.price, 0)).label("total_value"),
+        ).outerjoin(models.Part, models.Part.id == OrderItem.part_id).filter(
+            OrderItem.order_id.in_(order_ids)
+        ).group_by(OrderItem.order_id)
+    }
+    runs = {
+        row.order_id: row for row in db.query(
+            Run.order_id,
+            func.count(Run.id).label("run_count"),
+            func.sum(case((Run.status == "completed", Run.quantity), else_=0)).label("produced_quantity"),
+        ).filter(Run.order_id.in_(order_ids)).group_by(Run.order_id)
+    }
+    orders = db.query(
+        Order.id, Order.order_number, Order.customer, Order.status, Order.due_date
+    ).filter(Order.id.in_(order_ids)).all()
+
+    now = datetime.utcnow()
+    discard(db, order_ids)
+    db.bulk_insert_mappings(models.OrderSummary, [
+        {
+            "order_id": order.id,
+            "order_number": order.order_number,
+            "customer": order.customer,
+            "status": order.status,
+            "due_date": order.due_date,
+            "line_count": getattr(lines.get(order.id), "line_count", 0),
+            "open_line_count": getattr(lines.get(order.id), "open_line_count", 0) or 0,
+            "total_quantity": getattr(lines.get(order.id), "total_quantity", 0) or 0,
+            "total_value": getattr(lines.get(order.id), "total_value", 0.0) or 0.0,
+            "run_count": getattr(runs.get(order.id), "run_count", 0),
+            "produced_quantity": getattr(runs.get(order.id), "produced_quantity", 0) or 0,
+            "updated_at": now,
+        }
+        for order in orders
+    ])
+
+
+def rebuild(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Recompute every summary in id-ordered chunks. Returns the order count."""
+    last_id, total = 0, 0
+    while True:
+        ids = [
+            order_id for (order_id,) in db.query(models.Order.id).filter(
+                models.Order.id > last_id
+            ).order_by(models.Order.id).limit(batch_size)
+        ]
+        if not ids:
+            break
+        refresh(db, ids)
+        db.commit()
+        last_id, total = ids[-1], total + len(ids)
+    db.query(models.OrderSummary).filter(
+        ~models.OrderSummary.order_id.in_(db.query(models.Order.id))
+    ).delete(synchronize_session=False)
+    db.commit()
+    return total
+
+
+def dashboard(
+    db: Session,
+    statuses: Optional[List[str]] = None,
+    due_before: Optional[datetime] = None,
+    late_only: bool = False,
+) -> List[dict]:
+    """Summary rows by due date, with days late relative to now."""
+    Summary = models.OrderSummary
+    now = datetime.utcnow()
+    query = db.query(Summary).filter(Summary.status.in_(statuses or OPEN_STATUSES))
+    if late_only:
+        due_before = min(due_before, now) if due_before else now
+    if due_before:
+        query = query.filter(Summary.due_date < due_before)
+    summaries = query.order_by(Summary.due_date, Summary.order_id).all()
+    return [
+        {
+            **{column: getattr(summary, column) for column in SUMMARY_FIELDS},
+            "days_late": max((now - summary.due_date).days, 0) if summary.due_date else 0,
+        }
+        for summary in summaries
+    ]
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt summaries for {rebuild(session)} orders")
+    finally:
+        session.close()
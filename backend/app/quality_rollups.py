@@ -0,0 +1,192 @@
+"""Daily and weekly quality rollups per part.
+
+Rows in ``quality_rollups`` are updated in the same transaction as each new
+``QualityCheck``. Rebuild them from the raw checks after a bulk import with::
+
+    python -m app.quality_rollups
+"""
+import itertools
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+PERIODS = ("day", "week")
+COUNTERS = ("checks", "quantity_checked", "quantity_rejected", "passed", "failed")
+
+
+def period_start(period: str, when: datetime) -> datetime:
+    day = datetime(when.year, when.month, when.day)
+    if period == "week":
+        # Weeks start on Monday
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _increments(check) -> Dict[str, int]:
+    return {
+        "checks": 1,
+        "quantity_checked": check.quantity_checked or 0,
+        "quantity_rejected": check.quantity_rejected or 0,
+        "passed": 1 if check.status == "passed" else 0,
+        "failed": 1 if check.status == "failed" else 0,
+    }
+
+
+def record_check(db: Session, check: models.QualityCheck):
+    """Add ``check`` to its day and week buckets. Does not commit."""
+    increments = _increments(check)
+    for period in PERIODS:
+        key = {
+            "period": period,
+            "period_start": period_start(period, check.check_date),
+            "part_id": check.part_id,
+        }
+        if _increment(db, key, increments):
+            continue
+        try:
+            with db.begin_nested():
+                db.add(models.QualityRollup(**key, **increments))
+        except IntegrityError:
+            # Another writer created the bucket first
+            _increment(db, key, increments)
+
+
+def _increment(db: Session, key: dict, increments: Dict[str, int]) -> bool:
+    Rollup = models.QualityRollup
+    updated = db.query(Rollup).filter(
+        Rollup.period == key["period"],
+        Rollup.period_start == key["period_start"],
+        Rollup.part_id == key["part_id"],
+    ).update(
+        {getattr(Rollup, name): getattr(Rollup, name) + value for name, value in increments.items()},
+        synchronize_session=False,
+    )
+    return updated > 0
+
+
+def rebuild(db: Session, batch_size: int = 10000) -> int:
+    """Recompute every rollup from ``quality_checks`` and
+    ``archived_quality_checks``. Returns the row count.
+    """
+    totals: Dict[Tuple[str, datetime, int], Dict[str, int]] = {}
+    checks = itertools.chain.from_iterable(
+        db.query(
+            model.part_id,
+            model.check_date,
+            model.quantity_checked,
+            model.quantity_rejected,
+            model.status,
+        ).yield_per(batch_size)
+        for model in (models.QualityCheck, models.ArchivedQualityCheck)
+    )
+    for check in checks:
+        if check.check_date is None:
+            continue
+        increments = _increments(check)
+        for period in PERIODS:
+            bucket = totals.setdefault(
+                (period, period_start(period, check.check_date), check.part_id),
+                dict.fromkeys(COUNTERS, 0),
+            )
+            for name, value in increments.items():
+                bucket[name] += value
+
+    db.query(models.QualityRollup).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.QualityRollup, [
+        {"period": period, "period_start": start, "part_id": part_id, **counts}
+        for (period, start, part_id), counts in totals.items()
+    ])
+    db.commit()
+    return len(totals)
+
+
+def _range_filter(query, period: str, start: Optional[datetime], end: Optional[datetime]):
+    Rollup = models.QualityRollup
+    query = query.filter(Rollup.period == period)
+    if start:
+        query = query.filter(Rollup.period_start >= period_start(period, start))
+    if end:
+        query = query.filter(Rollup.period_start <= end)
+    return query
+
+
+def _rate(rejected, checked) -> float:
+    return round(rejected / checked, 6) if checked else 0.0
+
+
+def trends(
+    db: Session,
+    period: str = "week",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    part_id: Optional[int] = None,
+) -> List[dict]:
+    Rollup = models.QualityRollup
+    query = db.query(
+        Rollup.period_start,
+        *[func.sum(getattr(Rollup, name)).label(name) for name in COUNTERS],
+    )
+    query = _range_filter(query, period, start, end)
+    if part_id is not None:
+        query = query.filter(Rollup.part_id == part_id)
+    rows = query.group_by(Rollup.period_start).order_by(Rollup.period_start).all()
+    return [
+        {
+            "period_start": row.period_start,
+            **{name: getattr(row, name) or 0 for name in COUNTERS},
+            "reject_rate": _rate(row.quantity_rejected, row.quantity_checked),
+        }
+        for row in rows
+    ]
+
+
+def pareto(
+    db: Session,
+    period: str = "week",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 10,
+) -> List[dict]:
+    """Parts ordered by rejected quantity with their cumulative share."""
+    Rollup = models.QualityRollup
+    checked = func.sum(Rollup.quantity_checked)
+    rejected = func.sum(Rollup.quantity_rejected)
+    query = db.query(Rollup.part_id, checked.label("checked"), rejected.label("rejected"))
+    rows = _range_filter(query, period, start, end).group_by(Rollup.part_id).order_by(rejected.desc()).all()
+
+    total_rejected = sum(row.rejected or 0 for row in rows)
+    top = rows[:limit]
+    part_numbers = dict(
+        db.query(models.Part.id, models.Part.part_number)
+        .filter(models.Part.id.in_([row.part_id for row in top]))
+    )
+    entries = []
+    cumulative = 0
+    for row in top:
+        cumulative += row.rejected or 0
+        entries.append({
+            "part_id": row.part_id,
+            "part_number": part_numbers.get(row.part_id, ""),
+            "quantity_checked": row.checked or 0,
+            "quantity_rejected": row.rejected or 0,
+            "reject_rate": _rate(row.rejected or 0, row.checked),
+            "share_of_rejects": _rate(row.rejected or 0, total_rejected),
+            "cumulative_share": _rate(cumulative, total_rejected),
+        })
+    return entries
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(session)} quality rollup rows")
+    finally:
+        session.close()
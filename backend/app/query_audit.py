@@ -0,0 +1,178 @@
+"""Capture the SQL issued by every GET route and flag full table scans.
+
+Run from the backend directory against the configured database::
+
+    python -m app.query_audit [--route /api/orders] [--fail-on-scan]
+
+SQLite statements are checked with ``EXPLAIN QUERY PLAN``, PostgreSQL
+statements with ``EXPLAIN``. A scan is reported as ``filtered`` when the
+statement has a WHERE clause, i.e. when an index could have been used.
+Routes with a path parameter missing from ``PATH_PARAM_MODELS``, or whose
+table is empty, are reported as skipped.
+"""
+import argparse
+import asyncio
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func
+
+from .database import SessionLocal, engine
+from . import models
+
+# Models whose first row id is substituted for a path parameter
+PATH_PARAM_MODELS = {
+    "order_id": models.Order,
+    "item_id": models.InventoryItem,
+    "po_id": models.PurchaseOrder,
+    "bom_id": models.BOM,
+    "part_id": models.Part,
+    "customer_id": models.Customer,
+    "supplier_id": models.Supplier,
+    "material_id": models.Material,
+    "machine_id": models.Machine,
+    "run_id": models.ProductionRun,
+}
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+def audit(route_prefix: Optional[str] = None) -> List[dict]:
+    from .main import app
+
+    statements: List[Tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    results = []
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for route_path, operations in app.openapi()["paths"].items():
+            if "get" not in operations:
+                continue
+            if route_prefix and not route_path.startswith(route_prefix):
+                continue
+            path, missing = _fill_path(route_path)
+            if path is None:
+                results.append({"route": route_path, "skipped": f"no id for {{{missing}}}"})
+                continue
+            query = "query=a" if path.endswith("/search") else ""
+
+            statements.clear()
+            status = asyncio.run(_get(app, path, query))
+            # PostgreSQL drivers pass dict parameters, which are not hashable
+            captured = list({(stmt, repr(params)): (stmt, params) for stmt, params in statements}.values())
+            results.append({
+                "route": route_path,
+                "status": status,
+                "statements": len(statements),
+                "scans": [scan for stmt in captured for scan in _explain(*stmt)],
+            })
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return results
+
+
+def _fill_path(path: str) -> Tuple[Optional[str], Optional[str]]:
+    """The path with a real id per parameter, else None and the parameter."""
+    db = SessionLocal()
+    try:
+        for param in re.findall(r"{(\w+)}", path):
+            model = PATH_PARAM_MODELS.get(param)
+            row_id = db.query(func.min(model.id)).scalar() if model else None
+            if row_id is None:
+                return None, param
+            path = path.replace(f"{{{param}}}", str(row_id))
+        return path, None
+    finally:
+        db.close()
+
+
+async def _get(app, path: str, query: str) -> int:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"audit")],
+        "client": ("127.0.0.1", 0),
+        "server": ("audit", 80),
+    }
+    await app(scope, receive, send)
+    return status
+
+
+def _explain(statement: str, parameters) -> List[dict]:
+    filtered = bool(_WHERE.search(statement))
+    scans = []
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            details = [row[-1] for row in rows]
+            pattern = _SQLITE_SCAN
+        else:
+            rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).fetchall()
+            details = [row[0] for row in rows]
+            pattern = _POSTGRES_SCAN
+    for detail in details:
+        match = pattern.search(detail.strip())
+        if match:
+            scans.append({
+                "table": match.group(1),
+                "filtered": filtered,
+                "detail": detail.strip(),
+                "statement": " ".join(statement.split()),
+            })
+    return scans
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--route", help="Only audit routes starting with this path")
+    parser.add_argument("--fail-on-scan", action="store_true", help="Exit non-zero on filtered full scans")
+    parser.add_argument("--verbose", action="store_true", help="Print the statements that scan")
+    args = parser.parse_args(argv)
+
+    needs_index: Dict[str, int] = {}
+    for result in audit(args.route):
+        if "skipped" in result:
+            print(f"{result['route']}  skipped: {result['skipped']}")
+            continue
+        print(f"{result['route']}  status={result['status']}  statements={result['statements']}")
+        for scan in result["scans"]:
+            label = "FILTERED SCAN" if scan["filtered"] else "scan"
+            print(f"    {label}: {scan['detail']}")
+            if args.verbose:
+                print(f"        {scan['statement']}")
+            if scan["filtered"]:
+                needs_index[scan["table"]] = needs_index.get(scan["table"], 0) + 1
+
+    if needs_index:
+        print("\nTables scanned under a WHERE clause (index candidates):")
+        for table, count in sorted(needs_index.items(), key=lambda kv: -kv[1]):
+            print(f"    {table}: {count}")
+    return 1 if needs_index and args.fail_on_scan else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Quantity-break quotes for parts.
+
+The cost of one piece of a part built in a lot of ``quantity`` pieces is
+
+* material: the BOM lines priced at ``Material.price``;
+* machine: the cycle time (``BOM.cycle_time_seconds`` / ``cavities``, else
+  ``Part.cycle_time``, in seconds) at the quoted machine rate;
+* labor: the BOM steps, ``time_minutes`` at ``cost_per_hour``;
+* setup: ``Part.setup_time`` (minutes) at the machine rate, spread over the
+  lot.
+
+Material, machine and labor are grossed up by the BOM's ``scrap_rate``.
+Component parts add their own cost per piece times their usage, and one
+setup each per lot. The price is the cost plus ``margin``.
+
+``CostModel`` turns the BOM revisions in effect at one date into per-part
+arrays and rolls them up through the component lines once. A quote batch is
+then a handful of array lookups for all lines together. The model for the
+current date is shared and rebuilt after parts, BOMs or material prices
+change, or after ``MODEL_SECONDS``.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import bom_revisions, models, schemas, table_versions
+from .dates import naive_utc
+
+MAX_LINES = 5000
+MODEL_SECONDS = 60
+_TABLES = ("parts", "boms", "bom_items", "bom_steps", "materials")
+
+# Columns of CostModel.totals
+MATERIAL, MACHINE_HOURS, LABOR, SETUP_HOURS, MISSING = range(5)
+
+
+def _roll_up(own: np.ndarray, parents: np.ndarray, children: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Add each component's totals to its parents until nothing changes.
+
+    Each pass reaches one BOM level deeper; the where-used index rejects
+    cyclic BOMs, the depth cap only guards bad data.
+    """
+    totals = own
+    for _ in range(bom_revisions.MAX_BOM_DEPTH):
+        rolled = own.copy()
+        np.add.at(rolled, parents, weights * totals[children])
+        if np.array_equal(rolled, totals):
+            break
+        totals = rolled
+    return totals
+
+
+class CostModel:
+    """Per-piece cost inputs of every part, as of one date."""
+
+    def __init__(self, db: Session, as_of: datetime):
+        self.as_of = as_of
+        boms = bom_revisions.index(db)
+        parts = db.query(models.Part.id, models.Part.cycle_time, models.Part.setup_time).order_by(models.Part.id).all()
+        self.part_rows: Dict[int, int] = {part.id: row for row, part in enumerate(parts)}
+        cycle_seconds = np.array([part.cycle_time or 0.0 for part in parts], dtype=float)
+        own = np.zeros((len(parts), 5))
+        own[:, SETUP_HOURS] = [(part.setup_time or 0.0) / 60 for part in parts]
+
+        bom_data = {
+            bom.id: bom for bom in db.query(models.BOM.id, models.BOM.cycle_time_seconds, models.BOM.cavities, models.BOM.scrap_rate)
+        }
+        step_cost = dict(
+            db.query(models.BOMStep.bom_id, func.sum(models.BOMStep.time_minutes * models.BOMStep.cost_per_hour) / 60)
+            .group_by(models.BOMStep.bom_id)
+        )
+        prices = dict(db.query(models.Material.id, models.Material.price))
+
+        scrap = np.ones(len(parts))
+        edges: List[Tuple[int, int, float]] = []
+        for part_id, row in self.part_rows.items():
+            revision = boms.revision(part_id, as_of)
+            if revision is None:
+                own[row, MISSING] = 1
+                continue
+            bom = bom_data[revision.bom_id]
+            if bom.cycle_time_seconds:
+                cycle_seconds[row] = bom.cycle_time_seconds / max(bom.cavities or 1, 1)
+            scrap[row] = 1 + (bom.scrap_rate or 0.0) / 100
+            own[row, LABOR] = step_cost.get(revision.bom_id) or 0.0
+            # Line quantities already include the scrap rate
+            for material_id, component_part_id, per_piece in boms.lines.get(revision.bom_id, ()):
+                if component_part_id in self.part_rows:
+                    edges.append((row, self.part_rows[component_part_id], per_piece))
+                elif material_id is not None and prices.get(material_id) is not None:
+                    own[row, MATERIAL] += per_piece * prices[material_id]
+                else:
+                    own[row, MISSING] = 1
+        own[:, MACHINE_HOURS] = cycle_seconds / 3600 * scrap
+        own[:, LABOR] *= scrap
+
+        # Costs per piece scale with the component's usage, setups and
+        # missing data are counted once per line
+        lines = np.array(edges, dtype=float).reshape(-1, 3)
+        weights = np.ones((len(lines), 5))
+        weights[:, [MATERIAL, MACHINE_HOURS, LABOR]] = lines[:, 2:3]
+        self.totals = _roll_up(own, lines[:, 0].astype(int), lines[:, 1].astype(int), weights)
+
+    def quote(self, lines: List[schemas.QuoteRequestLine], machine_rate: float, margin: float) -> List[dict]:
+        unknown = [line.part_id for line in lines if line.part_id not in self.part_rows]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Part with id {unknown[0]} not found")
+        rows = np.fromiter((self.part_rows[line.part_id] for line in lines), dtype=int, count=len(lines))
+        quantity = np.fromiter((line.quantity for line in lines), dtype=float, count=len(lines))
+        totals = self.totals[rows]
+
+        material = totals[:, MATERIAL]
+        machine = totals[:, MACHINE_HOURS] * machine_rate
+        labor = totals[:, LABOR]
+        setup = totals[:, SETUP_HOURS] * machine_rate / quantity
+        unit_cost = material + machine + labor + setup
+        unit_price = unit_cost * (1 + margin)
+        columns = {
+            "material_cost": material,
+            "machine_cost": machine,
+            "labor_cost": labor,
+            "setup_cost": setup,
+            "unit_cost": unit_cost,
+            "unit_price": unit_price,
+            "total_price": unit_price * quantity,
+        }
+        columns = {name: np.round(values, 4).tolist() for name, values in columns.items()}
+        complete = (totals[:, MISSING] == 0).tolist()
+        return [
+            {
+                "part_id": line.part_id,
+                "quantity": line.quantity,
+                **{name: values[i] for name, values in columns.items()},
+                "complete": complete[i],
+            }
+            for i, line in enumerate(lines)
+        ]
+
+
+_cached: Optional[Tuple[CostModel, Dict[str, int], float]] = None
+_cache_lock = threading.Lock()
+
+
+def model(db: Session, as_of: Optional[datetime] = None) -> CostModel:
+    """The cost model at ``as_of``; the one for now is shared."""
+    global _cached
+    if as_of is not None:
+        return CostModel(db, as_of)
+    with _cache_lock:
+        if _cached is not None:
+            cached, versions, loaded_at = _cached
+            if time.monotonic() - loaded_at < MODEL_SECONDS and table_versions.unchanged(versions, _TABLES):
+                return cached
+        versions = table_versions.snapshot()
+        loaded = CostModel(db, datetime.utcnow())
+        _cached = (loaded, versions, time.monotonic())
+        return loaded
+
+
+def quote(db: Session, request: schemas.QuoteBatchRequest) -> dict:
+    if not 1 <= len(request.lines) <= MAX_LINES:
+        raise HTTPException(status_code=400, detail=f"Quote 1 to {MAX_LINES} lines")
+    cost_model = model(db, naive_utc(request.as_of))
+    return {
+        "as_of": cost_model.as_of,
+        "lines": cost_model.quote(request.lines, request.machine_rate, request.margin),
+    }
@@ -0,0 +1,190 @@
+"""Cache of known reference ids for write validation.
+
+Order, purchase order, inventory, quality check and material writes check
+that the parts, materials, suppliers and customers they point at exist.
+``require`` answers from an in-process LRU of ids seen to exist and only
+queries the ids it has not seen, in one ``IN`` query. Ids that do not exist
+are never cached, so a row created by any worker is found at once.
+
+Ids found are cached only once the session that read them commits, and
+never inside an atomic ``/api/batch``: a session may see rows it wrote
+itself, which are gone again if it rolls back.
+
+Entries go stale when a reference row is updated or deleted:
+
+* writes committed through this process's engine are seen immediately
+  through ``table_versions``;
+* writes from other workers (or any other connection) bump
+  ``reference_versions`` through SQLite triggers on the reference tables.
+  At most every ``POLL_SECONDS`` the cache asks its own connection for
+  ``PRAGMA data_version``, which changes whenever another connection
+  committed; only then is ``reference_versions`` read and the entries of the
+  changed tables dropped.
+
+Every entry also expires after ``TTL_SECONDS``.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import table_versions
+from .database import current_shared_session
+
+MAX_ENTRIES = 50000
+TTL_SECONDS = 300
+POLL_SECONDS = 0.5
+
+# Session.info key of the ids read through a session, cached on commit
+_PENDING = "reference_cache.pending"
+
+TABLES = ("parts", "materials", "suppliers", "customers")
+
+# One AFTER UPDATE and one AFTER DELETE trigger per reference table; inserts
+# cannot make a cached id stale
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {table}_reference_version_{event.lower()}
+AFTER {event} ON {table}
+BEGIN
+    INSERT INTO reference_versions (table_name, version) VALUES ('{table}', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END"""
+    for table in TABLES
+    for event in ("UPDATE", "DELETE")
+]
+
+
+def create_triggers(connection):
+    """Install the triggers on SQLite, see ``create_tables``."""
+    if connection.dialect.name != "sqlite":
+        return
+    for trigger in TRIGGERS:
+        connection.exec_driver_sql(trigger)
+
+
+class ReferenceCache:
+    def __init__(self, engine):
+        self._engine = engine
+        # (table, id) -> expiry, least recently used first
+        self._entries: "OrderedDict[Tuple[str, int], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = table_versions.snapshot()
+        self._connection = None
+        self._data_version: Optional[int] = None
+        self._shared: Dict[str, int] = {}
+        self._polled_at = 0.0
+
+    def _drop(self, tables: Iterable[str]):
+        tables = set(tables)
+        for key in [key for key in self._entries if key[0] in tables]:
+            del self._entries[key]
+
+    def _poll(self) -> Set[str]:
+        """Tables another connection changed since the last poll."""
+        if self._connection is None:
+            self._connection = self._engine.raw_connection()
+        cursor = self._connection.cursor()
+        try:
+            if self._engine.dialect.name == "sqlite":
+                cursor.execute("PRAGMA data_version")
+                data_version = cursor.fetchone()[0]
+                if data_version == self._data_version:
+                    return set()
+                self._data_version = data_version
+            cursor.execute("SELECT table_name, version FROM reference_versions")
+            shared = dict(cursor.fetchall())
+        finally:
+            cursor.close()
+            # Do not hold a read transaction open between polls
+            self._connection.rollback()
+        changed = {table for table in TABLES if shared.get(table) != self._shared.get(table)}
+        self._shared = shared
+        return changed
+
+    def _invalidate(self):
+        if not table_versions.unchanged(self._local, TABLES):
+            current = table_versions.snapshot()
+            self._drop(table for table in TABLES if current.get(table, 0) != self._local.get(table, 0))
+            self._local = current
+        now = time.monotonic()
+        if now - self._polled_at >= POLL_SECONDS:
+            self._polled_at = now
+            self._drop(self._poll())
+
+    def missing(self, db: Session, model, ids: Iterable[int]) -> Set[int]:
+        """The ids among ``ids`` with no row in ``model``'s table."""
+        table = model.__tablename__
+        ids = set(ids)
+        now = time.monotonic()
+        with self._lock:
+            self._invalidate()
+            unknown = set()
+            for row_id in ids:
+                expires = self._entries.get((table, row_id))
+                if expires is not None and expires > now:
+                    self._entries.move_to_end((table, row_id))
+                else:
+                    unknown.add(row_id)
+        if not unknown:
+            return set()
+
+        found = {row_id for (row_id,) in db.query(model.id).filter(model.id.in_(unknown))}
+        if current_shared_session() is None:
+            self._defer(db, table, found)
+        return unknown - found
+
+    def _defer(self, db: Session, table: str, found: Set[int]):
+        """Cache ``found`` when ``db`` commits, drop it otherwise."""
+        pending = db.info.get(_PENDING)
+        if pending is None:
+            pending = db.info[_PENDING] = set()
+            event.listen(db, "after_commit", self._committed)
+            event.listen(db, "after_transaction_end", self._ended)
+        pending.update((table, row_id) for row_id in found)
+
+    def _committed(self, db: Session):
+        pending = db.info[_PENDING]
+        if not pending:
+            return
+        with self._lock:
+            expires = time.monotonic() + TTL_SECONDS
+            for key in pending:
+                self._entries[key] = expires
+                self._entries.move_to_end(key)
+            while len(self._entries) > MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        pending.clear()
+
+    def _ended(self, db: Session, transaction):
+        # Rolled back or closed without a commit; savepoints end inside it
+        if transaction.parent is None:
+            db.info[_PENDING].clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: Optional[ReferenceCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache() -> ReferenceCache:
+    global _cache
+    if _cache is None:
+        from .database import engine
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReferenceCache(engine)
+    return _cache
+
+
+def require(db: Session, model, ids: Iterable[int]):
+    """Raise 404 unless every id in ``ids`` exists in ``model``'s table."""
+    missing = cache().missing(db, model, ids)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} with id {min(missing)} not found")
@@ -8,6 +8,13 @@ from .quality_checks import router as quality_checks_router
 from .production_runs import router as production_runs_router
 from .suppliers import router as suppliers_router
 from .customers import router as customers_router
+from .machines import router as machines_router
+from .planning import router as planning_router
+from .traceability import router as traceability_router
+from .scenarios import router as scenarios_router
+from .batch import router as batch_router
+from .sync import router as sync_router
+from .quotes import router as quotes_router
 
 __all__ = [
     "parts_router",
@@ -20,4 +27,11 @@ __all__ = [
     "production_runs_router",
     "suppliers_router",
     "customers_router",
+    "machines_router",
+    "planning_router",
+    "traceability_router",
+    "scenarios_router",
+    "batch_router",
+    "sync_router",
+    "quotes_router",
 ] 
\ No newline at end of file
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Tuple
+import orjson
+
+from ..database import SessionLocal, begin_outer_transaction, end_outer_transaction, shared_session
+from ..coalescing import BYPASS_SCOPE_KEY
+from .. import schemas
+
+router = APIRouter(tags=["batch"])
+
+MAX_OPERATIONS = 50
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+# Connection-level keys copied from the batch request into each sub-request
+_SCOPE_KEYS = ("type", "asgi", "http_version", "scheme", "server", "client", "root_path", "state", "extensions")
+
+def _check(batch: schemas.BatchRequest):
+    if not 1 <= len(batch.operations) <= MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"A batch takes 1 to {MAX_OPERATIONS} operations")
+    for i, operation in enumerate(batch.operations):
+        method = operation.method.upper()
+        if method != "GET" and method not in WRITE_METHODS:
+            raise HTTPException(status_code=400, detail=f"Operation {i}: unsupported method {operation.method}")
+        if method in WRITE_METHODS and not batch.atomic:
+            raise HTTPException(status_code=400, detail=f"Operation {i}: writes need an atomic batch")
+        path = operation.path.split("?", 1)[0]
+        if not path.startswith("/api/") or path.rstrip("/") == "/api/batch":
+            raise HTTPException(status_code=400, detail=f"Operation {i}: path must be an /api/ route other than /api/batch")
+
+async def _dispatch(request: Request, operation: schemas.BatchOperation) -> Tuple[int, bytes]:
+    """Run one sub-request through the app in-process."""
+    path, _, query = operation.path.partition("?")
+    body = b"" if operation.body is None else orjson.dumps(operation.body)
+    headers = [(k, v) for k, v in request.scope["headers"] if k not in (b"content-length", b"content-type")]
+    headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {key: request.scope[key] for key in _SCOPE_KEYS if key in request.scope}
+    scope.update({
+        "method": operation.method.upper(),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        # Sub-requests may see this batch's uncommitted writes, keep them out of the shared cache
+        BYPASS_SCOPE_KEY: True,
+    })
+
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status, chunks = 500, []
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        # The error middleware has already sent a 500 response
+        pass
+    return status, b"".join(chunks)
+
+def _result(operation: schemas.BatchOperation, status: int, body: bytes) -> bytes:
+    # Sub-responses are already encoded JSON; splice them in instead of re-encoding
+    head = orjson.dumps({"id": operation.id, "status": status})
+    return head[:-1] + b',"body":' + (body or b"null") + b"}"
+
+@router.post("/batch", response_model=schemas.BatchResponse)
+async def run_batch(batch: schemas.BatchRequest, request: Request):
+    """Run several API calls in one database session.
+
+    Reads always share the session. Writes are only allowed with ``atomic``:
+    everything then runs in one transaction, each route's own commit becomes
+    a savepoint, and the transaction commits only if every operation
+    succeeds. Otherwise it rolls back and the remaining operations are
+    skipped.
+    """
+    _check(batch)
+    if batch.atomic:
+        connection = await run_in_threadpool(begin_outer_transaction)
+        db = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    else:
+        connection = None
+        db = SessionLocal()
+
+    results: List[bytes] = []
+    committed = False
+    try:
+        with shared_session(db):
+            for operation in batch.operations:
+                status, body = await _dispatch(request, operation)
+                results.append(_result(operation, status, body))
+                if batch.atomic and status >= 400:
+                    break
+            else:
+                committed = connection is not None
+    finally:
+        await run_in_threadpool(db.close)
+        if connection is not None:
+            await run_in_threadpool(end_outer_transaction, connection, committed)
+
+    content = b'{"committed":' + (b"true" if committed else b"false") + b',"results":[' + b",".join(results) + b"]}"
+    return Response(content=content, media_type="application/json")
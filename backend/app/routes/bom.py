@@ -1,18 +1,48 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from ..database import get_db
-from .. import models, schemas
+from ..dates import naive_utc
+from .. import models, schemas, where_used, bom_revisions
+from ..sync import apply_changes, check_version, diff_children
 
 router = APIRouter()
 
+def _add_children(db: Session, bom_id: int, materials, steps):
+    resolved = where_used.resolve_names(db, [material.material_name for material in materials])
+    for material in materials:
+        material_id, component_part_id = resolved[material.material_name]
+        db_material = models.BOMItem(
+            bom_id=bom_id,
+            material_name=material.material_name,
+            quantity=material.quantity,
+            unit=material.unit,
+            notes=material.notes,
+            material_id=material_id,
+            component_part_id=component_part_id
+        )
+        db.add(db_material)
+    
+    for step in steps:
+        db_step = models.BOMStep(
+            bom_id=bom_id,
+            description=step.description,
+            time_minutes=step.time_minutes,
+            cost_per_hour=step.cost_per_hour,
+            notes=step.notes
+        )
+        db.add(db_step)
+
 @router.post("/api/bom", response_model=schemas.BOM)
 def create_bom(bom: schemas.BOMCreate, part_id: int, db: Session = Depends(get_db)):
     # Check if part exists
     part = db.query(models.Part).filter(models.Part.id == part_id).first()
     if not part:
         raise HTTPException(status_code=404, detail="Part not found")
+    if db.query(models.BOM.id).filter(models.BOM.part_id == part_id).first():
+        raise HTTPException(status_code=400, detail="Part already has a BOM, update it with effective_from to add a revision")
     
     # Create BOM
     db_bom = models.BOM(
@@ -24,29 +54,9 @@ def create_bom(bom: schemas.BOMCreate, part_id: int, db: Session = Depends(get_d
     )
     db.add(db_bom)
     db.flush()  # Get the BOM ID
-    
-    # Create BOM items
-    for material in bom.materials:
-        db_material = models.BOMItem(
-            bom_id=db_bom.id,
-            material_name=material.material_name,
-            quantity=material.quantity,
-            unit=material.unit,
-            notes=material.notes
-        )
-        db.add(db_material)
-    
-    # Create BOM steps
-    for step in bom.steps:
-        db_step = models.BOMStep(
-            bom_id=db_bom.id,
-            description=step.description,
-            time_minutes=step.time_minutes,
-            cost_per_hour=step.cost_per_hour,
-            notes=step.notes
-        )
-        db.add(db_step)
-    
+    _add_children(db, db_bom.id, bom.materials, bom.steps)
+    db.flush()
+    where_used.refresh_parts(db, [part_id])
     db.commit()
     db.refresh(db_bom)
     return db_bom
@@ -58,44 +68,114 @@ def get_bom(bom_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="BOM not found")
     return bom
 
+@router.get("/api/bom/part/{part_id}", response_model=schemas.BOM)
+def get_part_bom(part_id: int, as_of: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """The part's BOM revision in effect at ``as_of`` (default now)."""
+    bom = bom_revisions.at(db, part_id, naive_utc(as_of))
+    if not bom:
+        raise HTTPException(status_code=404, detail="No BOM in effect for this part")
+    return bom
+
+@router.get("/api/bom/part/{part_id}/revisions", response_model=List[schemas.BOM])
+def get_part_bom_revisions(part_id: int, db: Session = Depends(get_db)):
+    # Timeline order, the revision with an open start first
+    return db.query(models.BOM).filter(models.BOM.part_id == part_id).order_by(
+        models.BOM.effective_from.isnot(None), models.BOM.effective_from
+    ).all()
+
+@router.get("/api/bom/part/{part_id}/explosion", response_model=schemas.BOMExplosion)
+def explode_part_bom(
+    part_id: int,
+    as_of: Optional[datetime] = None,
+    quantity: float = 1.0,
+    db: Session = Depends(get_db)
+):
+    """Materials needed for ``quantity`` pieces built at ``as_of`` (default
+    now), through every level of component parts.
+    """
+    as_of = naive_utc(as_of) or datetime.utcnow()
+    index = bom_revisions.index(db)
+    revision = index.revision(part_id, as_of)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="No BOM in effect for this part")
+    usage = index.explode(part_id, as_of)
+    return {
+        "part_id": part_id,
+        "as_of": as_of,
+        "bom_id": revision.bom_id,
+        "revision": revision.revision,
+        "quantity": quantity,
+        "materials": [
+            {"material_id": material_id, "material_name": index.material_names.get(material_id), "quantity": per_piece * quantity}
+            for material_id, per_piece in sorted(usage.items())
+        ],
+    }
+
 @router.put("/api/bom/{bom_id}", response_model=schemas.BOM)
-def update_bom(bom_id: int, bom: schemas.BOMCreate, db: Session = Depends(get_db)):
+def update_bom(bom_id: int, bom: schemas.BOMUpdate, db: Session = Depends(get_db)):
     db_bom = db.query(models.BOM).filter(models.BOM.id == bom_id).first()
     if not db_bom:
         raise HTTPException(status_code=404, detail="BOM not found")
+    check_version(db_bom, bom.version, "BOM")
     
-    # Update BOM fields
-    for field in ["cycle_time_seconds", "cavities", "scrap_rate", "notes"]:
-        if hasattr(bom, field):
-            setattr(db_bom, field, getattr(bom, field))
-    
-    # Delete existing items and steps
-    db.query(models.BOMItem).filter(models.BOMItem.bom_id == bom_id).delete()
-    db.query(models.BOMStep).filter(models.BOMStep.bom_id == bom_id).delete()
-    
-    # Create new items
-    for material in bom.materials:
-        db_material = models.BOMItem(
-            bom_id=bom_id,
-            material_name=material.material_name,
-            quantity=material.quantity,
-            unit=material.unit,
-            notes=material.notes
+    if bom.effective_from is not None:
+        # Engineering change: keep this revision as history and add a new one
+        effective_from = naive_utc(bom.effective_from)
+        revision, effective_to = bom_revisions.open_revision(db, db_bom.part_id, effective_from)
+        new_bom = models.BOM(
+            part_id=db_bom.part_id,
+            cycle_time_seconds=bom.cycle_time_seconds,
+            cavities=bom.cavities,
+            scrap_rate=bom.scrap_rate,
+            notes=bom.notes,
+            revision=revision,
+            effective_from=effective_from,
+            effective_to=effective_to
         )
-        db.add(db_material)
+        db.add(new_bom)
+        db.flush()
+        _add_children(db, new_bom.id, bom.materials, bom.steps)
+        db.flush()
+        where_used.refresh_parts(db, [db_bom.part_id])
+        db.commit()
+        db.refresh(new_bom)
+        return new_bom
     
-    # Create new steps
-    for step in bom.steps:
-        db_step = models.BOMStep(
-            bom_id=bom_id,
-            description=step.description,
-            time_minutes=step.time_minutes,
-            cost_per_hour=step.cost_per_hour,
-            notes=step.notes
-        )
-        db.add(db_step)
+    # Items and steps are matched by id and only changed rows are written
+    resolved = where_used.resolve_names(db, [material.material_name for material in bom.materials])
+    material_changes = diff_children(
+        db, models.BOMItem, "bom_id", bom_id,
+        [
+            {
+                **material.dict(),
+                "material_id": resolved[material.material_name][0],
+                "component_part_id": resolved[material.material_name][1]
+            }
+            for material in bom.materials
+        ],
+        fields=["material_name", "quantity", "unit", "notes", "material_id", "component_part_id"]
+    )
+    step_changes = diff_children(
+        db, models.BOMStep, "bom_id", bom_id,
+        [step.dict() for step in bom.steps],
+        fields=["description", "time_minutes", "cost_per_hour", "notes"]
+    )
     
-    db.commit()
+    # Update BOM fields
+    header_changed = False
+    for field in ["cycle_time_seconds", "cavities", "scrap_rate", "notes"]:
+        value = getattr(bom, field)
+        if getattr(db_bom, field) != value:
+            setattr(db_bom, field, value)
+            header_changed = True
+    
+    if header_changed or material_changes or step_changes:
+        apply_changes(db, material_changes)
+        apply_changes(db, step_changes)
+        if material_changes:
+            where_used.refresh_parts(db, [db_bom.part_id])
+        db_bom.version += 1
+        db.commit()
     db.refresh(db_bom)
     return db_bom
 
@@ -105,6 +185,10 @@ def delete_bom(bom_id: int, db: Session = Depends(get_db)):
     if not bom:
         raise HTTPException(status_code=404, detail="BOM not found")
     
+    part_id = bom.part_id
+    bom_revisions.close_gap(db, bom)
     db.delete(bom)
+    db.flush()
+    where_used.refresh_parts(db, [part_id])
     db.commit()
     return {"message": "BOM deleted successfully"} 
\ No newline at end of file
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
-from sqlalchemy import or_
+from datetime import datetime
+from sqlalchemy import or_, func, case
+from sqlalchemy.orm import selectinload
 
 from ..database import get_db
-from .. import models, schemas
+from ..delta_sync import Delta
+from .. import models, schemas, serializers, customer_links
 
 router = APIRouter(tags=["customers"])
 
@@ -21,8 +24,9 @@ def search_customers(query: Optional[str] = None, db: Session = Depends(get_db))
     ).all()
 
 @router.get("/customers", response_model=List[schemas.CustomerResponse])
-def get_customers(db: Session = Depends(get_db)):
-    return db.query(models.Customer).all()
+def get_customers(response: Response, delta: Delta = Depends(), db: Session = Depends(get_db)):
+    customers = delta.apply(db.query(models.Customer), models.Customer.updated_at).all()
+    return delta.respond(response, serializers.render(schemas.CustomerResponse, customers))
 
 @router.get("/customers/{customer_id}", response_model=schemas.CustomerResponse)
 def get_customer(customer_id: int, db: Session = Depends(get_db)):
@@ -31,6 +35,66 @@ def get_customer(customer_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
 
+def _get_customer_or_404(db: Session, customer_id: int):
+    customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return customer
+
+@router.get("/customers/{customer_id}/orders", response_model=List[schemas.Order])
+def get_customer_orders(
+    customer_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    include_archived: bool = False,
+    db: Session = Depends(get_db)
+):
+    _get_customer_or_404(db, customer_id)
+    orders = []
+    for model in (models.Order, models.ArchivedOrder) if include_archived else (models.Order,):
+        # Served by ix_orders_customer_id_due_date (ix_archived_orders_customer_id when archived)
+        query = db.query(model).options(selectinload(model.items)).filter(model.customer_id == customer_id)
+        if start:
+            query = query.filter(model.due_date >= start)
+        if end:
+            query = query.filter(model.due_date < end)
+        if status:
+            query = query.filter(model.status == status)
+        orders += query.order_by(model.due_date).all()
+    if include_archived:
+        orders.sort(key=lambda order: order.due_date or datetime.min)
+    return serializers.render(schemas.Order, orders)
+
+@router.get("/customers/{customer_id}/summary", response_model=schemas.CustomerSummary)
+def get_customer_summary(customer_id: int, db: Session = Depends(get_db)):
+    customer = _get_customer_or_404(db, customer_id)
+    Order = models.Order
+    orders = db.query(
+        func.count(Order.id),
+        func.sum(case((Order.status.in_(["open", "in_progress"]), 1), else_=0)),
+        func.min(Order.due_date),
+        func.max(Order.due_date)
+    ).filter(Order.customer_id == customer_id).one()
+    quantity, revenue = db.query(
+        func.sum(models.OrderItem.quantity),
+        func.sum(models.OrderItem.quantity * models.Part.price)
+    ).join(Order, Order.id == models.OrderItem.order_id).join(
+        models.Part, models.Part.id == models.OrderItem.part_id
+    ).filter(Order.customer_id == customer_id, Order.status != "cancelled").one()
+    parts = db.query(func.count(models.Part.id)).filter(models.Part.customer_id == customer_id).scalar()
+    return {
+        "customer_id": customer.id,
+        "name": customer.name,
+        "orders": orders[0],
+        "open_orders": orders[1] or 0,
+        "parts": parts,
+        "total_quantity": quantity or 0,
+        "revenue": revenue or 0.0,
+        "first_due_date": orders[2],
+        "last_due_date": orders[3]
+    }
+
 @router.post("/customers", response_model=schemas.CustomerResponse)
 def create_customer(customer: schemas.CustomerCreate, db: Session = Depends(get_db)):
     try:
@@ -42,6 +106,8 @@ def create_customer(customer: schemas.CustomerCreate, db: Session = Depends(get_
             notes=customer.notes
         )
         db.add(db_customer)
+        db.flush()
+        customer_links.link_new_customer(db, db_customer)
         db.commit()
         db.refresh(db_customer)
         return db_customer
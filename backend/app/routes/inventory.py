@@ -1,52 +1,126 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import current_shared_session, get_db, retry_on_busy
+from ..delta_sync import Delta
+from ..fieldsets import FieldSelection
+from .. import models, schemas, serializers, genealogy, inventory_ledger, reference_cache
+from ..sync import check_version
 
 router = APIRouter(tags=["inventory"])
 
+Type = schemas.InventoryTransactionType
+
 @router.get("/inventory", response_model=List[schemas.InventoryItem])
-def get_inventory(db: Session = Depends(get_db)):
-    inventory = db.query(models.InventoryItem).all()
-    return inventory
+def get_inventory(
+    response: Response,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.InventoryItem)),
+    delta: Delta = Depends(),
+    db: Session = Depends(get_db)
+):
+    inventory = delta.apply(selection.apply(db.query(models.InventoryItem)), models.InventoryItem.last_updated).all()
+    if selection.active:
+        return delta.respond(response, selection.response(inventory))
+    return delta.respond(response, serializers.render(schemas.InventoryItem, inventory))
 
 @router.post("/inventory", response_model=schemas.InventoryItem)
+@retry_on_busy
 def create_inventory_item(item: schemas.InventoryItemCreate, db: Session = Depends(get_db)):
     # Verify material exists
-    material = db.query(models.Material).filter(models.Material.id == item.material_id).first()
-    if not material:
-        raise HTTPException(status_code=404, detail=f"Material with id {item.material_id} not found")
+    reference_cache.require(db, models.Material, [item.material_id])
+    
+    if item.production_run_id is not None:
+        run = db.query(models.ProductionRun.id).filter(models.ProductionRun.id == item.production_run_id).first()
+        if not run:
+            raise HTTPException(status_code=404, detail=f"Production run with id {item.production_run_id} not found")
     
     db_item = models.InventoryItem(**item.dict())
     db.add(db_item)
+    db.flush()
+    if db_item.quantity:
+        inventory_ledger.log(db, [schemas.InventoryTransactionCreate(
+            inventory_item_id=db_item.id, transaction_type=Type.RECEIPT, quantity=db_item.quantity,
+        )])
+    if db_item.production_run_id is not None:
+        genealogy.link_run(db, db_item.production_run_id)
     db.commit()
     db.refresh(db_item)
     return db_item
 
+@router.post("/inventory/transactions", response_model=List[schemas.InventoryTransaction])
+async def post_inventory_transactions(batch: schemas.InventoryTransactionBatch):
+    """Record stock movements and apply them to their lots.
+
+    The movements of one call are applied together or not at all, and are
+    group-committed with concurrent calls (see app/inventory_ledger.py).
+    """
+    db = current_shared_session()
+    if db is not None:
+        # Inside a batch, write in the batch's transaction
+        inventory_ledger.check(batch.transactions)
+        return await run_in_threadpool(inventory_ledger.apply_in_session, db, batch.transactions)
+    return await inventory_ledger.writer.submit(batch.transactions)
+
+@router.get("/inventory/{item_id}/transactions", response_model=List[schemas.InventoryTransaction])
+def get_inventory_item_transactions(
+    item_id: int,
+    since: Optional[datetime] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Newest first; served by ix_inventory_transactions_inventory_item_id_created_at."""
+    query = db.query(models.InventoryTransaction).filter(models.InventoryTransaction.inventory_item_id == item_id)
+    if since:
+        query = query.filter(models.InventoryTransaction.created_at >= since)
+    transactions = query.order_by(
+        models.InventoryTransaction.created_at.desc(), models.InventoryTransaction.id.desc()
+    ).limit(limit).all()
+    return serializers.render(schemas.InventoryTransaction, transactions)
+
 @router.get("/inventory/{item_id}", response_model=schemas.InventoryItem)
-def get_inventory_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(models.InventoryItem).filter(models.InventoryItem.id == item_id).first()
+def get_inventory_item(
+    item_id: int,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.InventoryItem)),
+    db: Session = Depends(get_db)
+):
+    item = selection.apply(db.query(models.InventoryItem)).filter(models.InventoryItem.id == item_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Inventory item not found")
+    if selection.active:
+        return selection.response(item)
     return item
 
 @router.put("/inventory/{item_id}", response_model=schemas.InventoryItem)
+@retry_on_busy
 def update_inventory_item(item_id: int, item: schemas.InventoryItemUpdate, db: Session = Depends(get_db)):
     db_item = db.query(models.InventoryItem).filter(models.InventoryItem.id == item_id).first()
     if not db_item:
         raise HTTPException(status_code=404, detail="Inventory item not found")
+    check_version(db_item, item.version, "Inventory item")
     
-    for field, value in item.dict(exclude_unset=True).items():
+    changes = item.dict(exclude_unset=True, exclude={"version"})
+    movements = []
+    if changes.get("quantity") is not None and changes["quantity"] != (db_item.quantity or 0):
+        movements.append(schemas.InventoryTransactionCreate(
+            inventory_item_id=item_id, transaction_type=Type.ADJUST, quantity=changes["quantity"] - (db_item.quantity or 0),
+        ))
+    if changes.get("location") is not None and changes["location"] != db_item.location:
+        movements.append(schemas.InventoryTransactionCreate(
+            inventory_item_id=item_id, transaction_type=Type.MOVE, location=changes["location"],
+        ))
+    for field, value in changes.items():
         setattr(db_item, field, value)
     
+    inventory_ledger.log(db, movements)
     db.commit()
     db.refresh(db_item)
     return db_item
 
 @router.delete("/inventory/{item_id}")
+@retry_on_busy
 def delete_inventory_item(item_id: int, db: Session = Depends(get_db)):
     item = db.query(models.InventoryItem).filter(models.InventoryItem.id == item_id).first()
     if not item:
@@ -0,0 +1,194 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+
+from ..database import get_db
+from ..dates import naive_utc
+from .. import models, schemas, serializers, oee, capacity
+
+router = APIRouter(tags=["machines"])
+
+def _oee_window(start: Optional[datetime], end: Optional[datetime]):
+    start, end = naive_utc(start), naive_utc(end)
+    end = end or oee.day_floor(datetime.utcnow()) + timedelta(days=1)
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+@router.post("/machines/oee/recompute", response_model=schemas.OEERecomputeResult)
+def recompute_oee(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    machine_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    start, end = _oee_window(start, end)
+    machine_ids = [machine_id] if machine_id is not None else None
+    return oee.compute(db, start, end, machine_ids)
+
+@router.get("/machines/oee", response_model=List[schemas.MachineOEESummary])
+def get_oee_summary(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    machine_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    start, end = _oee_window(start, end)
+    return oee.summary(db, start, end, machine_id)
+
+@router.get("/machines/{machine_id}/oee", response_model=List[schemas.MachineShiftMetric])
+def get_machine_oee(
+    machine_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    start, end = _oee_window(start, end)
+    metrics = db.query(models.MachineShiftMetric).filter(
+        models.MachineShiftMetric.machine_id == machine_id,
+        models.MachineShiftMetric.shift_start >= start,
+        models.MachineShiftMetric.shift_start < end
+    ).order_by(models.MachineShiftMetric.shift_start).all()
+    return serializers.render(schemas.MachineShiftMetric, metrics)
+
+@router.get("/machines/capacity", response_model=List[schemas.MachineCapacity])
+def get_machine_capacity(
+    start: datetime,
+    end: datetime,
+    machine_ids: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    start, end = naive_utc(start), naive_utc(end)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    ids = None
+    if machine_ids:
+        try:
+            ids = [int(value) for value in machine_ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="machine_ids must be a comma separated list of ids")
+    return capacity.calendar.free_capacity(db, ids, start, end)
+
+@router.get("/machines", response_model=List[schemas.MachineResponse])
+def get_machines(db: Session = Depends(get_db)):
+    machines = db.query(models.Machine).all()
+    return serializers.render(schemas.MachineResponse, machines)
+
+@router.post("/machines", response_model=schemas.MachineResponse)
+def create_machine(machine: schemas.MachineCreate, db: Session = Depends(get_db)):
+    existing = db.query(models.Machine).filter(models.Machine.name == machine.name).first()
+    if existing:
+        raise HTTPException(status_code=400, detail=f"Machine {machine.name} already exists")
+
+    db_machine = models.Machine(**machine.dict())
+    db.add(db_machine)
+    db.commit()
+    db.refresh(db_machine)
+    capacity.calendar.upsert_machine(db_machine)
+    return db_machine
+
+@router.get("/machines/{machine_id}", response_model=schemas.MachineResponse)
+def get_machine(machine_id: int, db: Session = Depends(get_db)):
+    machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    return machine
+
+@router.put("/machines/{machine_id}", response_model=schemas.MachineResponse)
+def update_machine(machine_id: int, machine: schemas.MachineUpdate, db: Session = Depends(get_db)):
+    db_machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
+    if not db_machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+
+    for field, value in machine.dict(exclude_unset=True).items():
+        setattr(db_machine, field, value)
+    db_machine.last_updated = datetime.utcnow()
+
+    db.commit()
+    db.refresh(db_machine)
+    capacity.calendar.upsert_machine(db_machine)
+    return db_machine
+
+@router.delete("/machines/{machine_id}")
+def delete_machine(machine_id: int, db: Session = Depends(get_db)):
+    machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+
+    db.delete(machine)
+    db.commit()
+    capacity.calendar.remove_machine(machine_id)
+    return {"message": "Machine deleted successfully"}
+
+def _duration_minutes(record: models.MaintenanceRecord) -> Optional[int]:
+    if record.start_time and record.end_time:
+        return int((record.end_time - record.start_time).total_seconds() // 60)
+    return record.duration_minutes
+
+@router.get("/maintenance-records", response_model=List[schemas.MaintenanceRecord])
+def get_maintenance_records(
+    machine_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    start, end = naive_utc(start), naive_utc(end)
+    query = db.query(models.MaintenanceRecord)
+    if machine_id is not None:
+        query = query.filter(models.MaintenanceRecord.machine_id == machine_id)
+    if start:
+        query = query.filter(models.MaintenanceRecord.start_time >= start)
+    if end:
+        query = query.filter(models.MaintenanceRecord.start_time < end)
+    records = query.order_by(models.MaintenanceRecord.start_time).all()
+    return serializers.render(schemas.MaintenanceRecord, records)
+
+@router.post("/maintenance-records", response_model=schemas.MaintenanceRecord)
+def create_maintenance_record(record: schemas.MaintenanceRecordCreate, db: Session = Depends(get_db)):
+    # Verify machine exists
+    machine = db.query(models.Machine).filter(models.Machine.id == record.machine_id).first()
+    if not machine:
+        raise HTTPException(status_code=404, detail=f"Machine with id {record.machine_id} not found")
+
+    values = record.dict()
+    # Stored as naive UTC, so the duration can subtract the two
+    for field in ("start_time", "end_time"):
+        values[field] = naive_utc(values.get(field))
+    db_record = models.MaintenanceRecord(**values)
+    db_record.duration_minutes = _duration_minutes(db_record)
+    db.add(db_record)
+    db.commit()
+    db.refresh(db_record)
+    capacity.calendar.upsert_record(db_record)
+    return db_record
+
+@router.put("/maintenance-records/{record_id}", response_model=schemas.MaintenanceRecord)
+def update_maintenance_record(record_id: int, record: schemas.MaintenanceRecordUpdate, db: Session = Depends(get_db)):
+    db_record = db.query(models.MaintenanceRecord).filter(models.MaintenanceRecord.id == record_id).first()
+    if not db_record:
+        raise HTTPException(status_code=404, detail="Maintenance record not found")
+
+    for field, value in record.dict(exclude_unset=True).items():
+        if field in ("start_time", "end_time"):
+            value = naive_utc(value)
+        setattr(db_record, field, value)
+    db_record.duration_minutes = _duration_minutes(db_record)
+
+    db.commit()
+    db.refresh(db_record)
+    capacity.calendar.upsert_record(db_record)
+    return db_record
+
+@router.delete("/maintenance-records/{record_id}")
+def delete_maintenance_record(record_id: int, db: Session = Depends(get_db)):
+    record = db.query(models.MaintenanceRecord).filter(models.MaintenanceRecord.id == record_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Maintenance record not found")
+
+    machine_id = record.machine_id
+    db.delete(record)
+    db.commit()
+    capacity.calendar.remove_record(record_id, machine_id)
+    return {"message": "Maintenance record deleted successfully"}
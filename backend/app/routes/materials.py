@@ -1,26 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
-from .. import models, schemas
+from .. import models, schemas, serializers, where_used, reference_cache, json_fields
 
 router = APIRouter(tags=["materials"])
 
 @router.get("/materials", response_model=List[schemas.Material])
-def get_materials(db: Session = Depends(get_db)):
-    materials = db.query(models.Material).all()
-    return materials
+def get_materials(
+    spec: Optional[List[str]] = Query(None, description="Specification filters like grade=PA66 or melt_flow>20, all must match"),
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.Material)
+    if spec:
+        query = query.filter(*json_fields.conditions(models.Material.specifications, spec))
+    materials = query.all()
+    return serializers.render(schemas.Material, materials)
 
 @router.post("/materials", response_model=schemas.Material)
 def create_material(material: schemas.MaterialCreate, db: Session = Depends(get_db)):
     # Verify supplier exists
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == material.supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail=f"Supplier with id {material.supplier_id} not found")
+    reference_cache.require(db, models.Supplier, [material.supplier_id])
     
-    db_material = models.Material(**material.dict())
+    db_material = models.Material(**{**material.dict(), "type": models.MaterialType(material.type.value)})
     db.add(db_material)
+    db.flush()
+    where_used.resolve_new_name(db, db_material.name)
     db.commit()
     db.refresh(db_material)
-    return db_material 
\ No newline at end of file
+    return db_material
+
+@router.get("/materials/{material_id}/where-used", response_model=List[schemas.WhereUsedEntry])
+def get_material_where_used(material_id: int, db: Session = Depends(get_db)):
+    material = db.query(models.Material.id).filter(models.Material.id == material_id).first()
+    if not material:
+        raise HTTPException(status_code=404, detail="Material not found")
+    return where_used.lookup(db, where_used.MATERIAL, material_id) 
\ No newline at end of file
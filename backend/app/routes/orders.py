@@ -1,35 +1,79 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from sqlalchemy import or_
+from sqlalchemy.exc import DBAPIError
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import get_db, retry_on_busy
+from ..dates import naive_utc
+from ..delta_sync import Delta
+from ..fieldsets import FieldSelection
+from ..sync import apply_changes, check_version, diff_children, touch
+from .. import models, schemas, serializers, customer_links, order_summaries, reference_cache
 
 router = APIRouter(tags=["orders"])
 
 @router.get("/orders/search", response_model=List[schemas.Order])
-def search_orders(query: Optional[str] = None, db: Session = Depends(get_db)):
+def search_orders(
+    query: Optional[str] = None,
+    include_archived: bool = False,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.Order)),
+    db: Session = Depends(get_db)
+):
     if not query:
         return []
     
     # Search in order_number and customer
-    orders = db.query(models.Order).filter(
-        or_(
-            models.Order.order_number.ilike(f"%{query}%"),
-            models.Order.customer.ilike(f"%{query}%")
-        )
-    ).all()
-    return orders
+    def search(model, model_selection):
+        return model_selection.apply(db.query(model)).filter(
+            or_(
+                model.order_number.ilike(f"%{query}%"),
+                model.customer.ilike(f"%{query}%")
+            )
+        ).all()
+
+    orders = search(models.Order, selection)
+    if include_archived:
+        orders += search(models.ArchivedOrder, selection.with_model(models.ArchivedOrder))
+    if selection.active:
+        return selection.response(orders)
+    return serializers.render(schemas.Order, orders)
 
 @router.get("/orders", response_model=List[schemas.Order])
-def get_orders(db: Session = Depends(get_db)):
-    orders = db.query(models.Order).all()
-    return orders
+def get_orders(
+    response: Response,
+    include_archived: bool = False,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.Order)),
+    delta: Delta = Depends(),
+    db: Session = Depends(get_db)
+):
+    orders = delta.apply(
+        selection.apply(db.query(models.Order)),
+        models.Order.updated_at, (models.OrderItem.order_id, models.OrderItem.updated_at)
+    ).all()
+    if include_archived:
+        orders += delta.apply(
+            selection.with_model(models.ArchivedOrder).apply(db.query(models.ArchivedOrder)),
+            models.ArchivedOrder.updated_at, (models.ArchivedOrderItem.order_id, models.ArchivedOrderItem.updated_at)
+        ).all()
+    if selection.active:
+        return delta.respond(response, selection.response(orders))
+    return delta.respond(response, serializers.render(schemas.Order, orders))
+
+@router.get("/orders/summaries", response_model=List[schemas.OrderSummary])
+def get_order_summaries(
+    status: Optional[List[str]] = Query(None),
+    due_before: Optional[datetime] = None,
+    late_only: bool = False,
+    db: Session = Depends(get_db)
+):
+    return order_summaries.dashboard(db, status, naive_utc(due_before), late_only)
 
 @router.post("/orders", response_model=schemas.Order)
+@retry_on_busy
 def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
+    customer_id = customer_links.resolve(db, order.customer, order.customer_id)
     try:
         # Generate order number
         order_number = f"ORD-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
@@ -42,6 +86,7 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
         db_order = models.Order(
             order_number=order_number,
             customer=order.customer,
+            customer_id=customer_id,
             due_date=due_date,
             status=order.status,
             notes=order.notes
@@ -49,13 +94,11 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
         db.add(db_order)
         db.flush()  # Get the order ID
         
+        # Verify all referenced parts exist
+        reference_cache.require(db, models.Part, {item.part_id for item in order.items})
+        
         # Create order items
         for item in order.items:
-            # Verify part exists
-            part = db.query(models.Part).filter(models.Part.id == item.part_id).first()
-            if not part:
-                raise HTTPException(status_code=404, detail=f"Part with id {item.part_id} not found")
-            
             now = datetime.utcnow()
             db_item = models.OrderItem(
                 order_id=db_order.id,
@@ -67,60 +110,93 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
             )
             db.add(db_item)
         
+        db.flush()
+        order_summaries.refresh(db, [db_order.id])
         db.commit()
         db.refresh(db_order)
         return db_order
+    except (HTTPException, DBAPIError):
+        # Keep 404s as they are and let retry_on_busy and the 503 handler see locks
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         print(f"Error creating order: {str(e)}")  # Add logging
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/orders/{order_id}", response_model=schemas.Order)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+def get_order(
+    order_id: int,
+    include_archived: bool = False,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.Order)),
+    db: Session = Depends(get_db)
+):
+    order = selection.apply(db.query(models.Order)).filter(models.Order.id == order_id).first()
+    if not order and include_archived:
+        order = selection.with_model(models.ArchivedOrder).apply(db.query(models.ArchivedOrder)).filter(
+            models.ArchivedOrder.id == order_id
+        ).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    if selection.active:
+        return selection.response(order)
     return order
 
 @router.put("/orders/{order_id}", response_model=schemas.Order)
-def update_order(order_id: int, order: schemas.OrderCreate, db: Session = Depends(get_db)):
+@retry_on_busy
+def update_order(order_id: int, order: schemas.OrderUpdate, db: Session = Depends(get_db)):
     db_order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
+    check_version(db_order, order.version, "Order")
     
-    # Update order fields
-    for field in ["customer", "due_date", "status", "notes"]:
-        if hasattr(order, field):
-            setattr(db_order, field, getattr(order, field))
+    # Verify all referenced parts exist
+    reference_cache.require(db, models.Part, {item.part_id for item in order.items})
     
-    # Delete existing items
-    db.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).delete()
+    # Items are matched by id so unchanged lines keep their rows and ids
+    changes = diff_children(
+        db, models.OrderItem, "order_id", order_id,
+        [item.dict() for item in order.items],
+        fields=["part_id", "quantity", "status"]
+    )
+    if changes.deletes:
+        in_production = db.query(models.ProductionRun.order_item_id).filter(
+            models.ProductionRun.order_item_id.in_(changes.deletes)
+        ).first()
+        if in_production:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Order item {in_production.order_item_id} has production runs and cannot be removed"
+            )
     
-    # Create new items
-    for item in order.items:
-        # Verify part exists
-        part = db.query(models.Part).filter(models.Part.id == item.part_id).first()
-        if not part:
-            raise HTTPException(status_code=404, detail=f"Part with id {item.part_id} not found")
-        
-        db_item = models.OrderItem(
-            order_id=order_id,
-            part_id=item.part_id,
-            quantity=item.quantity,
-            status=item.status
-        )
-        db.add(db_item)
+    # Update order fields
+    header_changed = False
+    values = order.dict(include={"customer", "due_date", "status", "notes"})
+    values["customer_id"] = customer_links.resolve(db, order.customer, order.customer_id)
+    # Stored as naive UTC, an aware "...Z" value would never compare equal
+    values["due_date"] = naive_utc(order.due_date)
+    for field, value in values.items():
+        if getattr(db_order, field) != value:
+            setattr(db_order, field, value)
+            header_changed = True
     
-    db.commit()
+    if header_changed or changes:
+        apply_changes(db, changes)
+        touch(db_order)
+        db.flush()
+        order_summaries.refresh(db, [order_id])
+        db.commit()
     db.refresh(db_order)
     return db_order
 
 @router.delete("/orders/{order_id}")
+@retry_on_busy
 def delete_order(order_id: int, db: Session = Depends(get_db)):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    order_summaries.discard(db, [order_id])
     db.delete(order)
     db.commit()
     return {"message": "Order deleted successfully"} 
\ No newline at end of file
@@ -4,36 +4,50 @@ from typing import List, Optional
 from sqlalchemy import or_
 
 from ..database import get_db
-from .. import models, schemas
+from ..fieldsets import FieldSelection
+from .. import models, schemas, serializers, where_used, customer_links
 
 router = APIRouter(tags=["parts"])
 
 @router.get("/parts/search", response_model=List[schemas.PartResponse])
-def search_parts(query: Optional[str] = None, db: Session = Depends(get_db)):
+def search_parts(
+    query: Optional[str] = None,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.Part)),
+    db: Session = Depends(get_db)
+):
     if not query:
         return []
     
     # Search in part_number and description
-    parts = db.query(models.Part).filter(
+    parts = selection.apply(db.query(models.Part)).filter(
         or_(
             models.Part.part_number.ilike(f"%{query}%"),
             models.Part.description.ilike(f"%{query}%")
         )
     ).all()
-    return parts
+    if selection.active:
+        return selection.response(parts)
+    return serializers.render(schemas.PartResponse, parts)
 
 @router.get("/parts", response_model=List[schemas.PartResponse])
-def get_parts(db: Session = Depends(get_db)):
-    parts = db.query(models.Part).all()
-    return parts
+def get_parts(
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.Part)),
+    db: Session = Depends(get_db)
+):
+    parts = selection.apply(db.query(models.Part)).all()
+    if selection.active:
+        return selection.response(parts)
+    return serializers.render(schemas.PartResponse, parts)
 
 @router.post("/parts", response_model=schemas.PartResponse)
 def create_part(part: schemas.PartCreate, db: Session = Depends(get_db)):
+    customer_id = customer_links.resolve(db, part.customer, part.customer_id)
     try:
         db_part = models.Part(
             part_number=part.part_number,
             description=part.description,
             customer=part.customer,
+            customer_id=customer_id,
             material=part.material,
             cycle_time=part.cycle_time,
             price=part.price,
@@ -41,6 +55,8 @@ def create_part(part: schemas.PartCreate, db: Session = Depends(get_db)):
             setup_time=part.setup_time
         )
         db.add(db_part)
+        db.flush()
+        where_used.resolve_new_name(db, db_part.part_number)
         db.commit()
         db.refresh(db_part)
         return db_part
@@ -53,6 +69,14 @@ def delete_part(part_id: int, db: Session = Depends(get_db)):
     part = db.query(models.Part).filter(models.Part.id == part_id).first()
     if not part:
         raise HTTPException(status_code=404, detail="Part not found")
+    where_used.remove_part(db, part_id)
     db.delete(part)
     db.commit()
-    return {"message": "Part deleted successfully"} 
\ No newline at end of file
+    return {"message": "Part deleted successfully"}
+
+@router.get("/parts/{part_id}/where-used", response_model=List[schemas.WhereUsedEntry])
+def get_part_where_used(part_id: int, db: Session = Depends(get_db)):
+    part = db.query(models.Part.id).filter(models.Part.id == part_id).first()
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found")
+    return where_used.lookup(db, where_used.PART, part_id) 
\ No newline at end of file
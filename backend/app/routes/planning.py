@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..database import get_db
+from .. import models, schemas, serializers, forecasting, safety_stock
+
+router = APIRouter(tags=["planning"])
+
+@router.post("/planning/forecasts", response_model=schemas.ForecastRunResult)
+def run_forecasts(weeks: int = forecasting.HISTORY_WEEKS, db: Session = Depends(get_db)):
+    if weeks < 4:
+        raise HTTPException(status_code=400, detail="weeks must be at least 4")
+    return forecasting.compute(db, weeks)
+
+@router.get("/planning/forecasts", response_model=List[schemas.DemandForecast])
+def get_forecasts(part_id: Optional[int] = None, db: Session = Depends(get_db)):
+    query = db.query(models.DemandForecast)
+    if part_id is not None:
+        query = query.filter(models.DemandForecast.part_id == part_id)
+    forecasts = query.order_by(models.DemandForecast.part_id).all()
+    return serializers.render(schemas.DemandForecast, forecasts)
+
+@router.get("/planning/demand", response_model=List[schemas.PlanningDemand])
+def get_planning_demand(weeks: int = 12, part_id: Optional[int] = None, db: Session = Depends(get_db)):
+    if not 1 <= weeks <= 104:
+        raise HTTPException(status_code=400, detail="weeks must be between 1 and 104")
+    return forecasting.planning_demand(db, weeks, part_id)
+
+@router.post("/planning/reorder-proposals", response_model=schemas.ReorderProposalRunResult)
+def run_reorder_proposals(
+    service_level: float = safety_stock.DEFAULT_SERVICE_LEVEL,
+    weeks: int = safety_stock.HISTORY_WEEKS,
+    db: Session = Depends(get_db)
+):
+    if not 0.5 <= service_level < 1:
+        raise HTTPException(status_code=400, detail="service_level must be at least 0.5 and below 1")
+    if weeks < 4:
+        raise HTTPException(status_code=400, detail="weeks must be at least 4")
+    return safety_stock.propose(db, service_level, weeks)
+
+@router.get("/planning/reorder-proposals", response_model=List[schemas.ReorderPointProposal])
+def get_reorder_proposals(
+    status: Optional[str] = None,
+    material_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    query = db.query(models.ReorderPointProposal)
+    if status:
+        query = query.filter(models.ReorderPointProposal.status == status)
+    if material_id is not None:
+        query = query.filter(models.ReorderPointProposal.material_id == material_id)
+    proposals = query.order_by(models.ReorderPointProposal.material_id).all()
+    return serializers.render(schemas.ReorderPointProposal, proposals)
+
+@router.post("/planning/reorder-proposals/apply", response_model=schemas.ReorderProposalApplyResult)
+def apply_reorder_proposals(request: schemas.ReorderProposalApply, db: Session = Depends(get_db)):
+    return {"applied": safety_stock.apply(db, request.material_ids)}
@@ -1,17 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import get_db, retry_on_busy
+from ..delta_sync import Delta
+from ..fieldsets import FieldSelection
+from .. import models, schemas, serializers, genealogy, inventory_ledger, order_summaries
 
 router = APIRouter(tags=["production_runs"])
 
 @router.get("/production-runs", response_model=List[schemas.ProductionRunResponse])
-def get_production_runs(db: Session = Depends(get_db)):
-    runs = db.query(models.ProductionRun).all()
-    return runs
+def get_production_runs(
+    response: Response,
+    include_archived: bool = False,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.ProductionRun)),
+    delta: Delta = Depends(),
+    db: Session = Depends(get_db)
+):
+    runs = delta.apply(selection.apply(db.query(models.ProductionRun)), models.ProductionRun.updated_at).all()
+    if include_archived:
+        runs += delta.apply(
+            selection.with_model(models.ArchivedProductionRun).apply(db.query(models.ArchivedProductionRun)),
+            models.ArchivedProductionRun.updated_at
+        ).all()
+    if selection.active:
+        return delta.respond(response, selection.response(runs))
+    return delta.respond(response, serializers.render(schemas.ProductionRunResponse, runs))
 
 @router.post("/production-runs", response_model=schemas.ProductionRunResponse)
 def create_production_run(run: schemas.ProductionRunCreate, db: Session = Depends(get_db)):
@@ -28,8 +43,77 @@ def create_production_run(run: schemas.ProductionRunCreate, db: Session = Depend
     if not order_item:
         raise HTTPException(status_code=404, detail=f"Order item with id {run.order_item_id} not found for order {run.order_id}")
     
+    _check_machine(db, run.machine_id)
+    
     db_run = models.ProductionRun(**run.dict())
     db.add(db_run)
+    db.flush()
+    order_summaries.refresh(db, [db_run.order_id])
+    db.commit()
+    db.refresh(db_run)
+    return db_run
+
+@router.put("/production-runs/{run_id}", response_model=schemas.ProductionRunResponse)
+def update_production_run(run_id: int, run: schemas.ProductionRunUpdate, db: Session = Depends(get_db)):
+    db_run = db.query(models.ProductionRun).filter(models.ProductionRun.id == run_id).first()
+    if not db_run:
+        raise HTTPException(status_code=404, detail="Production run not found")
+    
+    changes = run.dict(exclude_unset=True)
+    _check_machine(db, changes.get("machine_id"))
+    for field, value in changes.items():
+        setattr(db_run, field, value)
+    
+    db.flush()
+    order_summaries.refresh(db, [db_run.order_id])
     db.commit()
     db.refresh(db_run)
-    return db_run 
\ No newline at end of file
+    return db_run
+
+@router.get("/production-runs/{run_id}/consumptions", response_model=List[schemas.InventoryConsumption])
+def get_run_consumptions(run_id: int, db: Session = Depends(get_db)):
+    consumptions = db.query(models.InventoryConsumption).filter(
+        models.InventoryConsumption.production_run_id == run_id
+    ).order_by(models.InventoryConsumption.id).all()
+    return serializers.render(schemas.InventoryConsumption, consumptions)
+
+@router.post("/production-runs/{run_id}/consumptions", response_model=List[schemas.InventoryConsumption])
+@retry_on_busy
+def consume_inventory(run_id: int, consumption: schemas.InventoryConsumptionCreate, db: Session = Depends(get_db)):
+    if not consumption.lines:
+        raise HTTPException(status_code=400, detail="Consumption has no lines")
+    run = db.query(models.ProductionRun.id).filter(models.ProductionRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Production run not found")
+    
+    # Issued through the ledger, which rejects unknown lots and lines that
+    # would take a lot below zero, and changes the lots by relative UPDATEs
+    inventory_ledger.record(db, [
+        schemas.InventoryTransactionCreate(
+            inventory_item_id=line.inventory_item_id,
+            transaction_type=schemas.InventoryTransactionType.ISSUE,
+            quantity=line.quantity,
+            reference=f"production run {run_id}",
+        )
+        for line in consumption.lines
+    ])
+    consumed_at = datetime.utcnow()
+    db.bulk_insert_mappings(models.InventoryConsumption, [
+        {
+            "production_run_id": run_id,
+            "inventory_item_id": line.inventory_item_id,
+            "quantity": line.quantity,
+            "consumed_at": consumed_at
+        }
+        for line in consumption.lines
+    ])
+    genealogy.link_run(db, run_id)
+    db.commit()
+    return get_run_consumptions(run_id, db)
+
+def _check_machine(db: Session, machine_id):
+    if machine_id is None:
+        return
+    machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
+    if not machine:
+        raise HTTPException(status_code=404, detail=f"Machine with id {machine_id} not found") 
\ No newline at end of file
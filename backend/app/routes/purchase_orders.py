@@ -1,27 +1,36 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
+from sqlalchemy import func, insert
 from typing import List
 from datetime import datetime
 
-from ..database import get_db
-from .. import models, schemas
+from ..database import get_db, retry_on_busy
+from ..dates import naive_utc
+from ..fieldsets import FieldSelection
+from ..sync import apply_changes, check_version, diff_children, touch
+from .. import models, schemas, serializers, inventory_ledger, reference_cache
 
 router = APIRouter(tags=["purchase_orders"])
 
 @router.get("/purchase-orders", response_model=List[schemas.PurchaseOrder])
-def get_purchase_orders(db: Session = Depends(get_db)):
-    purchase_orders = db.query(models.PurchaseOrder).all()
-    return purchase_orders
+def get_purchase_orders(
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.PurchaseOrder)),
+    db: Session = Depends(get_db)
+):
+    purchase_orders = selection.apply(db.query(models.PurchaseOrder)).all()
+    if selection.active:
+        return selection.response(purchase_orders)
+    return serializers.render(schemas.PurchaseOrder, purchase_orders)
 
 @router.post("/purchase-orders", response_model=schemas.PurchaseOrder)
+@retry_on_busy
 def create_purchase_order(po: schemas.PurchaseOrderCreate, db: Session = Depends(get_db)):
     # Generate PO number
     po_number = f"PO-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
     
-    # Verify supplier exists
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == po.supplier_id).first()
-    if not supplier:
-        raise HTTPException(status_code=404, detail=f"Supplier with id {po.supplier_id} not found")
+    # Verify supplier and materials exist
+    reference_cache.require(db, models.Supplier, [po.supplier_id])
+    reference_cache.require(db, models.Material, {item.material_id for item in po.items})
     
     db_po = models.PurchaseOrder(
         po_number=po_number,
@@ -35,11 +44,6 @@ def create_purchase_order(po: schemas.PurchaseOrderCreate, db: Session = Depends
     
     # Create PO items
     for item in po.items:
-        # Verify material exists
-        material = db.query(models.Material).filter(models.Material.id == item.material_id).first()
-        if not material:
-            raise HTTPException(status_code=404, detail=f"Material with id {item.material_id} not found")
-        
         db_item = models.PurchaseOrderItem(
             po_id=db_po.id,
             material_id=item.material_id,
@@ -53,48 +57,153 @@ def create_purchase_order(po: schemas.PurchaseOrderCreate, db: Session = Depends
     db.refresh(db_po)
     return db_po
 
+@router.post("/purchase-orders/receipts", response_model=schemas.GoodsReceiptResponse)
+@retry_on_busy
+def receive_goods(receipt: schemas.GoodsReceiptCreate, db: Session = Depends(get_db)):
+    if not receipt.lines:
+        raise HTTPException(status_code=400, detail="Receipt has no lines")
+    
+    # Load every referenced PO line with its PO in one query
+    item_ids = {line.po_item_id for line in receipt.lines}
+    po_items = {
+        row.id: row
+        for row in db.query(
+            models.PurchaseOrderItem.id,
+            models.PurchaseOrderItem.po_id,
+            models.PurchaseOrderItem.material_id,
+            models.PurchaseOrderItem.quantity,
+            models.PurchaseOrderItem.received_quantity,
+            models.PurchaseOrder.status.label("po_status"),
+            models.PurchaseOrder.version.label("po_version")
+        ).join(models.PurchaseOrder).filter(models.PurchaseOrderItem.id.in_(item_ids))
+    }
+    missing = item_ids - po_items.keys()
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Purchase order item with id {min(missing)} not found")
+    for row in po_items.values():
+        if row.po_status == "cancelled":
+            raise HTTPException(status_code=400, detail=f"Purchase order {row.po_id} is cancelled")
+    
+    received_date = receipt.received_date or datetime.utcnow()
+    received = {item_id: row.received_quantity or 0 for item_id, row in po_items.items()}
+    inventory = []
+    for line in receipt.lines:
+        po_item = po_items[line.po_item_id]
+        received[line.po_item_id] += line.quantity
+        inventory.append({
+            "material_id": po_item.material_id,
+            "batch_number": line.batch_number,
+            "quantity": line.quantity,
+            "location": line.location,
+            "status": line.status,
+            "expiry_date": line.expiry_date,
+            "received_date": received_date,
+            "last_updated": received_date
+        })
+    
+    db.bulk_update_mappings(models.PurchaseOrderItem, [
+        {
+            "id": item_id,
+            "received_quantity": quantity,
+            "status": "received" if quantity >= po_items[item_id].quantity else "partial"
+        }
+        for item_id, quantity in received.items()
+    ])
+    lot_ids = db.execute(
+        insert(models.InventoryItem).returning(models.InventoryItem.id, sort_by_parameter_order=True), inventory
+    ).scalars().all()
+    inventory_ledger.log(db, [
+        schemas.InventoryTransactionCreate(
+            inventory_item_id=lot_id,
+            transaction_type=schemas.InventoryTransactionType.RECEIPT,
+            quantity=line.quantity,
+            reference=f"purchase order {po_items[line.po_item_id].po_id}",
+        )
+        for lot_id, line in zip(lot_ids, receipt.lines)
+    ])
+    
+    # A PO is received once none of its lines are still open
+    po_versions = {row.po_id: row.po_version for row in po_items.values()}
+    open_lines = dict(
+        db.query(models.PurchaseOrderItem.po_id, func.count(models.PurchaseOrderItem.id))
+        .filter(
+            models.PurchaseOrderItem.po_id.in_(po_versions),
+            models.PurchaseOrderItem.status != "received"
+        )
+        .group_by(models.PurchaseOrderItem.po_id)
+    )
+    db.bulk_update_mappings(models.PurchaseOrder, [
+        {
+            "id": po_id,
+            "status": "partial" if open_lines.get(po_id) else "received",
+            # The version read above; the UPDATE checks it and bumps it
+            "version": version
+        }
+        for po_id, version in po_versions.items()
+    ])
+    db.commit()
+    
+    purchase_orders = db.query(
+        models.PurchaseOrder.id, models.PurchaseOrder.po_number, models.PurchaseOrder.status
+    ).filter(models.PurchaseOrder.id.in_(po_versions)).all()
+    return {
+        "lines_received": len(receipt.lines),
+        "inventory_items_created": len(inventory),
+        "purchase_orders": purchase_orders
+    }
+
 @router.get("/purchase-orders/{po_id}", response_model=schemas.PurchaseOrder)
-def get_purchase_order(po_id: int, db: Session = Depends(get_db)):
-    po = db.query(models.PurchaseOrder).filter(models.PurchaseOrder.id == po_id).first()
+def get_purchase_order(
+    po_id: int,
+    selection: FieldSelection = Depends(FieldSelection.for_model(models.PurchaseOrder)),
+    db: Session = Depends(get_db)
+):
+    po = selection.apply(db.query(models.PurchaseOrder)).filter(models.PurchaseOrder.id == po_id).first()
     if not po:
         raise HTTPException(status_code=404, detail="Purchase order not found")
+    if selection.active:
+        return selection.response(po)
     return po
 
 @router.put("/purchase-orders/{po_id}", response_model=schemas.PurchaseOrder)
-def update_purchase_order(po_id: int, po: schemas.PurchaseOrderCreate, db: Session = Depends(get_db)):
+@retry_on_busy
+def update_purchase_order(po_id: int, po: schemas.PurchaseOrderUpdate, db: Session = Depends(get_db)):
     db_po = db.query(models.PurchaseOrder).filter(models.PurchaseOrder.id == po_id).first()
     if not db_po:
         raise HTTPException(status_code=404, detail="Purchase order not found")
+    check_version(db_po, po.version, "Purchase order")
     
-    # Update PO fields
-    for field in ["supplier_id", "expected_delivery", "status", "notes"]:
-        if hasattr(po, field):
-            setattr(db_po, field, getattr(po, field))
+    # Verify all referenced materials exist
+    reference_cache.require(db, models.Material, {item.material_id for item in po.items})
     
-    # Delete existing items
-    db.query(models.PurchaseOrderItem).filter(models.PurchaseOrderItem.po_id == po_id).delete()
+    # Lines are matched by id; received quantities and line status are left alone
+    changes = diff_children(
+        db, models.PurchaseOrderItem, "po_id", po_id,
+        [item.dict() for item in po.items],
+        fields=["material_id", "quantity", "unit_price"],
+        defaults={"status": "pending", "received_quantity": 0}
+    )
     
-    # Create new items
-    for item in po.items:
-        # Verify material exists
-        material = db.query(models.Material).filter(models.Material.id == item.material_id).first()
-        if not material:
-            raise HTTPException(status_code=404, detail=f"Material with id {item.material_id} not found")
-        
-        db_item = models.PurchaseOrderItem(
-            po_id=po_id,
-            material_id=item.material_id,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            status="pending"
-        )
-        db.add(db_item)
+    # Update PO fields
+    header_changed = False
+    for field in ["supplier_id", "expected_delivery", "status", "notes"]:
+        value = getattr(po, field)
+        if field == "expected_delivery":
+            # Stored as naive UTC, an aware "...Z" value would never compare equal
+            value = naive_utc(value)
+        if getattr(db_po, field) != value:
+            setattr(db_po, field, value)
+            header_changed = True
     
-    db.commit()
+    if header_changed or changes:
+        apply_changes(db, changes)
+        touch(db_po)
+        db.commit()
     db.refresh(db_po)
     return db_po
 
 @router.delete("/purchase-orders/{po_id}")
+@retry_on_busy
 def delete_purchase_order(po_id: int, db: Session = Depends(get_db)):
     po = db.query(models.PurchaseOrder).filter(models.PurchaseOrder.id == po_id).first()
     if not po:
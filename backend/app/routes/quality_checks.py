@@ -1,27 +1,62 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from ..database import get_db
-from .. import models, schemas
+from .. import models, schemas, serializers, quality_rollups, reference_cache
 
 router = APIRouter(tags=["quality_checks"])
 
 @router.get("/quality-checks", response_model=List[schemas.QualityCheckResponse])
-def get_quality_checks(db: Session = Depends(get_db)):
+def get_quality_checks(include_archived: bool = False, db: Session = Depends(get_db)):
     checks = db.query(models.QualityCheck).all()
-    return checks
+    if include_archived:
+        checks += db.query(models.ArchivedQualityCheck).all()
+    return serializers.render(schemas.QualityCheckResponse, checks)
 
 @router.post("/quality-checks", response_model=schemas.QualityCheckResponse)
 def create_quality_check(check: schemas.QualityCheckCreate, db: Session = Depends(get_db)):
     # Verify part exists
-    part = db.query(models.Part).filter(models.Part.id == check.part_id).first()
-    if not part:
-        raise HTTPException(status_code=404, detail=f"Part with id {check.part_id} not found")
+    reference_cache.require(db, models.Part, [check.part_id])
+    
+    if check.inventory_item_id is not None:
+        item = db.query(models.InventoryItem.id).filter(models.InventoryItem.id == check.inventory_item_id).first()
+        if not item:
+            raise HTTPException(status_code=404, detail=f"Inventory item with id {check.inventory_item_id} not found")
     
     db_check = models.QualityCheck(**check.dict())
+    if db_check.check_date is None:
+        db_check.check_date = datetime.utcnow()
     db.add(db_check)
+    db.flush()
+    quality_rollups.record_check(db, db_check)
     db.commit()
     db.refresh(db_check)
-    return db_check 
\ No newline at end of file
+    return db_check
+
+def _check_period(period: str):
+    if period not in quality_rollups.PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(quality_rollups.PERIODS)}")
+
+@router.get("/quality/trends", response_model=List[schemas.QualityTrendPoint])
+def get_quality_trends(
+    period: str = "week",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    part_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    _check_period(period)
+    return quality_rollups.trends(db, period, start, end, part_id)
+
+@router.get("/quality/pareto", response_model=List[schemas.QualityParetoEntry])
+def get_quality_pareto(
+    period: str = "week",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 10,
+    db: Session = Depends(get_db)
+):
+    _check_period(period)
+    return quality_rollups.pareto(db, period, start, end, limit) 
\ No newline at end of file
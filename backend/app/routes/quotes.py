@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from .. import quoting, schemas
+
+router = APIRouter(tags=["quotes"])
+
+@router.post("/quotes/batch", response_model=schemas.QuoteBatchResponse)
+def quote_batch(request: schemas.QuoteBatchRequest, db: Session = Depends(get_db)):
+    """Cost breakdown and price per piece for each (part, quantity) line,
+    e.g. every quantity break of an RFQ (see app/quoting.py).
+    """
+    return quoting.quote(db, request)
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..database import get_db
+from .. import schemas, scenarios
+
+router = APIRouter(tags=["scenarios"])
+
+def _check_weeks(weeks: int):
+    if not 1 <= weeks <= scenarios.HORIZON_WEEKS:
+        raise HTTPException(status_code=400, detail=f"weeks must be between 1 and {scenarios.HORIZON_WEEKS}")
+
+@router.post("/scenarios", response_model=schemas.Scenario)
+def create_scenario(scenario: schemas.ScenarioCreate, db: Session = Depends(get_db)):
+    return scenarios.store.create(db, scenario.name, scenario.fresh).info()
+
+@router.get("/scenarios", response_model=List[schemas.Scenario])
+def get_scenarios():
+    return [scenario.info() for scenario in scenarios.store.all()]
+
+@router.get("/scenarios/{scenario_id}", response_model=schemas.Scenario)
+def get_scenario(scenario_id: int):
+    return scenarios.store.get(scenario_id).info()
+
+@router.delete("/scenarios/{scenario_id}")
+def delete_scenario(scenario_id: int):
+    scenarios.store.delete(scenario_id)
+    return {"message": "Scenario deleted successfully"}
+
+@router.post("/scenarios/{scenario_id}/edits", response_model=schemas.Scenario)
+def edit_scenario(scenario_id: int, edits: List[schemas.ScenarioEdit]):
+    return scenarios.store.get(scenario_id).edit(edits)
+
+@router.get("/scenarios/{scenario_id}/materials", response_model=List[schemas.ScenarioMaterial])
+def get_scenario_materials(
+    scenario_id: int,
+    weeks: int = 12,
+    material_id: Optional[List[int]] = Query(None),
+    shortages_only: bool = False
+):
+    _check_weeks(weeks)
+    return scenarios.store.get(scenario_id).materials(weeks, material_id, shortages_only)
+
+@router.get("/scenarios/{scenario_id}/orders", response_model=List[schemas.ScenarioOrder])
+def get_scenario_orders(scenario_id: int, at_risk_only: bool = False):
+    return scenarios.store.get(scenario_id).orders(at_risk_only)
+
+@router.get("/scenarios/{scenario_id}/capacity", response_model=List[schemas.ScenarioCapacityWeek])
+def get_scenario_capacity(scenario_id: int, weeks: int = 12):
+    _check_weeks(weeks)
+    return scenarios.store.get(scenario_id).capacity(weeks)
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Depends, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..database import get_db
+from ..delta_sync import TABLES, Delta
+from .. import models, schemas, serializers
+
+router = APIRouter(tags=["sync"])
+
+@router.get("/sync/tombstones", response_model=List[schemas.Tombstone])
+def get_tombstones(
+    response: Response,
+    table: Optional[str] = None,
+    delta: Delta = Depends(),
+    db: Session = Depends(get_db)
+):
+    """Rows deleted since ``updated_since``, oldest first; apply them before
+    the rows changed in the same sync (see app/delta_sync.py).
+    """
+    query = delta.apply(db.query(models.Tombstone), models.Tombstone.deleted_at)
+    if table is not None:
+        if table not in TABLES:
+            raise HTTPException(status_code=400, detail=f"Unknown table '{table}', expected one of {', '.join(TABLES)}")
+        query = query.filter(models.Tombstone.table_name == table)
+    tombstones = query.order_by(models.Tombstone.deleted_at, models.Tombstone.id).all()
+    return delta.respond(response, serializers.render(schemas.Tombstone, tombstones))
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from .. import models, schemas, genealogy
+
+router = APIRouter(tags=["traceability"])
+
+@router.get("/traceability/batches/{batch_number}/forward", response_model=schemas.ForwardTrace)
+def trace_batch_forward(batch_number: str, db: Session = Depends(get_db)):
+    trace = genealogy.forward(db, batch_number)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_number} not found")
+    return trace
+
+@router.get("/traceability/orders/{order_id}/backward", response_model=schemas.BackwardTrace)
+def trace_order_backward(order_id: int, db: Session = Depends(get_db)):
+    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return genealogy.backward(db, order)
@@ -0,0 +1,161 @@
+"""Safety stock and reorder point proposals per material.
+
+Weekly part demand from the order history (see ``forecasting.weekly_demand``)
+is exploded into weekly material consumption with the shared BOM index
+(``bom_revisions.index``), the same explosion scenarios and quotes use: the
+revision in effect at each week's start, through component parts, grossed up
+by each revision's ``scrap_rate`` percentage.
+With the mean ``mu`` and standard deviation ``sigma`` of weekly consumption
+and a lead time of ``L`` weeks, each material gets
+
+    safety stock  = z * sigma * sqrt(L)
+    reorder point = mu * L + safety stock
+
+where ``z`` is the standard normal quantile of the service level. Proposals
+are stored in ``reorder_point_proposals`` for review and applied in bulk.
+Recalculate with::
+
+    python -m app.safety_stock --service-level 0.95
+"""
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import bom_revisions, models
+from .forecasting import week_start, weekly_demand
+
+HISTORY_WEEKS = 52
+DEFAULT_SERVICE_LEVEL = 0.95
+
+
+def material_consumption(db: Session, start: datetime, weeks: int):
+    """Weekly BOM-exploded consumption per material.
+
+    Returns the sorted material ids and a ``len(material_ids) x weeks`` matrix.
+    """
+    part_ids, demand = weekly_demand(db, start, weeks)
+
+    material_ids = np.array(sorted(
+        material_id for (material_id,) in db.query(models.Material.id)
+    ), dtype=np.int64)
+    consumption = np.zeros((len(material_ids), weeks))
+    if not len(part_ids) or not len(material_ids):
+        return material_ids, consumption
+
+    material_rows = {material_id: row for row, material_id in enumerate(material_ids.tolist())}
+    boms = bom_revisions.index(db)
+    week_starts = [start + timedelta(weeks=w) for w in range(weeks)]
+    for part_row, part_id in enumerate(part_ids.tolist()):
+        # Weeks within one revision window share the same exploded usage
+        by_usage = {}
+        for week in np.nonzero(demand[part_row])[0].tolist():
+            usage = boms.explode(part_id, week_starts[week])
+            by_usage.setdefault(id(usage), (usage, []))[1].append(week)
+        for usage, columns in by_usage.values():
+            lines = [(material_rows[m], quantity) for m, quantity in usage.items() if m in material_rows]
+            if not lines:
+                continue
+            rows, per_piece = zip(*lines)
+            consumption[np.ix_(rows, columns)] += np.outer(per_piece, demand[part_row, columns])
+    return material_ids, consumption
+
+
+def propose(
+    db: Session,
+    service_level: float = DEFAULT_SERVICE_LEVEL,
+    weeks: int = HISTORY_WEEKS,
+    as_of: Optional[datetime] = None,
+) -> dict:
+    """Replace all proposals with ones computed from the last ``weeks`` weeks."""
+    end = week_start(as_of or datetime.utcnow())
+    material_ids, consumption = material_consumption(db, end - timedelta(weeks=weeks), weeks)
+
+    materials = {
+        row.id: row for row in db.query(
+            models.Material.id, models.Material.lead_time_days,
+            models.Material.reorder_point, models.Material.safety_stock,
+        )
+    }
+    lead_time_days = np.array([materials[m].lead_time_days or 0 for m in material_ids], dtype=float)
+    lead_weeks = lead_time_days / 7
+
+    mean = consumption.mean(axis=1) if weeks else np.zeros(len(material_ids))
+    std = consumption.std(axis=1, ddof=1) if weeks > 1 else np.zeros(len(material_ids))
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * std * np.sqrt(lead_weeks)
+    reorder_point = mean * lead_weeks + safety_stock
+
+    db.query(models.ReorderPointProposal).delete(synchronize_session=False)
+    generated_at = datetime.utcnow()
+    db.bulk_insert_mappings(models.ReorderPointProposal, [
+        {
+            "material_id": int(material_id),
+            "service_level": service_level,
+            "history_weeks": weeks,
+            "lead_time_days": float(lead_time_days[i]),
+            "mean_weekly_demand": float(mean[i]),
+            "std_weekly_demand": float(std[i]),
+            "safety_stock": float(safety_stock[i]),
+            "reorder_point": float(reorder_point[i]),
+            "current_safety_stock": materials[material_id].safety_stock,
+            "current_reorder_point": materials[material_id].reorder_point,
+            "status": "pending",
+            "generated_at": generated_at,
+        }
+        for i, material_id in enumerate(material_ids.tolist())
+    ])
+    db.commit()
+    changed = int(np.sum(~np.isclose(
+        reorder_point,
+        [materials[m].reorder_point or 0.0 for m in material_ids.tolist()],
+    )))
+    return {"materials": len(material_ids), "changed": changed}
+
+
+def apply(db: Session, material_ids: Optional[Iterable[int]] = None) -> int:
+    """Copy pending proposals onto their materials. Returns the number applied."""
+    Proposal = models.ReorderPointProposal
+    query = db.query(Proposal.id, Proposal.material_id, Proposal.safety_stock, Proposal.reorder_point).filter(
+        Proposal.status == "pending"
+    )
+    if material_ids is not None:
+        query = query.filter(Proposal.material_id.in_(list(material_ids)))
+    proposals = query.all()
+    if not proposals:
+        return 0
+
+    db.bulk_update_mappings(models.Material, [
+        {"id": p.material_id, "safety_stock": p.safety_stock, "reorder_point": p.reorder_point}
+        for p in proposals
+    ])
+    applied_at = datetime.utcnow()
+    db.bulk_update_mappings(Proposal, [
+        {"id": p.id, "status": "applied", "applied_at": applied_at} for p in proposals
+    ])
+    db.commit()
+    return len(proposals)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Propose safety stock and reorder points for every material")
+    parser.add_argument("--service-level", type=float, default=DEFAULT_SERVICE_LEVEL, help="Target cycle service level")
+    parser.add_argument("--weeks", type=int, default=HISTORY_WEEKS, help="Number of weeks of history")
+    parser.add_argument("--apply", action="store_true", help="Apply the proposals right away")
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        result = propose(session, args.service_level, args.weeks)
+        print(f"Proposed reorder points for {result['materials']} materials ({result['changed']} changed)")
+        if args.apply:
+            print(f"Applied {apply(session)} proposals")
+    finally:
+        session.close()
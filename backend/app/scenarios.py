@@ -0,0 +1,523 @@
+"""What-if planning scenarios.
+
+A ``Snapshot`` is an immutable, in-memory copy of the planning inputs: open
+orders, open purchase orders, inventory lots, machines with their maintenance
+downtime, and the BOM index that explodes each order line through the BOM
+revisions in effect on its due date.
+Loading it also derives the weekly base arrays once: material requirements
+and receipts, available stock, machine load and free capacity.
+
+A ``Scenario`` holds edits to orders, purchase orders, inventory lots and
+machines as an overlay of replacement records keyed by ``(entity, id)``. The
+snapshot itself is never changed, so any number of scenarios share one copy
+of the base data. Projections start from the base arrays and apply only the
+difference each overlaid record makes: a scenario costs memory and time in
+proportion to its edits, not to the size of the data.
+
+Scenarios live in memory in the process that created them and expire after
+``IDLE_SECONDS`` without use. New scenarios reuse the current snapshot until
+it is ``SNAPSHOT_SECONDS`` old.
+"""
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import bom_revisions, models
+from .capacity import MachineCapacity, downtime_interval
+from .dates import naive_utc
+from .forecasting import week_start
+
+HORIZON_WEEKS = 52
+SNAPSHOT_SECONDS = 300
+IDLE_SECONDS = 4 * 3600
+
+ORDER = "order"
+PURCHASE_ORDER = "purchase_order"
+INVENTORY_ITEM = "inventory_item"
+MACHINE = "machine"
+
+ACTIVE_ORDER_STATUSES = ("open", "in_progress")
+OPEN_PO_STATUSES = ("draft", "sent", "partial")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class OrderRecord(NamedTuple):
+    id: int
+    order_number: str
+    due_date: Optional[datetime]
+    status: str
+    lines: Tuple[Tuple[int, float], ...]  # (part_id, quantity)
+
+
+class PurchaseOrderRecord(NamedTuple):
+    id: int
+    po_number: str
+    expected_delivery: Optional[datetime]
+    status: str
+    lines: Tuple[Tuple[int, float], ...]  # (material_id, outstanding quantity)
+
+
+class LotRecord(NamedTuple):
+    id: int
+    material_id: int
+    batch_number: str
+    quantity: float
+    status: str
+
+
+class MachineRecord(NamedTuple):
+    id: int
+    name: str
+    current_shifts: int
+    hours_per_shift: int
+
+
+class Arrays(NamedTuple):
+    requirements: np.ndarray  # materials x weeks
+    receipts: np.ndarray  # materials x weeks
+    on_hand: np.ndarray  # materials
+    load_hours: np.ndarray  # weeks
+    capacity_hours: np.ndarray  # weeks
+
+    def copy(self) -> "Arrays":
+        return Arrays(*(array.copy() for array in self))
+
+
+class Snapshot:
+    """Read-only planning inputs and the base arrays derived from them."""
+
+    def __init__(self, db: Session, weeks: int = HORIZON_WEEKS):
+        self.as_of = datetime.utcnow()
+        self.loaded_at = time.monotonic()
+        self.start = week_start(self.as_of)
+        self.weeks = weeks
+        self.week_starts = tuple(self.start + timedelta(weeks=w) for w in range(weeks))
+
+        materials = db.query(
+            models.Material.id, models.Material.name, models.Material.safety_stock
+        ).order_by(models.Material.id).all()
+        self.material_ids = tuple(m.id for m in materials)
+        self.material_names = tuple(m.name for m in materials)
+        self.safety_stock = tuple(m.safety_stock or 0.0 for m in materials)
+        self.material_rows = MappingProxyType({m.id: row for row, m in enumerate(materials)})
+
+        self.cycle_time = MappingProxyType({
+            part_id: cycle_time or 0.0 for part_id, cycle_time in db.query(models.Part.id, models.Part.cycle_time)
+        })
+        self.boms = bom_revisions.index(db)
+
+        orders: Dict[int, OrderRecord] = {}
+        active = db.query(models.Order.id, models.Order.order_number, models.Order.due_date, models.Order.status).filter(
+            models.Order.status.in_(ACTIVE_ORDER_STATUSES)
+        ).all()
+        lines: Dict[int, List[Tuple[int, float]]] = {}
+        for order_id, part_id, quantity in db.query(
+            models.OrderItem.order_id, models.OrderItem.part_id, models.OrderItem.quantity
+        ).join(models.Order, models.Order.id == models.OrderItem.order_id).filter(
+            models.Order.status.in_(ACTIVE_ORDER_STATUSES),
+            models.OrderItem.status != "completed",
+        ):
+            lines.setdefault(order_id, []).append((part_id, float(quantity or 0)))
+        for order in active:
+            orders[order.id] = OrderRecord(
+                order.id, order.order_number, order.due_date, order.status, tuple(lines.get(order.id, ()))
+            )
+
+        purchase_orders: Dict[int, PurchaseOrderRecord] = {}
+        open_pos = db.query(
+            models.PurchaseOrder.id, models.PurchaseOrder.po_number,
+            models.PurchaseOrder.expected_delivery, models.PurchaseOrder.status,
+        ).filter(models.PurchaseOrder.status.in_(OPEN_PO_STATUSES)).all()
+        po_lines: Dict[int, List[Tuple[int, float]]] = {}
+        for po_id, material_id, quantity, received in db.query(
+            models.PurchaseOrderItem.po_id, models.PurchaseOrderItem.material_id,
+            models.PurchaseOrderItem.quantity, models.PurchaseOrderItem.received_quantity,
+        ).join(models.PurchaseOrder, models.PurchaseOrder.id == models.PurchaseOrderItem.po_id).filter(
+            models.PurchaseOrder.status.in_(OPEN_PO_STATUSES),
+            models.PurchaseOrderItem.status != "received",
+        ):
+            po_lines.setdefault(po_id, []).append((material_id, max((quantity or 0) - (received or 0), 0.0)))
+        for po in open_pos:
+            purchase_orders[po.id] = PurchaseOrderRecord(
+                po.id, po.po_number, po.expected_delivery, po.status, tuple(po_lines.get(po.id, ()))
+            )
+
+        lots = {
+            lot.id: LotRecord(lot.id, lot.material_id, lot.batch_number, lot.quantity or 0.0, lot.status)
+            for lot in db.query(
+                models.InventoryItem.id, models.InventoryItem.material_id, models.InventoryItem.batch_number,
+                models.InventoryItem.quantity, models.InventoryItem.status,
+            ).filter(models.InventoryItem.quantity > 0)
+        }
+
+        machines = {
+            m.id: MachineRecord(m.id, m.name, m.current_shifts or 0, m.hours_per_shift or 0)
+            for m in db.query(
+                models.Machine.id, models.Machine.name, models.Machine.current_shifts, models.Machine.hours_per_shift
+            )
+        }
+        downtime: Dict[int, List[Tuple[float, float]]] = {}
+        for record in db.query(
+            models.MaintenanceRecord.machine_id, models.MaintenanceRecord.start_time,
+            models.MaintenanceRecord.end_time, models.MaintenanceRecord.duration_minutes,
+            models.MaintenanceRecord.status,
+        ).filter(models.MaintenanceRecord.machine_id.in_(list(machines))):
+            interval = downtime_interval(record)
+            if interval:
+                downtime.setdefault(record.machine_id, []).append(interval)
+        self.downtime = MappingProxyType({machine_id: tuple(i) for machine_id, i in downtime.items()})
+
+        self.records = MappingProxyType({
+            ORDER: MappingProxyType(orders),
+            PURCHASE_ORDER: MappingProxyType(purchase_orders),
+            INVENTORY_ITEM: MappingProxyType(lots),
+            MACHINE: MappingProxyType(machines),
+        })
+        self._machine_hours = MappingProxyType({
+            machine_id: self._free_hours(machine) for machine_id, machine in machines.items()
+        })
+
+        n = len(self.material_ids)
+        base = Arrays(np.zeros((n, weeks)), np.zeros((n, weeks)), np.zeros(n), np.zeros(weeks), np.zeros(weeks))
+        for entity, records in self.records.items():
+            for record in records.values():
+                self.apply(base, entity, record, 1)
+        for array in base:
+            array.flags.writeable = False
+        self.base = base
+
+    def week(self, when: Optional[datetime]) -> Optional[int]:
+        """Bucket of ``when``; overdue and undated fall in the first week,
+        dates past the horizon in none.
+        """
+        if when is None or when < self.start:
+            return 0
+        week = (when - self.start).days // 7
+        return week if week < self.weeks else None
+
+    def _free_hours(self, machine: MachineRecord) -> np.ndarray:
+        calendar = MachineCapacity(machine.id, machine.current_shifts, machine.hours_per_shift)
+        for i, interval in enumerate(self.downtime.get(machine.id, ())):
+            calendar.set_record(i, interval)
+        bounds = [(week - _EPOCH).total_seconds() for week in self.week_starts + (self.start + timedelta(weeks=self.weeks),)]
+        return np.array([calendar.free(bounds[w], bounds[w + 1])["free_hours"] for w in range(self.weeks)])
+
+    def machine_hours(self, machine: MachineRecord) -> np.ndarray:
+        if self.records[MACHINE].get(machine.id) is machine:
+            return self._machine_hours[machine.id]
+        return self._free_hours(machine)
+
+    def usage(self, part_id: int, due_date: Optional[datetime]) -> List[Tuple[int, float]]:
+        """Material rows and quantity per piece of ``part_id`` due at
+        ``due_date``; overdue and undated lines are built now.
+        """
+        built = max(due_date or self.as_of, self.as_of)
+        return [
+            (self.material_rows[material_id], per_piece)
+            for material_id, per_piece in self.boms.explode(part_id, built).items()
+            if material_id in self.material_rows
+        ]
+
+    def order_materials(self, order: OrderRecord) -> List[int]:
+        return sorted({row for part_id, _ in order.lines for row, _ in self.usage(part_id, order.due_date)})
+
+    def apply(self, arrays: Arrays, entity: str, record, sign: int):
+        """Add (``sign=1``) or remove (``sign=-1``) ``record``'s contribution."""
+        if entity == ORDER:
+            week = self.week(record.due_date)
+            if record.status not in ACTIVE_ORDER_STATUSES or week is None:
+                return
+            for part_id, quantity in record.lines:
+                for row, per_piece in self.usage(part_id, record.due_date):
+                    arrays.requirements[row, week] += sign * quantity * per_piece
+                arrays.load_hours[week] += sign * quantity * self.cycle_time.get(part_id, 0.0) / 3600
+        elif entity == PURCHASE_ORDER:
+            week = self.week(record.expected_delivery)
+            if record.status not in OPEN_PO_STATUSES or week is None:
+                return
+            for material_id, quantity in record.lines:
+                if material_id in self.material_rows:
+                    arrays.receipts[self.material_rows[material_id], week] += sign * quantity
+        elif entity == INVENTORY_ITEM:
+            if record.status == "available" and record.material_id in self.material_rows:
+                arrays.on_hand[self.material_rows[record.material_id]] += sign * record.quantity
+        elif entity == MACHINE:
+            arrays.capacity_hours[:] += sign * self.machine_hours(record)
+
+
+def _projection(arrays: Arrays, weeks: int):
+    """Projected balance and cumulative available-to-promise per material
+    and week. ATP in a week is the lowest balance from that week to the end
+    of the horizon: what can still be promised without a later shortage.
+    """
+    net = arrays.receipts[:, :weeks] - arrays.requirements[:, :weeks]
+    projected = arrays.on_hand[:, None] + np.cumsum(net, axis=1)
+    atp = np.maximum(np.minimum.accumulate(projected[:, ::-1], axis=1)[:, ::-1], 0.0)
+    return projected, atp
+
+
+def _first_shortage(projected: np.ndarray) -> np.ndarray:
+    """Index of the first negative week per row, -1 when there is none."""
+    short = projected < -1e-9
+    return np.where(short.any(axis=1), short.argmax(axis=1), -1)
+
+
+class Scenario:
+    def __init__(self, scenario_id: int, name: str, snapshot: Snapshot):
+        self.id = scenario_id
+        self.name = name
+        self.snapshot = snapshot
+        self.created_at = datetime.utcnow()
+        self.touched = time.monotonic()
+        # (entity, id) -> replacement record, None for a deleted record
+        self.overlay: Dict[Tuple[str, int], Optional[tuple]] = {}
+        self._new_ids = itertools.count(-1, -1)
+        self._arrays: Optional[Arrays] = None
+        self._lock = threading.Lock()
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "created_at": self.created_at,
+            "snapshot_as_of": self.snapshot.as_of,
+            "edits": len(self.overlay),
+        }
+
+    def get(self, entity: str, record_id: int, overlay=None):
+        overlay = self.overlay if overlay is None else overlay
+        if (entity, record_id) in overlay:
+            return overlay[(entity, record_id)]
+        return self.snapshot.records[entity].get(record_id)
+
+    def records(self, entity: str):
+        for record_id, record in self.snapshot.records[entity].items():
+            if (entity, record_id) not in self.overlay:
+                yield record
+        for (edited, _), record in self.overlay.items():
+            if edited == entity and record is not None:
+                yield record
+
+    def edit(self, edits: Iterable) -> dict:
+        """Apply ``edits`` (``schemas.ScenarioEdit``) all or nothing."""
+        with self._lock:
+            overlay = dict(self.overlay)
+            for edit in edits:
+                entity = edit.entity.value
+                if edit.id is None:
+                    if edit.delete:
+                        raise HTTPException(status_code=400, detail="Deleting a record needs its id")
+                    record = self._create(entity, next(self._new_ids), edit)
+                else:
+                    current = self.get(entity, edit.id, overlay)
+                    if current is None:
+                        raise HTTPException(
+                            status_code=404,
+                            detail=f"{entity} {edit.id} is not in scenario {self.id}",
+                        )
+                    record = None if edit.delete else self._update(entity, current, edit)
+                    if record == self.snapshot.records[entity].get(edit.id):
+                        overlay.pop((entity, edit.id), None)
+                        continue
+                overlay[(entity, record.id if record else edit.id)] = record
+            self.overlay = overlay
+            self._arrays = None
+            self.touched = time.monotonic()
+            return self.info()
+
+    def _check_lines(self, entity: str, lines) -> Tuple[Tuple[int, float], ...]:
+        if entity == ORDER:
+            unknown = [line.part_id for line in lines if line.part_id not in self.snapshot.cycle_time]
+            if unknown:
+                raise HTTPException(status_code=404, detail=f"Parts not found: {unknown}")
+            return tuple((line.part_id, line.quantity) for line in lines)
+        unknown = [line.material_id for line in lines if line.material_id not in self.snapshot.material_rows]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Materials not found: {unknown}")
+        return tuple((line.material_id, line.quantity) for line in lines)
+
+    def _create(self, entity: str, record_id: int, edit):
+        if entity == ORDER:
+            if edit.due_date is None or not edit.lines:
+                raise HTTPException(status_code=400, detail="A new order needs a due_date and lines")
+            return OrderRecord(record_id, f"SCENARIO{record_id}", naive_utc(edit.due_date), edit.status or "open",
+                               self._check_lines(entity, edit.lines))
+        if entity == PURCHASE_ORDER:
+            if edit.expected_delivery is None or not edit.lines:
+                raise HTTPException(status_code=400, detail="A new purchase order needs an expected_delivery and lines")
+            return PurchaseOrderRecord(record_id, f"SCENARIO{record_id}", naive_utc(edit.expected_delivery),
+                                       edit.status or "sent", self._check_lines(entity, edit.lines))
+        if entity == INVENTORY_ITEM:
+            if edit.material_id not in self.snapshot.material_rows or edit.quantity is None:
+                raise HTTPException(status_code=400, detail="A new inventory item needs a known material_id and a quantity")
+            return LotRecord(record_id, edit.material_id, f"SCENARIO{record_id}", edit.quantity,
+                             edit.status or "available")
+        if edit.current_shifts is None or edit.hours_per_shift is None:
+            raise HTTPException(status_code=400, detail="A new machine needs current_shifts and hours_per_shift")
+        return MachineRecord(record_id, f"SCENARIO{record_id}", edit.current_shifts, edit.hours_per_shift)
+
+    def _update(self, entity: str, record, edit):
+        changes = {}
+        if edit.status is not None and entity != MACHINE:
+            changes["status"] = edit.status
+        if edit.lines is not None and entity in (ORDER, PURCHASE_ORDER):
+            changes["lines"] = self._check_lines(entity, edit.lines)
+        if entity in (ORDER, PURCHASE_ORDER):
+            field = "due_date" if entity == ORDER else "expected_delivery"
+            # Snapshot dates are naive UTC, like the stored ones
+            when = naive_utc(getattr(edit, field)) or getattr(record, field)
+            if edit.delay_days:
+                if when is None:
+                    raise HTTPException(status_code=400, detail=f"{entity} {record.id} has no {field} to delay")
+                when += timedelta(days=edit.delay_days)
+            changes[field] = when
+        elif entity == INVENTORY_ITEM:
+            if edit.quantity is not None:
+                changes["quantity"] = edit.quantity
+        else:
+            if edit.current_shifts is not None:
+                changes["current_shifts"] = edit.current_shifts
+            if edit.hours_per_shift is not None:
+                changes["hours_per_shift"] = edit.hours_per_shift
+        return record._replace(**changes)
+
+    def arrays(self) -> Arrays:
+        with self._lock:
+            self.touched = time.monotonic()
+            if self._arrays is None:
+                arrays = self.snapshot.base.copy()
+                for (entity, record_id), record in self.overlay.items():
+                    original = self.snapshot.records[entity].get(record_id)
+                    if original is not None:
+                        self.snapshot.apply(arrays, entity, original, -1)
+                    if record is not None:
+                        self.snapshot.apply(arrays, entity, record, 1)
+                self._arrays = arrays
+            return self._arrays
+
+    def materials(self, weeks: int, material_ids: Optional[List[int]] = None, shortages_only: bool = False) -> List[dict]:
+        """Projected balance and ATP per material and week, next to the base plan."""
+        snapshot, arrays = self.snapshot, self.arrays()
+        projected, atp = _projection(arrays, weeks)
+        base_projected, _ = _projection(snapshot.base, weeks)
+        first, base_first = _first_shortage(projected), _first_shortage(base_projected)
+
+        rows = range(len(snapshot.material_ids))
+        if material_ids is not None:
+            rows = [snapshot.material_rows[m] for m in material_ids if m in snapshot.material_rows]
+        result = []
+        for row in rows:
+            if shortages_only and first[row] < 0 and base_first[row] < 0:
+                continue
+            result.append({
+                "material_id": snapshot.material_ids[row],
+                "name": snapshot.material_names[row],
+                "on_hand": float(arrays.on_hand[row]),
+                "safety_stock": snapshot.safety_stock[row],
+                "first_shortage": snapshot.week_starts[first[row]] if first[row] >= 0 else None,
+                "base_first_shortage": snapshot.week_starts[base_first[row]] if base_first[row] >= 0 else None,
+                "weeks": [
+                    {
+                        "week_start": snapshot.week_starts[w],
+                        "requirements": float(arrays.requirements[row, w]),
+                        "receipts": float(arrays.receipts[row, w]),
+                        "projected": float(projected[row, w]),
+                        "base_projected": float(base_projected[row, w]),
+                        "available_to_promise": float(atp[row, w]),
+                    }
+                    for w in range(weeks)
+                ],
+            })
+        return result
+
+    def orders(self, at_risk_only: bool = False) -> List[dict]:
+        """Active orders with the materials projected short in their due week."""
+        snapshot = self.snapshot
+        projected, _ = _projection(self.arrays(), snapshot.weeks)
+        result = []
+        for order in self.records(ORDER):
+            if order.status not in ACTIVE_ORDER_STATUSES:
+                continue
+            week = snapshot.week(order.due_date)
+            week = snapshot.weeks - 1 if week is None else week
+            short = [snapshot.material_ids[row] for row in snapshot.order_materials(order) if projected[row, week] < -1e-9]
+            if at_risk_only and not short:
+                continue
+            result.append({
+                "order_id": order.id,
+                "order_number": order.order_number,
+                "due_date": order.due_date,
+                "status": order.status,
+                "edited": (ORDER, order.id) in self.overlay,
+                "at_risk": bool(short),
+                "short_material_ids": short,
+            })
+        result.sort(key=lambda o: (o["due_date"] is not None, o["due_date"] or datetime.min, o["order_id"]))
+        return result
+
+    def capacity(self, weeks: int) -> List[dict]:
+        """Machine hours needed by orders due each week against free hours."""
+        arrays, base = self.arrays(), self.snapshot.base
+        return [
+            {
+                "week_start": self.snapshot.week_starts[w],
+                "load_hours": float(arrays.load_hours[w]),
+                "capacity_hours": float(arrays.capacity_hours[w]),
+                "utilization": float(arrays.load_hours[w] / arrays.capacity_hours[w]) if arrays.capacity_hours[w] > 0 else None,
+                "base_load_hours": float(base.load_hours[w]),
+                "base_capacity_hours": float(base.capacity_hours[w]),
+            }
+            for w in range(weeks)
+        ]
+
+
+class ScenarioStore:
+    def __init__(self):
+        self._scenarios: Dict[int, Scenario] = {}
+        self._snapshot: Optional[Snapshot] = None
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def _expire(self):
+        cutoff = time.monotonic() - IDLE_SECONDS
+        for scenario_id in [i for i, s in self._scenarios.items() if s.touched < cutoff]:
+            del self._scenarios[scenario_id]
+
+    def create(self, db: Session, name: str, fresh: bool = False) -> Scenario:
+        with self._lock:
+            self._expire()
+            snapshot = self._snapshot
+            if fresh or snapshot is None or time.monotonic() - snapshot.loaded_at > SNAPSHOT_SECONDS:
+                # Older scenarios keep the snapshot they were created on
+                snapshot = self._snapshot = Snapshot(db)
+            scenario = Scenario(next(self._ids), name, snapshot)
+            self._scenarios[scenario.id] = scenario
+            return scenario
+
+    def get(self, scenario_id: int) -> Scenario:
+        with self._lock:
+            scenario = self._scenarios.get(scenario_id)
+        if scenario is None:
+            raise HTTPException(status_code=404, detail="Scenario not found")
+        return scenario
+
+    def all(self) -> List[Scenario]:
+        with self._lock:
+            self._expire()
+            return sorted(self._scenarios.values(), key=lambda s: s.id)
+
+    def delete(self, scenario_id: int):
+        with self._lock:
+            if self._scenarios.pop(scenario_id, None) is None:
+                raise HTTPException(status_code=404, detail="Scenario not found")
+
+
+store = ScenarioStore()
@@ -24,6 +24,7 @@ class MaterialBase(BaseModel):
     moq: float = Field(ge=0)
     lead_time_days: int = Field(ge=0)
     reorder_point: float = Field(ge=0)
+    safety_stock: Optional[float] = Field(None, ge=0)
     specifications: Dict[str, Any]
 
 class InventoryItemBase(BaseModel):
@@ -33,6 +34,7 @@ class InventoryItemBase(BaseModel):
     location: str
     status: str
     expiry_date: Optional[datetime] = None
+    production_run_id: Optional[int] = None
 
 class BOMItemBase(BaseModel):
     material_name: str
@@ -67,6 +69,19 @@ class InventoryItemCreate(InventoryItemBase):
 class BOMCreate(BOMBase):
     pass
 
+class BOMItemUpsert(BOMItemBase):
+    id: Optional[int] = None
+
+class BOMStepUpsert(BOMStepBase):
+    id: Optional[int] = None
+
+class BOMUpdate(BOMBase):
+    steps: List[BOMStepUpsert]
+    materials: List[BOMItemUpsert]
+    version: Optional[int] = None
+    # Set to add a revision taking effect on this date instead of editing in place
+    effective_from: Optional[datetime] = None
+
 # Read Schemas
 class Supplier(SupplierBase):
     id: int
@@ -85,6 +100,7 @@ class InventoryItem(InventoryItemBase):
     id: int
     received_date: datetime
     last_updated: datetime
+    version: int
     material: Material
     
     class Config:
@@ -92,6 +108,8 @@ class InventoryItem(InventoryItemBase):
 
 class BOMItem(BOMItemBase):
     id: int
+    material_id: Optional[int] = None
+    component_part_id: Optional[int] = None
     
     class Config:
         orm_mode = True
@@ -104,12 +122,29 @@ class BOMStep(BOMStepBase):
 
 class BOM(BOMBase):
     id: int
+    version: int
+    revision: int = 1
+    effective_from: Optional[datetime] = None
+    effective_to: Optional[datetime] = None
     materials: List[BOMItem]
     steps: List[BOMStep]
     
     class Config:
         orm_mode = True
 
+class BOMExplosionLine(BaseModel):
+    material_id: int
+    material_name: Optional[str] = None
+    quantity: float
+
+class BOMExplosion(BaseModel):
+    part_id: int
+    as_of: datetime
+    bom_id: int
+    revision: int
+    quantity: float
+    materials: List[BOMExplosionLine]
+
 # Update existing Part schema with BOM relationships
 class Part(BaseModel):
     id: int
@@ -149,6 +184,7 @@ class InventoryItemUpdate(BaseModel):
     location: Optional[str] = None
     status: Optional[str] = None
     expiry_date: Optional[datetime] = None
+    version: Optional[int] = None
 
 class BOMItemUpdate(BaseModel):
     quantity: Optional[float] = Field(None, ge=0)
@@ -161,6 +197,7 @@ class PartBase(BaseModel):
     part_number: str
     description: str
     customer: str
+    customer_id: Optional[int] = None
     material: str
     cycle_time: float
     price: float
@@ -187,11 +224,22 @@ class ProductionRunBase(BaseModel):
 class ProductionRunCreate(ProductionRunBase):
     order_id: int
     order_item_id: int
+    machine_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+class ProductionRunUpdate(BaseModel):
+    machine_id: Optional[int] = None
+    quantity: Optional[int] = None
+    status: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
 
 class ProductionRunResponse(ProductionRunBase):
     id: int
     order_id: int
     order_item_id: int
+    machine_id: Optional[int] = None
     start_date: Optional[datetime]
     end_date: Optional[datetime]
     created_at: datetime
@@ -200,6 +248,53 @@ class ProductionRunResponse(ProductionRunBase):
     class Config:
         from_attributes = True
 
+class InventoryConsumptionLine(BaseModel):
+    inventory_item_id: int
+    quantity: float = Field(gt=0)
+
+class InventoryConsumptionCreate(BaseModel):
+    lines: List[InventoryConsumptionLine]
+
+class InventoryConsumption(BaseModel):
+    id: int
+    production_run_id: int
+    inventory_item_id: int
+    quantity: float
+    consumed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class InventoryTransactionType(str, Enum):
+    RECEIPT = "receipt"
+    ISSUE = "issue"
+    ADJUST = "adjust"
+    MOVE = "move"
+
+class InventoryTransactionCreate(BaseModel):
+    inventory_item_id: int
+    transaction_type: InventoryTransactionType
+    # Amount received or issued; the signed change for adjust; unused for move
+    quantity: float = 0
+    # New location for move
+    location: Optional[str] = None
+    reference: Optional[str] = None
+
+class InventoryTransactionBatch(BaseModel):
+    transactions: List[InventoryTransactionCreate]
+
+class InventoryTransaction(BaseModel):
+    id: int
+    inventory_item_id: int
+    transaction_type: InventoryTransactionType
+    quantity: float
+    location: Optional[str] = None
+    reference: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class QualityCheckBase(BaseModel):
     quantity_checked: int
     quantity_rejected: int
@@ -208,16 +303,76 @@ class QualityCheckBase(BaseModel):
 
 class QualityCheckCreate(QualityCheckBase):
     part_id: int
+    inventory_item_id: Optional[int] = None
     check_date: Optional[datetime] = None
 
 class QualityCheckResponse(QualityCheckBase):
     id: int
     part_id: int
+    inventory_item_id: Optional[int] = None
     check_date: datetime
 
     class Config:
         from_attributes = True
 
+class QualityTrendPoint(BaseModel):
+    period_start: datetime
+    checks: int
+    quantity_checked: int
+    quantity_rejected: int
+    passed: int
+    failed: int
+    reject_rate: float
+
+class QualityParetoEntry(BaseModel):
+    part_id: int
+    part_number: str
+    quantity_checked: int
+    quantity_rejected: int
+    reject_rate: float
+    share_of_rejects: float
+    cumulative_share: float
+
+class WhereUsedEntry(BaseModel):
+    part_id: int
+    part_number: str
+    bom_id: Optional[int] = None
+    depth: int
+    top_level: bool
+
+class TraceLot(BaseModel):
+    id: int
+    batch_number: str
+    material_id: int
+    quantity: float
+    status: str
+    production_run_id: Optional[int] = None
+    depth: int
+
+class TraceOrder(BaseModel):
+    id: int
+    order_number: str
+    customer: str
+    due_date: datetime
+    status: str
+
+    class Config:
+        from_attributes = True
+
+class ForwardTrace(BaseModel):
+    batch_number: str
+    lots: List[TraceLot]
+    production_runs: List[ProductionRunResponse]
+    orders: List[TraceOrder]
+    quality_checks: List[QualityCheckResponse]
+
+class BackwardTrace(BaseModel):
+    order_id: int
+    order_number: str
+    production_runs: List[ProductionRunResponse]
+    lots: List[TraceLot]
+    quality_checks: List[QualityCheckResponse]
+
 class MachineBase(BaseModel):
     name: str
     status: bool = False
@@ -274,6 +429,46 @@ class MachineUpdate(BaseModel):
     hours_per_shift: Optional[int] = None
     current_job: Optional[str] = None
 
+class MachineShiftMetric(BaseModel):
+    machine_id: int
+    shift_start: datetime
+    planned_minutes: float
+    downtime_minutes: float
+    run_minutes: float
+    ideal_minutes: float
+    total_count: float
+    good_count: float
+    availability: float
+    performance: float
+    quality: float
+    oee: float
+
+    class Config:
+        from_attributes = True
+
+class MachineOEESummary(BaseModel):
+    machine_id: int
+    shifts: int
+    planned_minutes: float
+    downtime_minutes: float
+    run_minutes: float
+    total_count: float
+    good_count: float
+    availability: float
+    performance: float
+    quality: float
+    oee: float
+
+class OEERecomputeResult(BaseModel):
+    machines: int
+    shifts: int
+
+class MachineCapacity(BaseModel):
+    machine_id: int
+    scheduled_hours: float
+    downtime_hours: float
+    free_hours: float
+
 class OrderItemBase(BaseModel):
     part_id: int
     quantity: int = Field(ge=1)
@@ -282,6 +477,9 @@ class OrderItemBase(BaseModel):
 class OrderItemCreate(OrderItemBase):
     pass
 
+class OrderItemUpsert(OrderItemBase):
+    id: Optional[int] = None
+
 class OrderItem(OrderItemBase):
     id: int
     order_id: int
@@ -292,6 +490,7 @@ class OrderItem(OrderItemBase):
 
 class OrderBase(BaseModel):
     customer: str
+    customer_id: Optional[int] = None
     due_date: datetime
     status: str = "open"
     notes: Optional[str] = None
@@ -299,16 +498,90 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     items: List[OrderItemCreate]
 
+class OrderUpdate(OrderBase):
+    items: List[OrderItemUpsert]
+    version: Optional[int] = None
+
 class Order(OrderBase):
     id: int
     order_number: str
     created_at: datetime
     updated_at: datetime
+    version: int
     items: List[OrderItem]
 
     class Config:
         from_attributes = True
 
+class OrderSummary(BaseModel):
+    order_id: int
+    order_number: str
+    customer: str
+    status: str
+    due_date: datetime
+    line_count: int
+    open_line_count: int
+    total_quantity: int
+    total_value: float
+    run_count: int
+    produced_quantity: int
+    days_late: int
+    updated_at: datetime
+
+class DemandForecast(BaseModel):
+    part_id: int
+    method: str  # ses, sba
+    alpha: float
+    weekly_quantity: float
+    average_interval: float
+    demand_weeks: int
+    history_weeks: int
+    generated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ForecastRunResult(BaseModel):
+    parts: int
+    ses: int
+    sba: int
+
+class PlanningDemand(BaseModel):
+    part_id: int
+    week_start: datetime
+    firm_quantity: float
+    forecast_quantity: float
+    planned_quantity: float
+
+class ReorderPointProposal(BaseModel):
+    id: int
+    material_id: int
+    service_level: float
+    history_weeks: int
+    lead_time_days: float
+    mean_weekly_demand: float
+    std_weekly_demand: float
+    safety_stock: float
+    reorder_point: float
+    current_safety_stock: Optional[float] = None
+    current_reorder_point: Optional[float] = None
+    status: str  # pending, applied
+    generated_at: datetime
+    applied_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ReorderProposalRunResult(BaseModel):
+    materials: int
+    changed: int
+
+class ReorderProposalApply(BaseModel):
+    material_ids: Optional[List[int]] = None
+
+class ReorderProposalApplyResult(BaseModel):
+    applied: int
+
 class PurchaseOrderItemBase(BaseModel):
     material_id: int
     quantity: float = Field(ge=0)
@@ -319,6 +592,9 @@ class PurchaseOrderItemBase(BaseModel):
 class PurchaseOrderItemCreate(PurchaseOrderItemBase):
     pass
 
+class PurchaseOrderItemUpsert(PurchaseOrderItemBase):
+    id: Optional[int] = None
+
 class PurchaseOrderItem(PurchaseOrderItemBase):
     id: int
     po_id: int
@@ -336,16 +612,43 @@ class PurchaseOrderBase(BaseModel):
 class PurchaseOrderCreate(PurchaseOrderBase):
     items: List[PurchaseOrderItemCreate]
 
+class PurchaseOrderUpdate(PurchaseOrderBase):
+    items: List[PurchaseOrderItemUpsert]
+    version: Optional[int] = None
+
 class PurchaseOrder(PurchaseOrderBase):
     id: int
     po_number: str
     order_date: datetime
+    version: int
     supplier: Supplier
     items: List[PurchaseOrderItem]
 
     class Config:
         from_attributes = True
 
+class GoodsReceiptLine(BaseModel):
+    po_item_id: int
+    quantity: float = Field(gt=0)
+    batch_number: str
+    location: str
+    status: str = "available"
+    expiry_date: Optional[datetime] = None
+
+class GoodsReceiptCreate(BaseModel):
+    lines: List[GoodsReceiptLine]
+    received_date: Optional[datetime] = None
+
+class GoodsReceiptPurchaseOrder(BaseModel):
+    id: int
+    po_number: str
+    status: str
+
+class GoodsReceiptResponse(BaseModel):
+    lines_received: int
+    inventory_items_created: int
+    purchase_orders: List[GoodsReceiptPurchaseOrder]
+
 class CustomerBase(BaseModel):
     name: str
     email: Optional[str] = None
@@ -362,4 +665,139 @@ class CustomerResponse(CustomerBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class CustomerSummary(BaseModel):
+    customer_id: int
+    name: str
+    orders: int
+    open_orders: int
+    parts: int
+    total_quantity: int
+    revenue: float
+    first_due_date: Optional[datetime] = None
+    last_due_date: Optional[datetime] = None
+
+class ScenarioEntity(str, Enum):
+    ORDER = "order"
+    PURCHASE_ORDER = "purchase_order"
+    INVENTORY_ITEM = "inventory_item"
+    MACHINE = "machine"
+
+class ScenarioCreate(BaseModel):
+    name: str
+    fresh: bool = False  # load a new snapshot instead of sharing the current one
+
+class ScenarioLine(BaseModel):
+    part_id: Optional[int] = None  # order lines
+    material_id: Optional[int] = None  # purchase order lines
+    quantity: float = Field(ge=0)
+
+class ScenarioEdit(BaseModel):
+    entity: ScenarioEntity
+    id: Optional[int] = None  # None adds a new record
+    delete: bool = False
+    status: Optional[str] = None
+    due_date: Optional[datetime] = None
+    expected_delivery: Optional[datetime] = None
+    delay_days: Optional[int] = None  # moves due_date or expected_delivery
+    lines: Optional[List[ScenarioLine]] = None  # replaces all lines
+    material_id: Optional[int] = None
+    quantity: Optional[float] = Field(None, ge=0)
+    current_shifts: Optional[int] = Field(None, ge=0)
+    hours_per_shift: Optional[int] = Field(None, ge=0, le=24)
+
+class Scenario(BaseModel):
+    id: int
+    name: str
+    created_at: datetime
+    snapshot_as_of: datetime
+    edits: int
+
+class ScenarioMaterialWeek(BaseModel):
+    week_start: datetime
+    requirements: float
+    receipts: float
+    projected: float
+    base_projected: float
+    available_to_promise: float
+
+class ScenarioMaterial(BaseModel):
+    material_id: int
+    name: str
+    on_hand: float
+    safety_stock: float
+    first_shortage: Optional[datetime] = None
+    base_first_shortage: Optional[datetime] = None
+    weeks: List[ScenarioMaterialWeek]
+
+class ScenarioOrder(BaseModel):
+    order_id: int
+    order_number: str
+    due_date: Optional[datetime] = None
+    status: str
+    edited: bool
+    at_risk: bool
+    short_material_ids: List[int]
+
+class ScenarioCapacityWeek(BaseModel):
+    week_start: datetime
+    load_hours: float
+    capacity_hours: float
+    utilization: Optional[float] = None
+    base_load_hours: float
+    base_capacity_hours: float
+
+class BatchOperation(BaseModel):
+    id: Optional[str] = None  # echoed back to match results to operations
+    method: str = "GET"
+    path: str  # /api/... with an optional query string
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    atomic: bool = False  # required for writes
+
+class BatchResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: List[BatchResult]
+
+class Tombstone(BaseModel):
+    table_name: str
+    row_id: int
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class QuoteRequestLine(BaseModel):
+    part_id: int
+    quantity: float = Field(gt=0)
+
+class QuoteBatchRequest(BaseModel):
+    lines: List[QuoteRequestLine]
+    machine_rate: float = Field(ge=0)  # per machine hour, setups included
+    margin: float = Field(0, ge=0)  # on cost, 0.25 = 25%
+    as_of: Optional[datetime] = None  # BOM revisions in effect, default now
+
+class QuoteLine(BaseModel):
+    part_id: int
+    quantity: float
+    # per piece
+    material_cost: float
+    machine_cost: float
+    labor_cost: float
+    setup_cost: float
+    unit_cost: float
+    unit_price: float
+    total_price: float
+    complete: bool  # False when a BOM, line or material price is missing
+
+class QuoteBatchResponse(BaseModel):
+    as_of: datetime
+    lines: List[QuoteLine]
@@ -0,0 +1,90 @@
+import enum
+import os
+import typing
+from functools import lru_cache
+from typing import Any, Callable, List, Union
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+# Opt-in: encode trusted database rows without running them through Pydantic
+FAST_SERIALIZATION = os.getenv("MRP_FAST_SERIALIZATION", "0").lower() in ("1", "true", "yes")
+
+
+def render(schema, result):
+    """Return ``result`` for the route's response model, or pre-encoded JSON
+    bytes when fast serialization is enabled.
+
+    ``result`` must be an ORM row (or list of rows) read from the database;
+    request payloads still go through Pydantic validation.
+    """
+    if not FAST_SERIALIZATION:
+        return result
+    return Response(content=encode(schema, result), media_type="application/json")
+
+
+def encode(schema, result) -> bytes:
+    encoder = compile_encoder(schema)
+    if isinstance(result, list):
+        return orjson.dumps([encoder(row) for row in result])
+    return orjson.dumps(encoder(result))
+
+
+@lru_cache(maxsize=None)
+def compile_encoder(schema) -> Callable[[Any], dict]:
+    """Generate a function turning an ORM row into the dict ``schema`` would
+    dump, reading attributes directly instead of validating them.
+    """
+    namespace = {"_enum": _enum_value}
+    lines = [f"def encode_{schema.__name__}(obj):", "    return {"]
+    for name, field in schema.model_fields.items():
+        lines.append(f"        {name!r}: {_field_expression(name, field.annotation, namespace)},")
+    lines.append("    }")
+    exec("\n".join(lines), namespace)
+    return namespace[f"encode_{schema.__name__}"]
+
+
+def _field_expression(name: str, annotation, namespace: dict) -> str:
+    value = f"obj.{name}"
+    annotation, optional = _unwrap_optional(annotation)
+    origin = typing.get_origin(annotation)
+
+    if origin in (list, List):
+        (item,) = typing.get_args(annotation) or (Any,)
+        item, _ = _unwrap_optional(item)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            encoder = _register(item, namespace)
+            expression = f"[{encoder}(v) for v in {value}]"
+        else:
+            return value
+    elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        expression = f"{_register(annotation, namespace)}({value})"
+    elif annotation is float:
+        expression = f"float({value})"
+    elif isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        expression = f"_enum({value})"
+    else:
+        return value
+
+    if optional or annotation is float:
+        return f"(None if {value} is None else {expression})"
+    return expression
+
+
+def _register(schema, namespace: dict) -> str:
+    key = f"_encode_{schema.__name__}"
+    namespace[key] = compile_encoder(schema)
+    return key
+
+
+def _unwrap_optional(annotation):
+    if typing.get_origin(annotation) is Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return annotation, False
+
+
+def _enum_value(value):
+    return value.value if isinstance(value, enum.Enum) else value
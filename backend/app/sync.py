@@ -0,0 +1,95 @@
+from fastapi import HTTPException
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+from typing import Any, Dict, List, Optional
+
+
+class ChildChanges:
+    """Inserts, updates and deletes needed to bring a parent's child rows in
+    line with an incoming list.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.inserts: List[Dict[str, Any]] = []
+        self.updates: List[Dict[str, Any]] = []
+        self.deletes: List[int] = []
+
+    def __bool__(self):
+        return bool(self.inserts or self.updates or self.deletes)
+
+
+def diff_children(
+    db: Session,
+    model,
+    parent_key: str,
+    parent_id: int,
+    incoming: List[Dict[str, Any]],
+    fields: List[str],
+    defaults: Optional[Dict[str, Any]] = None,
+) -> ChildChanges:
+    """Match ``incoming`` children to the existing rows by ``id``.
+
+    Children without an id are inserted, children whose ``fields`` differ are
+    updated and existing rows missing from ``incoming`` are deleted. Only the
+    id and the compared columns are read.
+    """
+    changes = ChildChanges(model)
+    columns = [model.id] + [getattr(model, f) for f in fields]
+    existing = {
+        row.id: row
+        for row in db.query(*columns).filter(getattr(model, parent_key) == parent_id)
+    }
+
+    seen = set()
+    for data in incoming:
+        values = {f: data[f] for f in fields}
+        child_id = data.get("id")
+        if child_id is None:
+            changes.inserts.append({parent_key: parent_id, **(defaults or {}), **values})
+            continue
+        if child_id not in existing:
+            raise HTTPException(status_code=404, detail=f"{model.__name__} {child_id} not found for {parent_key} {parent_id}")
+        if child_id in seen:
+            raise HTTPException(status_code=400, detail=f"{model.__name__} {child_id} listed more than once")
+        seen.add(child_id)
+        current = existing[child_id]
+        if any(getattr(current, f) != v for f, v in values.items()):
+            changes.updates.append({"id": child_id, **values})
+
+    changes.deletes = [child_id for child_id in existing if child_id not in seen]
+    return changes
+
+
+def apply_changes(db: Session, changes: ChildChanges):
+    """Write ``changes`` with one bulk statement per kind of change."""
+    model = changes.model
+    if changes.deletes:
+        db.query(model).filter(model.id.in_(changes.deletes)).delete(synchronize_session=False)
+    if changes.updates:
+        db.bulk_update_mappings(model, changes.updates)
+    if changes.inserts:
+        db.bulk_insert_mappings(model, changes.inserts)
+
+
+def check_version(db_obj, version: Optional[int], label: str):
+    """Reject a write based on a stale read of ``db_obj``."""
+    if version is not None and version != db_obj.version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"{label} was modified by someone else (version {db_obj.version}, you sent {version})"
+        )
+
+
+def touch(db_obj):
+    """Make the next flush UPDATE ``db_obj`` even if only its child rows
+    changed, so its ``version_id_col`` is checked against concurrent writers
+    and bumped.
+    """
+    mapper = inspect(db_obj).mapper
+    for attr in mapper.column_attrs:
+        column = attr.columns[0]
+        if not column.primary_key and column is not mapper.version_id_col:
+            flag_modified(db_obj, attr.key)
+            return
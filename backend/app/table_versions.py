@@ -0,0 +1,95 @@
+"""Per-table write versions for this process.
+
+Every INSERT, UPDATE, DELETE or REPLACE run through the engine records its
+target table on the connection; when the transaction commits, the version
+of each of those tables is bumped. Rolled back writes leave the versions
+alone. Callers snapshot the versions before reading and compare later to
+learn whether anything they read may have changed.
+
+``reading()`` additionally collects the tables referenced by the SELECTs run
+in the current context, so a cached result can be tied to exactly the tables
+it was computed from.
+
+Only writes made through this process's engine are seen; results cached
+against these versions should also expire after a short time.
+"""
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import event
+
+_WRITE = re.compile(r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+_READ = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)', re.IGNORECASE)
+_PENDING = "table_versions.pending"
+
+_versions: Dict[str, int] = {}
+_generation = 0
+_lock = threading.Lock()
+_reads: contextvars.ContextVar[Optional[Set[str]]] = contextvars.ContextVar("table_reads", default=None)
+
+
+def snapshot() -> Dict[str, int]:
+    with _lock:
+        return dict(_versions)
+
+
+def generation() -> int:
+    """Number of committed transactions that wrote anything."""
+    return _generation
+
+
+def unchanged(since: Dict[str, int], tables: Iterable[str]) -> bool:
+    """Whether none of ``tables`` has committed a write since ``since``."""
+    with _lock:
+        return all(_versions.get(table, 0) == since.get(table, 0) for table in tables)
+
+
+def bump(tables: Iterable[str]):
+    global _generation
+    with _lock:
+        _generation += 1
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+@contextmanager
+def reading():
+    """Collect the tables read by SQL run inside the block (and in threads
+    that inherit its context, such as FastAPI's sync route workers).
+    """
+    tables: Set[str] = set()
+    token = _reads.set(tables)
+    try:
+        yield tables
+    finally:
+        _reads.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    match = _WRITE.match(statement)
+    if match:
+        conn.info.setdefault(_PENDING, set()).add(match.group(1).lower())
+    reads = _reads.get()
+    if reads is not None:
+        reads.update(table.lower() for table in _READ.findall(statement))
+
+
+def _commit(conn):
+    pending = conn.info.pop(_PENDING, None)
+    if pending:
+        bump(pending)
+
+
+def _rollback(conn):
+    conn.info.pop(_PENDING, None)
+
+
+def track(engine):
+    """Start versioning the tables written through ``engine``."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "commit", _commit)
+        event.listen(engine, "rollback", _rollback)
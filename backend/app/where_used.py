@@ -0,0 +1,220 @@
+"""Where-used index for materials and component parts.
+
+``BOMItem.material_name`` names either a material (``Material.name``) or a
+component part with its own BOM (``Part.part_number``). The name is resolved
+to ``BOMItem.material_id`` or ``BOMItem.component_part_id`` when a BOM is
+written. ``where_used`` holds one row per (item, part) pair for every part
+whose BOM uses the item at any level, with the shortest depth. Where-used
+lookups are then a single primary key range scan. BOM revisions in effect
+now or planned for later count, superseded ones do not.
+
+BOM writes refresh the rows of the written part and of every part above it.
+Rebuild the whole index with::
+
+    python -m app.where_used
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from . import bom_revisions, models
+
+MATERIAL = "material"
+PART = "part"
+
+# (item_type, item_id) -> depth
+Usage = Dict[Tuple[str, int], int]
+
+
+def resolve_names(db: Session, names: Iterable[str]) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """Map BOM item names to ``(material_id, component_part_id)``.
+
+    Materials win over parts; with duplicate material names the oldest wins.
+    """
+    names = set(names)
+    resolved = {name: (None, None) for name in names}
+    for name, part_id in db.query(models.Part.part_number, models.Part.id).filter(models.Part.part_number.in_(names)):
+        resolved[name] = (None, part_id)
+    for name, material_id in db.query(models.Material.name, func.min(models.Material.id)).filter(
+        models.Material.name.in_(names)
+    ).group_by(models.Material.name):
+        resolved[name] = (material_id, None)
+    return resolved
+
+
+def _components(db: Session, part_ids: Iterable[int]) -> Dict[int, List[Tuple[str, int]]]:
+    """Direct BOM items of each part, as ``(item_type, item_id)``."""
+    components: Dict[int, List[Tuple[str, int]]] = {}
+    rows = db.query(models.BOM.part_id, models.BOMItem.material_id, models.BOMItem.component_part_id).join(
+        models.BOMItem, models.BOMItem.bom_id == models.BOM.id
+    ).filter(
+        models.BOM.part_id.in_(list(part_ids)),
+        or_(models.BOM.effective_to.is_(None), models.BOM.effective_to > datetime.utcnow()),
+    )
+    for part_id, material_id, component_part_id in rows:
+        if component_part_id is not None:
+            components.setdefault(part_id, []).append((PART, component_part_id))
+        elif material_id is not None:
+            components.setdefault(part_id, []).append((MATERIAL, material_id))
+    return components
+
+
+def _stored_usage(db: Session, part_ids: Iterable[int]) -> Dict[int, Usage]:
+    usage: Dict[int, Usage] = {}
+    WhereUsed = models.WhereUsed
+    for row in db.query(WhereUsed).filter(WhereUsed.part_id.in_(list(part_ids))):
+        usage.setdefault(row.part_id, {})[(row.item_type, row.item_id)] = row.depth
+    return usage
+
+
+def _expand(part_ids: Set[int], components, below: Dict[int, Usage]) -> Dict[int, Usage]:
+    """Everything used by each of ``part_ids``. Components outside the set
+    are taken from ``below``, which must already hold their usage.
+    """
+    done: Dict[int, Usage] = {}
+
+    def visit(part_id: int, path: Set[int]) -> Usage:
+        if part_id in done:
+            return done[part_id]
+        if part_id in path:
+            raise HTTPException(status_code=400, detail=f"BOM for part {part_id} would contain itself")
+        usage: Usage = {}
+        for item in components.get(part_id, []):
+            usage[item] = 1
+            if item[0] != PART:
+                continue
+            child = item[1]
+            child_usage = visit(child, path | {part_id}) if child in part_ids else below.get(child, {})
+            for key, depth in child_usage.items():
+                if depth + 1 < usage.get(key, depth + 2):
+                    usage[key] = depth + 1
+        done[part_id] = usage
+        return usage
+
+    for part_id in part_ids:
+        visit(part_id, set())
+    return done
+
+
+def _write(db: Session, usage: Dict[int, Usage]):
+    db.query(models.WhereUsed).filter(models.WhereUsed.part_id.in_(list(usage))).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.WhereUsed, [
+        {"item_type": item_type, "item_id": item_id, "part_id": part_id, "depth": depth}
+        for part_id, items in usage.items()
+        for (item_type, item_id), depth in items.items()
+    ])
+
+
+def refresh_parts(db: Session, part_ids: Iterable[int]):
+    """Recompute the index for ``part_ids`` and every part above them.
+
+    Call after writing their BOM items, before commit. Raises 400 if the BOMs
+    now form a cycle.
+    """
+    WhereUsed = models.WhereUsed
+    affected = set(part_ids)
+    affected |= {
+        part_id for (part_id,) in db.query(WhereUsed.part_id).filter(
+            WhereUsed.item_type == PART, WhereUsed.item_id.in_(list(affected))
+        )
+    }
+    components = _components(db, affected)
+    outside = {item_id for items in components.values() for item_type, item_id in items if item_type == PART} - affected
+    _write(db, _expand(affected, components, _stored_usage(db, outside)))
+
+
+def remove_part(db: Session, part_id: int):
+    """Drop a deleted part from the index and refresh the parts that used it."""
+    WhereUsed = models.WhereUsed
+    parents = [
+        row.part_id for row in db.query(WhereUsed.part_id).filter(
+            WhereUsed.item_type == PART, WhereUsed.item_id == part_id
+        )
+    ]
+    db.query(WhereUsed).filter(or_(
+        WhereUsed.part_id == part_id,
+        (WhereUsed.item_type == PART) & (WhereUsed.item_id == part_id),
+    )).delete(synchronize_session=False)
+    db.query(models.BOMItem).filter(models.BOMItem.component_part_id == part_id).update(
+        {models.BOMItem.component_part_id: None}, synchronize_session=False
+    )
+    if parents:
+        refresh_parts(db, parents)
+
+
+def resolve_new_name(db: Session, name: str):
+    """Link BOM items that named ``name`` before it existed."""
+    resolved = resolve_names(db, [name])[name]
+    items = db.query(models.BOMItem).filter(
+        models.BOMItem.material_name == name,
+        models.BOMItem.material_id.is_(None),
+        models.BOMItem.component_part_id.is_(None),
+    )
+    bom_ids = [bom_id for (bom_id,) in items.with_entities(models.BOMItem.bom_id).distinct()]
+    if not bom_ids:
+        return
+    items.update(
+        {models.BOMItem.material_id: resolved[0], models.BOMItem.component_part_id: resolved[1]},
+        synchronize_session=False,
+    )
+    refresh_parts(db, [part_id for (part_id,) in db.query(models.BOM.part_id).filter(models.BOM.id.in_(bom_ids))])
+
+
+def lookup(db: Session, item_type: str, item_id: int) -> List[dict]:
+    """Every part using the item, nearest first, flagging top-level parts."""
+    WhereUsed = models.WhereUsed
+    rows = db.query(WhereUsed.part_id, WhereUsed.depth, models.Part.part_number, models.BOM.id).join(
+        models.Part, models.Part.id == WhereUsed.part_id
+    ).outerjoin(
+        models.BOM, (models.BOM.part_id == WhereUsed.part_id) & bom_revisions.effective(datetime.utcnow())
+    ).filter(
+        WhereUsed.item_type == item_type, WhereUsed.item_id == item_id
+    ).order_by(WhereUsed.depth, WhereUsed.part_id).all()
+
+    used_again = {
+        part_id for (part_id,) in db.query(WhereUsed.item_id).filter(
+            WhereUsed.item_type == PART,
+            WhereUsed.item_id.in_([row.part_id for row in rows]),
+            WhereUsed.depth == 1,
+        ).distinct()
+    }
+    return [
+        {
+            "part_id": part_id,
+            "part_number": part_number,
+            "bom_id": bom_id,
+            "depth": depth,
+            "top_level": part_id not in used_again,
+        }
+        for part_id, depth, part_number, bom_id in rows
+    ]
+
+
+def rebuild(db: Session) -> int:
+    """Re-resolve every BOM item name and recompute the whole index."""
+    items = db.query(models.BOMItem.id, models.BOMItem.material_name).all()
+    resolved = resolve_names(db, {name for _, name in items})
+    db.bulk_update_mappings(models.BOMItem, [
+        {"id": item_id, "material_id": resolved[name][0], "component_part_id": resolved[name][1]}
+        for item_id, name in items
+    ])
+    part_ids = {part_id for (part_id,) in db.query(models.BOM.part_id)}
+    usage = _expand(part_ids, _components(db, part_ids), {})
+    db.query(models.WhereUsed).delete(synchronize_session=False)
+    _write(db, usage)
+    db.commit()
+    return sum(len(items) for items in usage.values())
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal, create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(session)} where-used rows")
+    finally:
+        session.close()
@@ -0,0 +1,168 @@
+"""The compiled encoders in app/serializers.py must produce the same JSON as
+Pydantic for every schema routes pass to ``serializers.render``.
+"""
+import json
+from datetime import datetime
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, schemas, serializers
+from app.database import Base
+
+WHEN = datetime(2026, 10, 19, 8, 30, 15, 123456)
+LATER = datetime(2026, 11, 2, 14, 0)
+
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    supplier = models.Supplier(name="Acme", contact_info={"email": "a@acme.test", "tags": ["resin"]}, lead_time_days=10, rating=4.5, active=True)
+    session.add(supplier)
+    session.flush()
+    resin = models.Material(
+        name="PA66", type=models.MaterialType.RAW, supplier_id=supplier.id, price=2.5, moq=100, lead_time_days=14,
+        reorder_point=50, safety_stock=None, specifications={"grade": "PA66", "melt_flow": 25, "dimensions": {"width": 1.5}},
+    )
+    colorant = models.Material(
+        name="Black", type=models.MaterialType.RAW, supplier_id=supplier.id, price=10, moq=1, lead_time_days=7,
+        reorder_point=5, safety_stock=2.0, specifications={},
+    )
+    session.add_all([resin, colorant])
+    customer = models.Customer(name="Cust A", email=None, phone="123", address=None, notes=None, created_at=WHEN, updated_at=LATER)
+    session.add(customer)
+    session.flush()
+
+    housing = models.Part(
+        part_number="P-1", description="Housing", customer="Cust A", customer_id=customer.id, material="PA66",
+        cycle_time=30, price=1.5, compatible_machines=["M1", "M2"], setup_time=60.0,
+    )
+    clip = models.Part(part_number="P-2", description="Clip", customer="Cust B", material="PA66", cycle_time=12.5, price=0.2, compatible_machines=[], setup_time=15)
+    session.add_all([housing, clip])
+    session.flush()
+    bom = models.BOM(part_id=housing.id, cycle_time_seconds=30, cavities=2, scrap_rate=5, notes=None, effective_from=None, effective_to=None)
+    session.add(bom)
+    session.flush()
+    session.add_all([
+        models.BOMItem(bom_id=bom.id, material_name="PA66", quantity=0.1, unit="kg", material_id=resin.id),
+        models.BOMItem(bom_id=bom.id, material_name="P-2", quantity=2, unit="pcs", notes="clip", component_part_id=clip.id),
+        models.BOMStep(bom_id=bom.id, description="Deburr", time_minutes=0.5, cost_per_hour=30, notes=None),
+    ])
+
+    order = models.Order(order_number="ORD-1", customer="Cust A", customer_id=customer.id, due_date=LATER, status="open", notes=None)
+    session.add(order)
+    session.flush()
+    line = models.OrderItem(order_id=order.id, part_id=housing.id, quantity=100, status="pending")
+    session.add_all([line, models.OrderItem(order_id=order.id, part_id=clip.id, quantity=5, status="completed")])
+    machine = models.Machine(name="M1", status=True, current_shifts=2, hours_per_shift=8, last_updated=WHEN, current_job=None)
+    session.add(machine)
+    session.flush()
+    run = models.ProductionRun(order_id=order.id, order_item_id=line.id, machine_id=machine.id, quantity=100, status="planned", start_date=WHEN, end_date=None)
+    session.add(run)
+    session.flush()
+
+    lot = models.InventoryItem(material_id=resin.id, batch_number="B1", quantity=500, location="A1", status="available", expiry_date=None)
+    made = models.InventoryItem(material_id=colorant.id, batch_number="B2", quantity=12.25, location="A2", status="reserved", expiry_date=LATER, production_run_id=run.id)
+    session.add_all([lot, made])
+    session.flush()
+    po = models.PurchaseOrder(po_number="PO-1", supplier_id=supplier.id, expected_delivery=LATER, status="sent", notes="rush")
+    session.add(po)
+    session.flush()
+    session.add(models.PurchaseOrderItem(po_id=po.id, material_id=resin.id, quantity=200, unit_price=2.4, received_quantity=0, status="pending"))
+
+    session.add_all([
+        models.InventoryTransaction(inventory_item_id=lot.id, transaction_type="issue", quantity=-5, location=None, reference="WO-1", created_at=WHEN),
+        models.InventoryTransaction(inventory_item_id=lot.id, transaction_type="move", quantity=0, location="B1", reference=None, created_at=LATER),
+        models.InventoryConsumption(production_run_id=run.id, inventory_item_id=lot.id, quantity=5, consumed_at=WHEN),
+        models.QualityCheck(part_id=housing.id, inventory_item_id=None, check_date=WHEN, quantity_checked=50, quantity_rejected=2, notes=None, status="passed"),
+        models.MaintenanceRecord(
+            machine_id=machine.id, type="scheduled", description="Oil", start_time=WHEN, end_time=None, duration_minutes=None,
+            technician="Sam", parts_used="", cost=120, status="planned",
+        ),
+        models.MachineShiftMetric(
+            machine_id=machine.id, shift_start=WHEN, planned_minutes=480, downtime_minutes=30, run_minutes=450, ideal_minutes=400,
+            total_count=800, good_count=790, availability=0.9375, performance=0.8889, quality=0.9875, oee=0.8229,
+        ),
+        models.DemandForecast(part_id=housing.id, method="sba", alpha=0.1, weekly_quantity=42.5, average_interval=1.5, demand_weeks=20, history_weeks=52, generated_at=WHEN),
+        models.ReorderPointProposal(
+            material_id=resin.id, service_level=0.95, history_weeks=26, lead_time_days=14, mean_weekly_demand=40,
+            std_weekly_demand=8.5, safety_stock=25, reorder_point=105, current_safety_stock=None, current_reorder_point=50,
+            status="pending", generated_at=WHEN, applied_at=None,
+        ),
+        models.Tombstone(table_name="orders", row_id=7, deleted_at=WHEN),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+CASES = [
+    (schemas.Order, models.Order),
+    (schemas.PartResponse, models.Part),
+    (schemas.Material, models.Material),
+    (schemas.InventoryItem, models.InventoryItem),
+    (schemas.PurchaseOrder, models.PurchaseOrder),
+    (schemas.CustomerResponse, models.Customer),
+    (schemas.ProductionRunResponse, models.ProductionRun),
+    (schemas.QualityCheckResponse, models.QualityCheck),
+    (schemas.MachineResponse, models.Machine),
+    (schemas.MaintenanceRecord, models.MaintenanceRecord),
+    (schemas.MachineShiftMetric, models.MachineShiftMetric),
+    (schemas.DemandForecast, models.DemandForecast),
+    (schemas.ReorderPointProposal, models.ReorderPointProposal),
+    (schemas.InventoryTransaction, models.InventoryTransaction),
+    (schemas.InventoryConsumption, models.InventoryConsumption),
+    (schemas.Tombstone, models.Tombstone),
+]
+
+
+def _pydantic(schema, rows) -> bytes:
+    adapter = TypeAdapter(List[schema])
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+@pytest.mark.parametrize("schema, model", CASES, ids=[schema.__name__ for schema, _ in CASES])
+def test_encode_matches_pydantic(db, schema, model):
+    rows = db.query(model).order_by(model.id).all()
+    assert rows
+    expected = _pydantic(schema, rows)
+    assert json.loads(serializers.encode(schema, rows)) == json.loads(expected)
+    assert serializers.encode(schema, rows) == expected
+
+
+@pytest.mark.parametrize("schema, model", CASES, ids=[schema.__name__ for schema, _ in CASES])
+def test_encode_single_row(db, schema, model):
+    row = db.query(model).order_by(model.id).first()
+    adapter = TypeAdapter(schema)
+    assert serializers.encode(schema, row) == adapter.dump_json(adapter.validate_python(row, from_attributes=True))
+
+
+def test_render_returns_rows_unless_enabled(db, monkeypatch):
+    orders = db.query(models.Order).all()
+    monkeypatch.setattr(serializers, "FAST_SERIALIZATION", False)
+    assert serializers.render(schemas.Order, orders) is orders
+
+    monkeypatch.setattr(serializers, "FAST_SERIALIZATION", True)
+    response = serializers.render(schemas.Order, orders)
+    assert response.media_type == "application/json"
+    assert response.body == _pydantic(schemas.Order, orders)
+
+
+def test_nested_and_optional_values(db):
+    """Spot checks that the cases above cover None, nesting, datetimes and enums."""
+    part = json.loads(serializers.encode(schemas.PartResponse, db.query(models.Part).order_by(models.Part.id).all()))
+    assert part[0]["bom"]["materials"][1]["component_part_id"] == part[1]["id"]
+    assert part[1]["bom"] is None
+    material = json.loads(serializers.encode(schemas.Material, db.query(models.Material).first()))
+    assert material["type"] == models.MaterialType.RAW.value
+    assert material["safety_stock"] is None
+    order = json.loads(serializers.encode(schemas.Order, db.query(models.Order).first()))
+    assert order["due_date"] == LATER.isoformat()
+    assert order["items"][0]["part"]["part_number"] == "P-1"